@@ -0,0 +1,202 @@
+# benchmarks.py
+# Throughput benchmarks for the processing pipeline.
+#
+#   python benchmarks.py ocr-profiles <PDF_folder> [--pages 5] [--profiles fast balanced]
+#   python benchmarks.py page-transport <PDF_folder> [--pages 5] [--workers 4]
+#   python benchmarks.py harvest <text_folder> [--repeat 20]
+#
+# Results are printed as a table; nothing is written to the cache or workbook.
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+from config import DEFAULT_OCR_PROFILE, OCR_PROFILES
+from document_session import DocumentSession
+from ocr_backends import get_ocr_profile
+from ocr_utils import _ocr_page
+from parallel_ocr import TRANSPORTS, ParallelOcrEngine
+from pattern_engine import PatternEngine
+from pattern_store import load_patterns
+
+
+def _sample_pages(folder: Path, max_pages: int) -> list[tuple[Path, int]]:
+    """First `max_pages` pages of every PDF in the folder, as (path, page index)."""
+    pages = []
+    for pdf_path in sorted(folder.glob("*.pdf")):
+        with DocumentSession(pdf_path) as session:
+            if session.is_corrupt or session.is_encrypted:
+                continue
+            pages.extend((pdf_path, i) for i in range(min(session.page_count, max_pages)))
+    return pages
+
+
+def bench_ocr_profiles(folder: Path, max_pages: int, profile_names: list[str]) -> list[dict]:
+    """
+    OCRs the same sample pages with each profile and measures throughput.
+
+    Every page is OCR'd regardless of its text layer, so digital PDFs are
+    usable as samples too. Each profile gets one warm-up page first so the
+    recognizer start-up is not counted.
+
+    Returns:
+        One row per profile: name, pages, seconds, pages_per_sec, chars.
+    """
+    pages = _sample_pages(folder, max_pages)
+    if not pages:
+        return []
+    rows = []
+    for name in profile_names:
+        profile = get_ocr_profile(name)
+        with DocumentSession(pages[0][0]) as session:
+            _ocr_page(session, pages[0][1], profile)
+
+        chars = 0
+        start = time.perf_counter()
+        for pdf_path, page_index in pages:
+            with DocumentSession(pdf_path) as session:
+                chars += len(_ocr_page(session, page_index, profile))
+        seconds = time.perf_counter() - start
+        rows.append({"name": name, "pages": len(pages), "seconds": seconds,
+                     "pages_per_sec": len(pages) / seconds if seconds else 0.0, "chars": chars})
+    return rows
+
+
+def _print_profile_table(rows: list[dict]):
+    baseline = next((r for r in rows if r["name"] == DEFAULT_OCR_PROFILE), rows[0])
+    print(f"{'Profile':<10} {'Pages':>6} {'Seconds':>9} {'Pages/s':>8} {'vs ' + baseline['name']:>14} {'Chars':>8}")
+    for r in rows:
+        relative = r["pages_per_sec"] / baseline["pages_per_sec"] if baseline["pages_per_sec"] else 0.0
+        print(f"{r['name']:<10} {r['pages']:>6} {r['seconds']:>9.2f} {r['pages_per_sec']:>8.2f} "
+              f"{relative:>13.2f}x {r['chars']:>8}")
+
+
+def bench_page_transport(folder: Path, max_pages: int, workers: int) -> list[dict]:
+    """
+    OCRs the same sample pages through the parallel OCR engine with each page transport.
+
+    Returns:
+        One row per transport: name, pages, seconds, pages_per_sec, chars.
+    """
+    pages = _sample_pages(folder, max_pages)
+    if not pages:
+        return []
+    by_document = {}
+    for pdf_path, page_index in pages:
+        by_document.setdefault(pdf_path, []).append(page_index)
+
+    rows = []
+    for transport in TRANSPORTS:
+        with ParallelOcrEngine(ocr_workers=workers, transport=transport) as engine:
+            engine.ocr_pages(pages[0][0], [pages[0][1]])  # Warm-up: worker start-up is not counted
+            chars = 0
+            start = time.perf_counter()
+            for pdf_path, indices in by_document.items():
+                chars += sum(len(text) for text in engine.ocr_pages(pdf_path, indices))
+            seconds = time.perf_counter() - start
+        rows.append({"name": transport, "pages": len(pages), "seconds": seconds,
+                     "pages_per_sec": len(pages) / seconds if seconds else 0.0, "chars": chars})
+    return rows
+
+
+def _print_transport_table(rows: list[dict]):
+    print(f"{'Transport':<14} {'Pages':>6} {'Seconds':>9} {'Pages/s':>8} {'Chars':>8}")
+    for r in rows:
+        print(f"{r['name']:<14} {r['pages']:>6} {r['seconds']:>9.2f} {r['pages_per_sec']:>8.2f} {r['chars']:>8}")
+
+
+def _harvest_per_pattern(text: str, patterns: dict) -> list[dict]:
+    """The original harvest loop: one re.finditer per pattern, list scan for duplicates."""
+    found_items = []
+    for item_type, regex_list in patterns.items():
+        for pattern in regex_list:
+            try:
+                matches = re.finditer(pattern, text, re.IGNORECASE)
+            except re.error:
+                continue
+            for match in matches:
+                found_text = match.group(0).strip()
+                if not any(item["type"] == item_type and item["text"] == found_text for item in found_items):
+                    found_items.append({"type": item_type, "text": found_text})
+    return found_items
+
+
+def bench_harvest(folder: Path, repeat: int) -> list[dict]:
+    """
+    Harvests each text file (e.g. the extracted texts in PDF_TXT_DIR) repeated
+    `repeat` times, with the per-pattern loop and with the pattern engine.
+
+    Returns:
+        One row per file: name, chars, items, old_seconds, new_seconds, same.
+    """
+    patterns, _ = load_patterns()
+    engine = PatternEngine(patterns)
+    rows = []
+    for txt_path in sorted(folder.glob("*.txt")):
+        text = "\n".join([txt_path.read_text(encoding="utf-8", errors="replace")] * repeat)
+        start = time.perf_counter()
+        old = _harvest_per_pattern(text, patterns)
+        old_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        new = engine.harvest(text)
+        new_seconds = time.perf_counter() - start
+        rows.append({"name": txt_path.name, "chars": len(text), "items": len(new),
+                     "old_seconds": old_seconds, "new_seconds": new_seconds,
+                     "same": old == [{"type": item["type"], "text": item["text"]} for item in new]})  # Spans are new
+    return rows
+
+
+def _print_harvest_table(rows: list[dict]):
+    print(f"{'File':<32} {'Chars':>10} {'Items':>6} {'Per-pattern':>12} {'Engine':>9} {'Speed-up':>9} Same")
+    for r in rows:
+        speedup = r["old_seconds"] / r["new_seconds"] if r["new_seconds"] else 0.0
+        print(f"{r['name'][:32]:<32} {r['chars']:>10} {r['items']:>6} {r['old_seconds']:>11.3f}s "
+              f"{r['new_seconds']:>8.3f}s {speedup:>8.1f}x {'yes' if r['same'] else 'NO'}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="KYO QA Tool benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    profiles = commands.add_parser("ocr-profiles", help="Compare OCR throughput between OCR profiles.")
+    profiles.add_argument("folder", type=Path, help="Folder of sample PDFs.")
+    profiles.add_argument("--pages", type=int, default=5, help="Pages sampled per PDF (default: 5).")
+    profiles.add_argument("--profiles", nargs="+", choices=list(OCR_PROFILES), default=list(OCR_PROFILES))
+
+    transport = commands.add_parser("page-transport",
+                                    help="Compare shared-memory and pickled page transport in the parallel OCR engine.")
+    transport.add_argument("folder", type=Path, help="Folder of sample PDFs.")
+    transport.add_argument("--pages", type=int, default=5, help="Pages sampled per PDF (default: 5).")
+    transport.add_argument("--workers", type=int, default=4, help="OCR worker processes (default: 4).")
+
+    harvest = commands.add_parser("harvest", help="Compare the pattern engine with per-pattern matching.")
+    harvest.add_argument("folder", type=Path, help="Folder of extracted .txt files (e.g. the review folder).")
+    harvest.add_argument("--repeat", type=int, default=20, help="Times each text is repeated (default: 20).")
+
+    args = parser.parse_args(argv)
+    if args.command == "harvest":
+        rows = bench_harvest(args.folder, args.repeat)
+        if not rows:
+            print(f"No .txt files found in '{args.folder}'.")
+            return 1
+        _print_harvest_table(rows)
+        return 0 if all(r["same"] for r in rows) else 1
+
+    if args.command == "ocr-profiles":
+        rows = bench_ocr_profiles(args.folder, args.pages, args.profiles)
+    else:
+        rows = bench_page_transport(args.folder, args.pages, args.workers)
+    if not rows:
+        print(f"No readable PDFs found in '{args.folder}'.")
+        return 1
+    if args.command == "ocr-profiles":
+        _print_profile_table(rows)
+    else:
+        _print_transport_table(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# cli_runner.py
+# Command-line entry point for running jobs without the GUI.
+#
+#   python cli_runner.py process --folder <PDF_folder> --excel <template.xlsx> [--profile fast]
+#   python cli_runner.py search "paper jam" [--phrase | --prefix] [--regex PATTERN] [--limit N]
+#   python cli_runner.py lookup "TASKalfa 5054ci" [--prefix] [--type model|qa_number]
+
+import argparse
+import sys
+import threading
+from collections import Counter
+
+from config import DEFAULT_OCR_PROFILE, OCR_FAST_MODE, OCR_PROFILES, SEARCH_RESULT_LIMIT
+from file_utils import ensure_folders
+from model_index import INDEXED_TYPES, ModelIndex, format_lookup
+from processing_engine import run_processing_job
+from search_index import SearchIndex, format_results
+
+
+class _ConsoleQueue:
+    """Stands in for the GUI response queue: prints job messages and tallies results."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.final_status = None
+
+    def put(self, msg):
+        mtype = msg.get("type")
+        if mtype == "log":
+            print(f"[{msg.get('tag', 'info').upper()}] {msg.get('msg', '')}")
+        elif mtype == "progress":
+            print(f"--- {msg.get('current')}/{msg.get('total')} ---")
+        elif mtype == "file_complete":
+            self.counts[msg.get("status")] += 1
+        elif mtype == "increment_counter":
+            self.counts[msg.get("counter")] += 1
+        elif mtype == "result_path":
+            print(f"Result workbook: {msg.get('path')}")
+        elif mtype == "finish":
+            self.final_status = msg.get("status")
+
+
+def run_process(args) -> int:
+    job = {
+        "excel_path": args.excel,
+        "input_path": args.folder,
+        "fast_mode": args.fast,
+        "full_text": args.full_text,
+        "ocr_profile": args.profile,
+    }
+    ensure_folders()
+    progress_queue = _ConsoleQueue()
+    run_processing_job(job, progress_queue, threading.Event(), None)
+
+    counts = progress_queue.counts
+    print(f"Job finished: {progress_queue.final_status}")
+    print(f"Pass: {counts['Pass']}  Fail: {counts['Fail']}  Review: {counts['Needs Review']}  "
+          f"OCR: {counts['ocr']}  Timeout: {counts['timeout']}")
+    return 0 if progress_queue.final_status == "Complete" else 1
+
+
+def run_search(args) -> int:
+    mode = "phrase" if args.phrase else "prefix" if args.prefix else "all"
+    with SearchIndex() as index:
+        try:
+            results = index.search(" ".join(args.words), mode=mode, regex=args.regex, limit=args.limit)
+        except ValueError as e:
+            print(e)
+            return 2
+        print(format_results(results))
+        print(f"{len(results)} of {index.document_count()} indexed document(s).")
+    return 0
+
+
+def run_lookup(args) -> int:
+    with ModelIndex() as index:
+        hits = index.lookup(" ".join(args.term), item_type=args.type, prefix=args.prefix)
+        print(format_lookup(hits))
+        print(f"{len({hit['content_hash'] for hit in hits})} of {index.document_count()} indexed document(s).")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="KYO QA ServiceNow Knowledge Tool (command line)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    process = commands.add_parser("process", help="Process a folder of PDFs into a copy of the Excel template.")
+    process.add_argument("--folder", required=True, help="Folder containing the PDF files.")
+    process.add_argument("--excel", required=True, help="Base Excel workbook (kb_knowledge.xlsx).")
+    process.add_argument("--profile", choices=list(OCR_PROFILES), default=DEFAULT_OCR_PROFILE,
+                         help=f"OCR speed profile (default: {DEFAULT_OCR_PROFILE}).")
+    process.add_argument("--fast", action=argparse.BooleanOptionalAction, default=OCR_FAST_MODE,
+                         help="OCR header regions first and fall back to the full page only when needed "
+                              "(default: OCR_FAST_MODE in config.py; --no-fast turns it off).")
+    process.add_argument("--full-text", action="store_true",
+                         help="Read every page instead of stopping once the fields are found.")
+    process.set_defaults(func=run_process)
+
+    search = commands.add_parser("search", help="Search the extracted text of every processed document.")
+    search.add_argument("words", nargs="*", help="Words that must all occur (empty for a regex-only search).")
+    match = search.add_mutually_exclusive_group()
+    match.add_argument("--phrase", action="store_true", help="Match the words as one exact phrase.")
+    match.add_argument("--prefix", action="store_true", help="Match the words as the start of words.")
+    search.add_argument("--regex", help="Regular expression the text must also match (case-insensitive).")
+    search.add_argument("--limit", type=int, default=SEARCH_RESULT_LIMIT,
+                        help=f"Most documents listed (default: {SEARCH_RESULT_LIMIT}).")
+    search.set_defaults(func=run_search)
+
+    lookup = commands.add_parser("lookup", help="List the processed documents that mention a model or QA/SB number.")
+    lookup.add_argument("term", nargs="+", help="Model or QA/SB number, e.g. TASKalfa 5054ci.")
+    lookup.add_argument("--prefix", action="store_true", help="Also match longer terms starting with it (a model series).")
+    lookup.add_argument("--type", choices=INDEXED_TYPES, help="Look up models or QA/SB numbers only.")
+    lookup.set_defaults(func=run_lookup)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
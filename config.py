@@ -39,6 +39,166 @@ QA_NUMBER_PATTERNS = [r'\bQA[-_]?[\w-]+', r'\bSB[-_]?[\w-]+']
 UNWANTED_AUTHORS = ["Knowledge Import"]
 STANDARDIZATION_RULES = {"TASKalfa-": "TASKalfa ", "ECOSYS-": "ECOSYS "}
 
+# --- PATTERN STORE ---
+# The harvest patterns in use live in this JSON file (see pattern_store.py). It is
+# seeded once from data_harvester.PATTERNS, the lists above and custom_patterns.py;
+# after that, edit patterns with the Patterns window (or the file itself).
+PATTERN_STORE_PATH = BASE_DIR / "patterns.json"
+
+# --- PATTERN PROFILER ---
+# Patterns are timed over a sample of extracted texts before they are saved, and
+# each job logs its slowest patterns (see pattern_profiler.py).
+PATTERN_TIME_BUDGET_SECONDS = 1.0  # Longest one pattern may take over the sample; slower patterns are refused
+PATTERN_PROFILE_SAMPLE_CHARS = 1_000_000  # Characters of extracted text in the sample
+PATTERN_REPORT_TOP = 5  # Slowest patterns listed in a job's log
+
+# --- PATTERN IMPACT PREVIEW ---
+# A candidate pattern set is tried on every cached extracted text before it is
+# saved (see pattern_impact.py).
+PREVIEW_WORKERS = 0  # Worker processes; 0 uses every CPU
+PREVIEW_MIN_PARALLEL_DOCS = 200  # Fewer cached documents are compared in-process
+
+# --- SEARCH INDEX ---
+# Every processed document's extracted text goes into an SQLite FTS5 index, keyed
+# by content hash (see search_index.py). Searched from the GUI and the CLI.
+SEARCH_INDEX_PATH = CACHE_DIR / "search_index.sqlite3"
+SEARCH_RESULT_LIMIT = 50  # Documents listed per search
+
+# --- MODEL INDEX ---
+# Models and QA/SB numbers found in each processed document, with the workbook
+# row of its result, in an SQLite inverted index (see model_index.py).
+MODEL_INDEX_PATH = CACHE_DIR / "model_index.sqlite3"
+
+# --- TEXT CORPUS ---
+# Extracted texts are packed into append-only segment files of compressed page
+# blocks with an offset index, read through mmap (see text_corpus.py).
+TEXT_CORPUS_DIR = CACHE_DIR / "corpus"
+TEXT_CORPUS_SEGMENT_BYTES = 256 * 1024 * 1024  # A new segment file is started past this size
+TEXT_CORPUS_COMPRESSION = 6  # zlib level (1 fastest, 9 smallest)
+
+# --- OCR ENGINE ---
+# The recognizer pool and script detection below need the optional tesserocr
+# package (see requirements.txt). Without it both are inactive: every page is
+# OCR'd by a new tesseract process through pytesseract, with OCR_LANG.
+OCR_BACKEND = "auto"  # "auto", "tesserocr" (persistent, needs tesserocr) or "pytesseract"
+OCR_POOL_SIZE = 2  # Long-lived recognizers kept per worker process (tesserocr only)
+OCR_LANG = "eng"
+# Script pre-detection: a cheap Tesseract OSD pass on a downscaled page decides
+# which language pack to use. Multi-language models only run on pages whose
+# detected script is listed here; everything else is OCR'd with OCR_LANG.
+# Detection needs the tesserocr backend (with pytesseract it would start an
+# extra tesseract process per page) and the "osd" traineddata; a detected
+# script whose language packs are not installed is OCR'd with OCR_LANG.
+OCR_LANGUAGE_DETECTION = True
+OCR_SCRIPT_LANGS = {"Japanese": "jpn+eng", "Han": "jpn+eng", "Hiragana": "jpn+eng", "Katakana": "jpn+eng"}
+OCR_SCRIPT_MIN_CONFIDENCE = 1.0  # Tesseract script confidence needed to switch language
+OCR_SCRIPT_PROBE_MAX_SIDE = 1200  # Pixels on the long side of the OSD probe
+# Pages that are a single full-page scan are OCR'd from the embedded image at its
+# native resolution instead of being re-rendered.
+OCR_USE_EMBEDDED_IMAGES = True
+EMBEDDED_IMAGE_MIN_COVERAGE = 0.95  # Fraction of the page the image must cover
+EMBEDDED_IMAGE_MAX_DPI = 600  # Larger scans are halved until they fall below this
+
+# --- OCR PROFILES ---
+# Named speed/accuracy trade-offs, selectable per job. "oem" is the Tesseract engine
+# mode (None = Tesseract's default, 1 = LSTM only), "psm" the page segmentation mode,
+# "dpi" the render resolution, "preprocess" overrides PREPROCESS_SETTINGS and
+# "identifier_whitelist" restricts the character set of identifier-only passes
+# (fast-mode header regions), where only model names and QA numbers are wanted.
+OCR_IDENTIFIER_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_/.:()"
+OCR_PROFILES = {
+    "fast": {"oem": 1, "psm": 6, "dpi": 200,
+             "preprocess": {"deskew": False, "denoise": False},
+             "identifier_whitelist": OCR_IDENTIFIER_CHARS},
+    "balanced": {"oem": None, "psm": None, "dpi": 300,
+                 "preprocess": {},
+                 "identifier_whitelist": OCR_IDENTIFIER_CHARS},
+    "accurate": {"oem": None, "psm": 3, "dpi": 400,
+                 "preprocess": {"deskew_threshold_deg": 0.2},
+                 "identifier_whitelist": None},
+}
+DEFAULT_OCR_PROFILE = "balanced"
+
+# --- TILED OCR (oversized pages) ---
+# Pages whose OCR image would exceed this many pixels (1 byte each in gray) are
+# rendered and OCR'd as overlapping tiles, which bounds the memory per worker.
+OCR_TILE_MAX_PIXELS = 24_000_000
+OCR_TILE_OVERLAP_PX = 120  # Overlap between neighbouring tiles; keep above one text line
+
+# --- RENDER/OCR PIPELINE ---
+# Pages rendered ahead of the OCR stage within one document. Each one holds a
+# prepared page image in memory.
+OCR_PIPELINE_LOOKAHEAD = 2
+
+# --- PARALLEL OCR ENGINE (pdf_processor batch runs) ---
+# With OCR_PARALLEL_WORKERS > 0, pages are rendered and OCR'd by separate pools
+# of processes. "shared_memory" passes page images through recycled shared-memory
+# slots; "pickle" sends them through the queue.
+OCR_PARALLEL_WORKERS = 0
+OCR_RENDER_WORKERS = 1
+OCR_PAGE_TRANSPORT = "shared_memory"
+
+# --- IMAGE PREPROCESSING (shared by all OCR paths) ---
+PREPROCESS_SETTINGS = {
+    "probe_max_side": 800,          # Statistics are computed on a downscaled probe of the page
+    "ink_threshold": 160,           # Gray level below which a pixel counts as ink
+    "blank_ink_ratio": 0.002,       # Pages with less ink than this fraction are skipped
+    "crop_to_ink": True,
+    "crop_margin": 16,              # Pixels kept around the ink bounding box
+    "deskew": True,
+    "deskew_threshold_deg": 0.5,    # Only rotate when the skew estimate exceeds this
+    "deskew_max_deg": 10.0,         # Larger estimates are treated as unreliable
+    "binarize": True,               # Otsu threshold
+    "denoise": True,                # 3x3 median blur
+}
+
+# --- REGION-OF-INTEREST OCR (fast mode) ---
+# Regions are (x0, y0, x1, y1) fractions of the page. Only these areas are OCR'd
+# first; the full document is OCR'd only if the required fields are not found.
+OCR_FAST_MODE = False
+ROI_REGIONS = {
+    "header": {"page": 0, "rect": (0.0, 0.0, 1.0, 0.25)},
+    "applicable_models": {"page": 0, "rect": (0.0, 0.2, 1.0, 0.65)},
+}
+ROI_REQUIRED_FIELDS = ["model", "qa_number"]
+ROI_STATS_FILE = CACHE_DIR / "roi_stats.json"  # Hit rates and learned regions
+
+# --- INCREMENTAL HARVESTING ---
+# Page extraction stops as soon as every item type here has been found at least
+# this many times. Review ("full text") runs ignore it and read every page.
+HARVEST_STOP_CONDITIONS = {"model": 1, "qa_number": 1}
+
+# --- MODEL CATALOG ---
+# Known models are read from the Meta column of these workbooks (reference set,
+# ServiceNow exports) and matched exactly before the model regexes run.
+MODEL_CATALOG_SOURCES = [BASE_DIR / "Sample_Set" / "kb_knowledge_Ref.xlsx"]
+MODEL_CATALOG_CACHE = CACHE_DIR / "model_catalog.pkl"  # Rebuilt when a source workbook changes
+
+# --- FUZZY MODEL LOOKUP (OCR text) ---
+# OCR'd identifiers are matched to catalog models despite misread characters.
+FUZZY_MODEL_LOOKUP = True
+# Only swaps between confusable characters fit the edit budget: any other
+# substitution, insertion or deletion costs 1.0 and would turn a correctly read
+# model that is missing from the catalog into its catalog neighbour.
+FUZZY_MAX_DISTANCE = 0.75  # Edit budget: up to three confusions, no real edit
+FUZZY_CONFUSION_COST = 0.25  # Cost of swapping confusable characters (0/O, 1/l/I, 5/S, 8/B, 2/Z)
+FUZZY_MIN_CONFIDENCE = 0.85  # Below this a near-match is not reported
+
+# --- PAGE CLASSIFIER ---
+# Pages are labelled 'text', 'image' or 'mixed' from their fonts and placed images,
+# without extracting the whole text layer (see page_classifier.py).
+CLASSIFIER_SAMPLE_PAGES = 3  # Leading pages whose extracted characters are also counted
+CLASSIFIER_MIN_PAGE_CHARS = 10  # A sampled page with fonts but fewer characters has no usable text layer
+CLASSIFIER_IMAGE_COVERAGE = 0.5  # Share of the page covered by images from which a text page is 'mixed'
+PAGE_COST = {"text": 1, "mixed": 2, "image": 10}  # Relative processing cost per page, for the job ETA
+
+# --- WATCHDOG ---
+# Extraction runs in a worker process that is killed and replaced when a document
+# stops making progress. Set WATCHDOG_ENABLED = False to extract in-process.
+WATCHDOG_ENABLED = True
+PAGE_TIMEOUT_SECONDS = 60  # Longest one page may take to read, render and OCR
+DOCUMENT_TIMEOUT_SECONDS = 600  # Longest one whole document may take
+
 # --- EXCEL MAPPING ---
 META_COLUMN_NAME = "Meta"
 AUTHOR_COLUMN_NAME = "Author"
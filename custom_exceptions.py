@@ -22,4 +22,8 @@ class PatternMatchError(KYOQAToolError):
 
 class ConfigurationError(KYOQAToolError):
     """Raised when there's a configuration issue."""
+    pass
+
+class ExtractionTimeoutError(PDFExtractionError):
+    """Raised when a document exceeds its per-page or per-document time budget."""
     pass
\ No newline at end of file
@@ -3,14 +3,18 @@
 # Date: 2025-07-24
 # Version: VC-9
 
-import re
+from config import FUZZY_MODEL_LOOKUP, HARVEST_STOP_CONDITIONS
+from fuzzy_models import get_fuzzy_index
+from model_catalog import get_model_catalog
+from pattern_engine import get_pattern_engine
 
 # This is the second version of the data harvesting module.
 # Phase B: Pre-release - Version VC-9
 # It now returns a status reason along with the found data.
 
 # --- BUILT-IN PATTERNS ---
-# In the future, this will be merged with the custom patterns from the manager.
+# Seed for the pattern store (see pattern_store), together with config.MODEL_PATTERNS /
+# QA_NUMBER_PATTERNS and custom_patterns.py. Harvesting uses the store.
 PATTERNS = {
     "model": [
         r"\bTASKalfa\s*[\w-]+\b",
@@ -23,43 +27,215 @@ PATTERNS = {
     ]
 }
 
-def harvest_all_data(text: str) -> dict:
+def find_known_models(text: str, fuzzy: bool = False) -> list[dict]:
+    """
+    Catalog models in the text (see model_catalog), plus OCR corrections when
+    `fuzzy` is set (see fuzzy_models).
+
+    Returns:
+        [{"start", "end", "text", ...}, ...] in text order, as passed to
+        `PatternEngine.harvest`.
+    """
+    catalog = get_model_catalog()
+    known_models = [{"start": s, "end": e, "text": model} for s, e, model in catalog.find(text)] if catalog else []
+    if fuzzy and FUZZY_MODEL_LOOKUP and catalog:
+        corrected = get_fuzzy_index(catalog).find(text, [(k["start"], k["end"]) for k in known_models])
+        known_models = sorted(known_models + corrected, key=lambda known: known["start"])
+    return known_models
+
+
+def harvest_all_data(text: str, fuzzy: bool = False, engine=None, page_starts: list | None = None) -> dict:
     """
     Runs all defined patterns against the text and returns the results.
 
+    Known models from the catalog (see model_catalog) are looked up first; the
+    pattern store's patterns are compiled once into a single matcher (see
+    pattern_engine) and catch models the catalog has not seen.
+
     Args:
         text: The full text content extracted from a PDF.
+        fuzzy: True for OCR text. Identifiers the OCR misread are then matched
+            to catalog models too (see fuzzy_models); those items carry the
+            "ocr_text" that was read and a "confidence".
+        engine: The PatternEngine to use; the current pattern store version if None.
+        page_starts: Offset in the text where each page starts, if known;
+            the items then carry the pages they were found on.
 
     Returns:
-        A dictionary containing the list of found items and a reason for status.
+        A dictionary containing the list of found items (with the character
+        spans of every occurrence), a reason for status and the pattern store
+        version used.
         Example: {
-            "found_items": [{"type": "model", "text": "ECOSYS M2540dn"}, ...],
-            "status_reason": "Data found."
+            "found_items": [{"type": "model", "text": "ECOSYS M2540dn", "spans": [[120, 134]], "pages": [1]}, ...],
+            "status_reason": "Data found.",
+            "pattern_version": "3f9a0c1d2b4e"
         }
     """
-    found_items = []
-    
-    # Iterate through each category of patterns (e.g., "model", "qa_number")
-    for item_type, regex_list in PATTERNS.items():
-        # Iterate through each regex pattern in the category
-        for pattern in regex_list:
-            try:
-                # Find all non-overlapping matches for the pattern in the text
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    found_text = match.group(0).strip()
-                    
-                    # Avoid adding duplicate entries
-                    is_duplicate = any(
-                        item['type'] == item_type and item['text'] == found_text
-                        for item in found_items
-                    )
-                    if not is_duplicate:
-                        found_items.append({"type": item_type, "text": found_text})
-            except re.error as e:
-                # This will catch any invalid regex patterns
-                print(f"Regex error for pattern '{pattern}': {e}")
+    # Catalog models first, then pattern order and text order, each (type, text) once
+    known_models = find_known_models(text, fuzzy)
+    engine = engine or get_pattern_engine()
+    found_items = engine.harvest(text, known_models, page_starts)
 
     status_reason = "Data found." if found_items else "No patterns matched."
     
-    return {"found_items": found_items, "status_reason": status_reason}
+    return {"found_items": found_items, "status_reason": status_reason, "pattern_version": engine.version}
+
+
+def reharvest(text: str, harvest_cache: dict | None = None, fuzzy: bool = False, engine=None,
+              page_starts: list | None = None) -> dict:
+    """
+    Harvests a cached text again after the pattern store changed, running only
+    the patterns that have no stored match set.
+
+    The stored match sets of patterns still in the store are reused, those of
+    removed patterns are dropped, and added or modified patterns (a modified
+    pattern has a new key) are matched now. The items equal a full
+    `harvest_all_data` of the text with the same known models.
+
+    Args:
+        text: The document's extracted text, as cached.
+        harvest_cache: The "harvest_cache" stored with the cached result, or
+            None to harvest from scratch.
+        fuzzy: True for OCR text (see `harvest_all_data`); only used when the
+            known models have to be looked up.
+        engine: The PatternEngine to use; the current pattern store version if None.
+        page_starts: Offset in the text where each page starts; the stored
+            ones if None.
+
+    Returns:
+        `harvest_all_data`'s dictionary, plus "harvest_cache" to store with the
+        result and "patterns_run", the number of patterns matched now.
+    """
+    engine = engine or get_pattern_engine()
+    harvest_cache = harvest_cache or {}
+    stored = harvest_cache.get("matches", {})
+    known_models = harvest_cache.get("known_models")
+    if page_starts is None:
+        page_starts = harvest_cache.get("page_starts")
+    if known_models is None:
+        known_models = find_known_models(text, fuzzy)
+
+    keys = engine.entry_keys()
+    missing = {i for i, key in enumerate(keys) if key not in stored}
+    fresh = engine.find(text, only=missing) if missing else []
+    spans = [fresh[i] if i in missing else [tuple(span) for span in stored[key]] for i, key in enumerate(keys)]
+    found_items = engine.assemble(text, spans, known_models, page_starts)
+
+    status_reason = "Data found." if found_items else "No patterns matched."
+    return {"found_items": found_items, "status_reason": status_reason, "pattern_version": engine.version,
+            "harvest_cache": {"matches": dict(zip(keys, spans)), "known_models": known_models, "page_starts": page_starts},
+            "patterns_run": len(missing)}
+
+
+class IncrementalHarvester:
+    """
+    Harvests a document page by page and decides when extraction can stop.
+
+    Each page is harvested as it arrives, like `harvest_all_data`; items are
+    de-duplicated across pages, and their spans are moved to offsets in the
+    joined text with the page they were found on. Each pattern's matches and
+    the known models are kept the same way, so the result carries the
+    "harvest_cache" of `reharvest` without matching the text a second time.
+
+    `feed()` returns True once the stop conditions are met, e.g.
+    {"model": 1, "qa_number": 1} means "at least one model and one QA number".
+    Pass stop_conditions=None for full-text mode, which never asks to stop.
+
+    The pattern engine is fixed when the harvester is created, so a whole
+    document is harvested with one pattern store version.
+    """
+
+    def __init__(self, stop_conditions: dict | None = None, engine=None):
+        self.stop_conditions = stop_conditions
+        self.engine = engine or get_pattern_engine()
+        self.found_items = []
+        self.page_texts = []
+        self.page_starts = []  # Offset of each page in "\n".join(page_texts)
+        self.ocr_used = False
+        self._matches = [[] for _ in self.engine.entries]  # Per entry, spans in the joined text
+        self._known_models = []
+        self._items = {}  # (type, text) -> item in found_items
+        self._counts = {}
+
+    def feed(self, page_text: str, ocr_used: bool = False) -> bool:
+        """Harvests one page. Returns True when the extractor may stop."""
+        offset = self.page_starts[-1] + len(self.page_texts[-1]) + 1 if self.page_texts else 0
+        self.page_starts.append(offset)
+        self.page_texts.append(page_text)
+        self.ocr_used = self.ocr_used or ocr_used
+        page = len(self.page_texts)
+        known_models = find_known_models(page_text, ocr_used)
+        page_spans = self.engine.find(page_text)
+        for matches, spans in zip(self._matches, page_spans):
+            matches.extend((start + offset, end + offset) for start, end in spans)
+        self._known_models.extend({**known, "start": known["start"] + offset, "end": known["end"] + offset}
+                                  for known in known_models)
+        for item in self.engine.assemble(page_text, page_spans, known_models):
+            spans = [[start + offset, end + offset] for start, end in item["spans"]]
+            key = (item["type"], item["text"])
+            known = self._items.get(key)
+            if known is None:
+                self._items[key] = {**item, "spans": spans, "pages": [page]}
+                self.found_items.append(self._items[key])
+                self._counts[item["type"]] = self._counts.get(item["type"], 0) + 1
+            else:
+                known["spans"].extend(spans)
+                known["pages"].append(page)
+        return self.is_satisfied()
+
+    def is_satisfied(self) -> bool:
+        if not self.stop_conditions:
+            return False
+        return all(self._counts.get(item_type, 0) >= needed for item_type, needed in self.stop_conditions.items())
+
+    def result(self) -> dict:
+        """
+        Same shape as `harvest_all_data`, plus the text read, page
+        bookkeeping and the "harvest_cache" (see `reharvest`). Spans and
+        "page_starts" are offsets in the returned text.
+        """
+        status_reason = "Data found." if self.found_items else "No patterns matched."
+        joined = "\n".join(self.page_texts)
+        lead = len(joined) - len(joined.lstrip())  # The text is stripped
+        found_items = [{**item, "spans": [[start - lead, end - lead] for start, end in item["spans"]]}
+                       for item in self.found_items]
+        page_starts = [max(0, start - lead) for start in self.page_starts]
+        matches = [[(start - lead, end - lead) for start, end in spans] for spans in self._matches]
+        known_models = [{**known, "start": known["start"] - lead, "end": known["end"] - lead} for known in self._known_models]
+        return {
+            "found_items": found_items,
+            "status_reason": status_reason,
+            "pattern_version": self.engine.version,
+            "harvest_cache": {"matches": dict(zip(self.engine.entry_keys(), matches)), "known_models": known_models,
+                              "page_starts": page_starts},
+            "text": joined.strip(),
+            "page_starts": page_starts,
+            "ocr_used": self.ocr_used,
+            "pages_read": len(self.page_texts),
+            "stopped_early": self.is_satisfied(),
+        }
+
+
+def harvest_pages(pages, stop_conditions: dict | None = HARVEST_STOP_CONDITIONS, engine=None) -> dict:
+    """
+    Consumes a page iterator (see `ocr_utils.iter_page_text`) until the stop conditions are met.
+
+    Args:
+        pages: Iterable of {"page", "text", "ocr_used"} dictionaries. If it is
+            a generator it is closed on an early stop, so no further pages are
+            extracted.
+        stop_conditions: Minimum count per item type, or None to read every page.
+        engine: The PatternEngine to use; the current pattern store version if None.
+
+    Returns:
+        The `IncrementalHarvester.result()` dictionary.
+    """
+    harvester = IncrementalHarvester(stop_conditions, engine)
+    try:
+        for page in pages:
+            if harvester.feed(page["text"], page.get("ocr_used", False)):
+                break
+    finally:
+        if hasattr(pages, "close"):
+            pages.close()
+    return harvester.result()
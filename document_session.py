@@ -0,0 +1,220 @@
+# document_session.py
+# One open PDF, shared by every stage that needs to look at it.
+#
+# Before this, a single document was opened three or four times (lock check,
+# OCR-needed check, text pass, OCR pass), and each open re-read the file and
+# re-parsed its xref - slow on network shares. A DocumentSession reads the file
+# bytes once, opens them once (lazily, so a cache hit never parses the PDF) and
+# answers the encrypted/corrupt checks, text-layer questions, page rendering
+# and the content hash from that same buffer.
+
+import hashlib
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from config import CLASSIFIER_SAMPLE_PAGES, EMBEDDED_IMAGE_MAX_DPI, EMBEDDED_IMAGE_MIN_COVERAGE, OCR_USE_EMBEDDED_IMAGES
+from page_classifier import PAGE_IMAGE, classify_pages, labels_cost
+
+
+class DocumentSession:
+    """
+    Reads a PDF once and serves all per-document queries from memory.
+
+    Usable as a context manager. Functions that accept "a path or a session"
+    go through `DocumentSession.ensure()`, so existing path-based callers keep
+    working while pipeline code passes one session down the whole chain.
+    """
+
+    def __init__(self, pdf_path, data: bytes | None = None):
+        self.path = Path(pdf_path)
+        self.data = data if data is not None else self.path.read_bytes()
+        self.progress_callback = None  # Called with the page index whenever a page is read or rendered
+        self.open_error = None
+        self._doc = None
+        self._opened = False
+        self._content_hash = None
+        self._page_text = {}
+        self._scan_xrefs = {}
+        self._page_labels = None
+        self.embedded_pages = 0  # OCR images taken straight from the file
+        self.rendered_pages = 0  # OCR images rasterized by MuPDF
+
+    @classmethod
+    def ensure(cls, source) -> tuple["DocumentSession", bool]:
+        """Returns (session, owned). `owned` is True when the caller must close it."""
+        if isinstance(source, cls):
+            return source, False
+        return cls(source), True
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def doc(self):
+        """The parsed document, or None if the file could not be opened."""
+        if not self._opened:
+            self._opened = True
+            try:
+                self._doc = fitz.open(stream=self.data, filetype="pdf")
+            except Exception as e:
+                self.open_error = str(e)
+        return self._doc
+
+    @property
+    def is_corrupt(self) -> bool:
+        return self.doc is None
+
+    @property
+    def is_encrypted(self) -> bool:
+        return self.doc is not None and bool(self.doc.is_encrypted)
+
+    @property
+    def page_count(self) -> int:
+        return self.doc.page_count if self.doc is not None else 0
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the file bytes. Stable across renames and copies."""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.data).hexdigest()
+        return self._content_hash
+
+    def page(self, index: int):
+        return self.doc[index]
+
+    def page_text(self, index: int, mode: str = "text", sort: bool = False) -> str:
+        """Direct (text-layer) text of one page, cached per mode."""
+        key = (index, mode, sort)
+        if key not in self._page_text:
+            self._report_progress(index)
+            self._page_text[key] = self.doc[index].get_text(mode, sort=sort)
+        return self._page_text[key]
+
+    def text_length(self) -> int:
+        """Total text-layer characters, ignoring whitespace around each page."""
+        return sum(len(self.page_text(i).strip()) for i in range(self.page_count))
+
+    def text_density(self) -> float:
+        """Average text-layer characters per page."""
+        return self.text_length() / self.page_count if self.page_count else 0.0
+
+    def page_labels(self) -> list[str]:
+        """Per-page 'text' / 'image' / 'mixed' labels from page_classifier, computed once."""
+        if self._page_labels is None:
+            self._page_labels = classify_pages(self.doc, self.page_text) if self.doc is not None and not self.is_encrypted else []
+        return self._page_labels
+
+    def adopt_page_labels(self, labels: list[str] | None):
+        """Keeps labels computed elsewhere for this document, e.g. by the watchdog worker's copy of the session."""
+        if self._page_labels is None and labels is not None:
+            self._page_labels = list(labels)
+
+    def work_cost(self) -> float:
+        """The document's relative processing cost for the job ETA, from its labels if they were computed."""
+        return labels_cost(self._page_labels)
+
+    def needs_ocr(self, min_text_length: int) -> bool:
+        """
+        True when the document has no usable text layer.
+
+        Decided from the page labels, so long documents are not text-extracted
+        just to find out. Short documents, whose pages the classifier has read
+        anyway, must also reach `min_text_length` characters in total.
+        """
+        if all(label == PAGE_IMAGE for label in self.page_labels()):
+            return True
+        if self.page_count <= CLASSIFIER_SAMPLE_PAGES:
+            return self.text_length() < min_text_length
+        return False
+
+    def render_page(self, index: int, dpi: int = 300, clip=None, gray: bool = False):
+        """Rasterizes one page (optionally a clip rectangle of it) to a pixmap."""
+        self._report_progress(index)
+        colorspace = fitz.csGRAY if gray else fitz.csRGB
+        return self.doc[index].get_pixmap(dpi=dpi, clip=clip, colorspace=colorspace)
+
+    def scan_image_xref(self, index: int) -> int:
+        """
+        Returns the xref of the image when the page is a plain scan, else 0.
+
+        A plain scan is one upright, unrotated image covering (nearly) the
+        whole page with no text layer on top. Anything else is composite and
+        has to be rendered to be seen the way a reader sees it.
+        """
+        return self._scan_image(index)[0]
+
+    def _scan_image(self, index: int) -> tuple[int, int, int]:
+        """(xref, width, height) of the page's scan image, or (0, 0, 0)."""
+        if index not in self._scan_xrefs:
+            self._scan_xrefs[index] = self._find_scan_image(index)
+        return self._scan_xrefs[index]
+
+    def _find_scan_image(self, index: int) -> tuple[int, int, int]:
+        none = (0, 0, 0)
+        page = self.doc[index]
+        if page.rotation != 0 or self.page_text(index).strip():
+            return none
+        images = page.get_image_info(xrefs=True)
+        if len(images) != 1 or images[0]["xref"] <= 0:
+            return none
+        a, b, c, d, _, _ = images[0]["transform"]
+        if b != 0 or c != 0 or a <= 0 or d <= 0:
+            return none  # Rotated, sheared or mirrored placement
+        bbox = fitz.Rect(images[0]["bbox"]) & page.rect
+        if bbox.is_empty or bbox.get_area() < EMBEDDED_IMAGE_MIN_COVERAGE * page.rect.get_area():
+            return none
+        return images[0]["xref"], images[0]["width"], images[0]["height"]
+
+    def ocr_pixel_count(self, index: int, dpi: int = 300) -> int:
+        """Pixels `ocr_pixmap` would decode or render for this page, without producing them."""
+        xref, width, height = self._scan_image(index) if OCR_USE_EMBEDDED_IMAGES else (0, 0, 0)
+        if xref:
+            return width * height
+        rect = self.doc[index].rect
+        return round(rect.width * dpi / 72) * round(rect.height * dpi / 72)
+
+    def ocr_pixmap(self, index: int, dpi: int = 300):
+        """
+        Gray pixmap of one page for OCR.
+
+        Plain scans are decoded straight from their embedded image stream at
+        native resolution (halved while above EMBEDDED_IMAGE_MAX_DPI), which
+        skips rasterizing and resampling the page. Composite pages, and any
+        image MuPDF cannot decode on its own, are rendered at `dpi`.
+        """
+        xref = self.scan_image_xref(index) if OCR_USE_EMBEDDED_IMAGES else 0
+        if xref:
+            self._report_progress(index)
+            try:
+                pix = fitz.Pixmap(self.doc, xref)
+                if pix.alpha:
+                    pix = fitz.Pixmap(pix, 0)
+                if pix.colorspace is None or pix.colorspace.n != 1:
+                    pix = fitz.Pixmap(fitz.csGRAY, pix)
+                page_width_in = self.doc[index].rect.width / 72
+                while pix.width / page_width_in > EMBEDDED_IMAGE_MAX_DPI:
+                    pix.shrink(1)
+                self.embedded_pages += 1
+                return pix
+            except Exception:
+                pass  # Unusual filter or colorspace; fall back to rendering
+        self.rendered_pages += 1
+        return self.render_page(index, dpi=dpi, gray=True)
+
+    def _report_progress(self, index: int):
+        if self.progress_callback is not None:
+            self.progress_callback(index)
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+        self._doc = None
+        self._page_text.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,180 @@
+# fuzzy_models.py
+# OCR-tolerant model lookup against the known-model catalog.
+#
+# OCR regularly mangles identifiers ("TASKaIfa", "EC0SYS M2540dn", "PF-74O"), and
+# those documents then fall into Needs Review. Comparing every OCR token with
+# thousands of catalog models would be far too slow, so the catalog is indexed
+# by character trigrams of a confusion-folded key (0/O, 1/l/I, 5/S, 8/B, 2/Z fold
+# to one character each). A token is compared only with the models that share
+# enough trigrams with it, using an edit distance in which a substitution
+# between confusable characters is cheap, and the comparison gives up as soon
+# as the bound is exceeded. The bound (FUZZY_MAX_DISTANCE) is below the cost of
+# any other edit, so a correctly read model that is missing from the catalog is
+# never replaced by a catalog neighbour one real edit away ("TASKalfa 5012i" is
+# not "TASKalfa 3012i"). Tokens a model pattern matches as written are not
+# corrected either (see PatternEngine.assemble).
+
+import re
+
+from config import FUZZY_CONFUSION_COST, FUZZY_MAX_DISTANCE, FUZZY_MIN_CONFIDENCE
+from pattern_engine import fold_text
+
+GRAM = 3
+# Characters OCR confuses, folded to one representative each
+CONFUSION_CLASSES = ["0oq", "1li|!", "5s", "8b", "2z", "6g"]
+_CONFUSION = {ch: group[0] for group in CONFUSION_CLASSES for ch in group}
+_TOKENS = re.compile(r"[\w|!][\w|!+-]*")
+
+
+def model_key(text: str) -> str:
+    """Case-folded, whitespace-free form used for fuzzy comparison."""
+    return "".join(fold_text(text).split())
+
+
+def _confusion_key(key: str) -> str:
+    return "".join(_CONFUSION.get(ch, ch) for ch in key)
+
+
+def _grams(key: str) -> set[str]:
+    padded = f"#{_confusion_key(key)}#"
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+def _substitution_cost(a: str, b: str) -> float:
+    if a == b:
+        return 0.0
+    return FUZZY_CONFUSION_COST if _CONFUSION.get(a, a) == _CONFUSION.get(b, b) else 1.0
+
+
+def confusion_distance(a: str, b: str, bound: float = FUZZY_MAX_DISTANCE) -> float | None:
+    """
+    Edit distance between two keys where confusable substitutions cost
+    FUZZY_CONFUSION_COST. Returns None as soon as it must exceed `bound`.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return None
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [float(i)]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + _substitution_cost(ca, cb)))
+        if min(current) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
+
+
+class FuzzyModelIndex:
+    """Trigram index over canonical model names for bounded, confusion-aware lookup."""
+
+    def __init__(self, models):
+        self.models = sorted(set(models))
+        self._keys = [model_key(m) for m in self.models]
+        self._exact = {key: i for i, key in enumerate(self._keys)}
+        self._postings = {}
+        self._recent = {}  # Token key -> lookup result; manuals repeat the same identifiers
+        for i, key in enumerate(self._keys):
+            for gram in _grams(key):
+                self._postings.setdefault(gram, []).append(i)
+
+    def lookup(self, token: str) -> tuple[str, float] | None:
+        """
+        The closest catalog model to an OCR token.
+
+        Returns:
+            (canonical model, confidence between 0 and 1), or None when no
+            model is within FUZZY_MAX_DISTANCE or the confidence is below
+            FUZZY_MIN_CONFIDENCE. Exact matches have confidence 1.0.
+        """
+        key = model_key(token)
+        if key in self._exact:
+            return self.models[self._exact[key]], 1.0
+        if key not in self._recent:
+            if len(self._recent) > 10000:
+                self._recent.clear()
+            self._recent[key] = self._lookup(key)
+        return self._recent[key]
+
+    def _lookup(self, key: str) -> tuple[str, float] | None:
+        grams = _grams(key)
+        # Every real (non-confusion) edit destroys at most GRAM trigrams; confusions destroy none
+        needed = max(1, len(grams) - GRAM * int(FUZZY_MAX_DISTANCE))
+        shared = {}
+        for gram in grams:
+            for i in self._postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+
+        best, best_distance = None, None
+        for i, count in shared.items():
+            if count < needed:
+                continue
+            bound = FUZZY_MAX_DISTANCE if best_distance is None else best_distance
+            distance = confusion_distance(key, self._keys[i], bound)
+            if distance is not None and (best_distance is None or distance < best_distance):
+                best, best_distance = i, distance
+        if best is None:
+            return None
+        confidence = round(1 - best_distance / max(len(key), len(self._keys[best])), 3)
+        return (self.models[best], confidence) if confidence >= FUZZY_MIN_CONFIDENCE else None
+
+    def find(self, text: str, skip_spans: list | None = None) -> list[dict]:
+        """
+        Looks up the identifier-like tokens of a text.
+
+        Single tokens with letters and digits are tried, and so are a word
+        followed by a token with digits ("EC0SYS M2540dn"), the pair first.
+        Tokens overlapping `skip_spans` ((start, end, ...) tuples, e.g. exact
+        catalog hits) are left alone.
+
+        Returns:
+            [{"start", "end", "text": canonical model, "ocr_text", "confidence"}, ...]
+            in text order, for corrected (not exact) matches only.
+        """
+        skip_spans = skip_spans or []
+        tokens = [m for m in _TOKENS.finditer(text)
+                  if not any(s < m.end() and m.start() < e for s, e, *_ in skip_spans)]
+        found = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            candidates = []
+            if i + 1 < len(tokens) and _is_word(token.group()) and _has_digit(tokens[i + 1].group()) \
+                    and text[token.end():tokens[i + 1].start()].isspace():
+                candidates.append((token.start(), tokens[i + 1].end(), 2))
+            if _has_digit(token.group()) and any(ch.isalpha() for ch in token.group()):
+                candidates.append((token.start(), token.end(), 1))
+            i += 1
+            for start, end, consumed in candidates:
+                ocr_text = text[start:end]
+                if not 4 <= len(ocr_text) <= 40:
+                    continue
+                match = self.lookup(ocr_text)
+                if match and match[1] < 1.0:
+                    found.append({"start": start, "end": end, "text": match[0],
+                                  "ocr_text": " ".join(ocr_text.split()), "confidence": match[1]})
+                    i += consumed - 1
+                    break
+        return found
+
+
+def _is_word(token: str) -> bool:
+    return len(token) >= 3 and not _has_digit(token.replace("0", "o").replace("1", "l"))
+
+
+def _has_digit(token: str) -> bool:
+    return any(ch.isdigit() for ch in token)
+
+
+_index = None
+_index_source = None
+
+
+def get_fuzzy_index(catalog) -> FuzzyModelIndex | None:
+    """The fuzzy index for a `model_catalog.ModelCatalog`, rebuilt when the catalog changes."""
+    global _index, _index_source
+    if catalog is None:
+        return None
+    if _index is None or _index_source is not catalog:
+        _index = FuzzyModelIndex(catalog.models)
+        _index_source = catalog
+    return _index
@@ -1,7 +1,10 @@
 # gui_components.py
+import bisect
 import tkinter as tk
 from tkinter import ttk
 
+from config import OCR_PROFILES
+
 def create_main_header(parent, version, colors):
     header = ttk.Frame(parent, style="Header.TFrame", padding=(10, 10))
     header.grid(row=0, column=0, sticky="ew")
@@ -50,10 +53,20 @@ def create_process_controls(parent, app):
     
     app.fullscreen_btn = ttk.Button(ctrl, text=" Fullscreen", image=app.fullscreen_icon, compound="left", command=app.toggle_fullscreen)
     app.fullscreen_btn.grid(row=2, column=1, sticky="ew", pady=2)
+
+    app.fast_mode_chk = ttk.Checkbutton(ctrl, text="Fast OCR (header regions first)", variable=app.fast_mode_var)
+    app.fast_mode_chk.grid(row=2, column=2, sticky="w", padx=5, pady=2)
     
     app.exit_btn = ttk.Button(ctrl, text=" Exit", image=app.exit_icon, compound="left", command=app.on_closing)
     app.exit_btn.grid(row=2, column=3, sticky="ew", pady=2)
 
+    ttk.Label(ctrl, text="OCR profile:").grid(row=3, column=0, sticky="e", padx=5, pady=2)
+    app.ocr_profile_combo = ttk.Combobox(ctrl, textvariable=app.ocr_profile_var, values=list(OCR_PROFILES), state="readonly")
+    app.ocr_profile_combo.grid(row=3, column=1, sticky="ew", pady=2)
+
+    app.search_btn = ttk.Button(ctrl, text=" Search Texts", command=app.open_search_window)
+    app.search_btn.grid(row=3, column=3, sticky="ew", pady=2)
+
 def create_status_and_log_section(parent, app):
     stat = ttk.LabelFrame(parent, text="3. Status & Logs", padding=10)
     stat.grid(row=2, column=0, sticky="nsew", pady=5)
@@ -76,7 +89,7 @@ def create_status_and_log_section(parent, app):
 
     sum_frame = ttk.Frame(stat)
     sum_frame.grid(row=2, column=0, sticky="ew", padx=5, pady=2)
-    counters = [("Pass:", app.count_pass, "Green"), ("Fail:", app.count_fail, "Red"), ("Review:", app.count_review, "Orange"), ("OCR:", app.count_ocr, "Blue")]
+    counters = [("Pass:", app.count_pass, "Green"), ("Fail:", app.count_fail, "Red"), ("Review:", app.count_review, "Orange"), ("OCR:", app.count_ocr, "Blue"), ("Timeout:", app.count_timeout, "Red")]
     for i, (text, var, color) in enumerate(counters):
         ttk.Label(sum_frame, text=text, style="Status.Header.TLabel").pack(side="left", padx=(15, 2))
         ttk.Label(sum_frame, textvariable=var, style=f"Count.{color}.TLabel").pack(side="left")
@@ -101,4 +114,24 @@ def create_status_and_log_section(parent, app):
     app.log_text.grid(row=0, column=0, sticky="nsew")
     log_scroll = ttk.Scrollbar(log_frame, command=app.log_text.yview)
     log_scroll.grid(row=0, column=1, sticky="ns")
-    app.log_text.config(yscrollcommand=log_scroll.set)
\ No newline at end of file
+    app.log_text.config(yscrollcommand=log_scroll.set)
+
+
+def highlight_spans(text_widget, text, spans_by_tag):
+    """
+    Tags character spans of the text shown in a Text widget, one tag_add call per tag.
+
+    Args:
+        text_widget: The tk.Text showing `text` from "1.0".
+        text: The text, used to turn offsets into line.column indices.
+        spans_by_tag: {tag: [[start, end], ...]} offsets into `text`,
+            e.g. the "spans" of harvested items.
+    """
+    line_starts = [0] + [i + 1 for i, ch in enumerate(text) if ch == "\n"]
+    def index(offset):
+        line = bisect.bisect_right(line_starts, offset)
+        return f"{line}.{offset - line_starts[line - 1]}"
+    for tag, spans in spans_by_tag.items():
+        indices = [index(offset) for span in spans for offset in span]
+        if indices:
+            text_widget.tag_add(tag, *indices)
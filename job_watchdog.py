@@ -0,0 +1,185 @@
+# job_watchdog.py
+# Runs document extraction in a worker process that can be killed when it hangs.
+#
+# A malformed scan can hang Tesseract, and a broken content stream can keep
+# MuPDF busy indefinitely; either used to stall the whole job loop. The
+# watchdog hands each document to a long-lived worker process and listens for
+# the progress pings the worker's DocumentSession sends whenever a page is read
+# or rendered. When a page runs past PAGE_TIMEOUT_SECONDS, or the document past
+# DOCUMENT_TIMEOUT_SECONDS, the worker is killed, a fresh one is started for the
+# next document, and ExtractionTimeoutError is raised for the current one.
+
+import multiprocessing
+import threading
+import time
+
+from config import DOCUMENT_TIMEOUT_SECONDS, PAGE_TIMEOUT_SECONDS
+from custom_exceptions import ExtractionTimeoutError, PDFExtractionError
+from document_session import DocumentSession
+from ocr_backends import ocr_latency_report
+
+WORKER_STARTUP_TIMEOUT = 60  # Importing OpenCV and MuPDF in a fresh process is not charged to a page
+
+
+class _PipeQueue:
+    """Stands in for the progress queue inside the worker; the parent relays each message."""
+
+    def __init__(self, send):
+        self._send = send
+
+    def put(self, msg):
+        self._send(("progress", msg))
+
+
+def _worker_main(conn, target):
+    """Worker loop: extract one document per task until told to stop."""
+    # Pages may be read from a render thread (see ocr_pipeline), so sends are serialized.
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    progress_queue = _PipeQueue(send)
+    send(("ready", None))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        pdf_path, data, kwargs = task
+        session = DocumentSession(pdf_path, data)
+        session.progress_callback = lambda page: send(("page", page))
+        result, error = None, None
+        try:
+            result = target(session, progress_queue, **kwargs)
+        except Exception as e:
+            error = str(e)
+        finally:
+            session.close()
+        send(("done", (result, error, ocr_latency_report())))
+
+
+class DocumentWatchdog:
+    """
+    Runs `target(session, progress_queue, **kwargs)` for one document at a time
+    in a supervised worker process.
+
+    `target` must be a module-level function so it can be sent to the worker.
+    Progress messages it puts on its queue are forwarded to the caller's queue.
+    Use as a context manager so the worker is shut down with the job.
+    """
+
+    def __init__(self, target, page_timeout: float = PAGE_TIMEOUT_SECONDS,
+                 document_timeout: float = DOCUMENT_TIMEOUT_SECONDS):
+        self.target = target
+        self.page_timeout = page_timeout
+        self.document_timeout = document_timeout
+        self.timeouts = 0
+        self.restarts = 0
+        # Spawned workers do not inherit the GUI's threads or Tk state.
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._latency = {}  # worker pid -> its last OCR latency report
+
+    def _start(self):
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(target=_worker_main, args=(child_conn, self.target), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        if not self._conn.poll(WORKER_STARTUP_TIMEOUT):
+            self._kill()
+            raise PDFExtractionError("Extraction worker did not start.")
+        self._conn.recv()
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(5)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+        self._process, self._conn = None, None
+
+    def run(self, session: DocumentSession, progress_queue, **kwargs):
+        """
+        Extracts one document under the page and document budgets.
+
+        Args:
+            session: The document. Its bytes are sent to the worker, so the
+                file is not read again.
+            progress_queue: Receives the worker's progress messages.
+            **kwargs: Passed on to `target`.
+
+        Returns:
+            Whatever `target` returned.
+
+        Raises:
+            ExtractionTimeoutError: A budget was exceeded; the worker was replaced.
+            PDFExtractionError: The worker crashed or `target` raised.
+        """
+        if self._process is None or not self._process.is_alive():
+            if self._process is not None:
+                self.restarts += 1
+                self._kill()
+            self._start()
+
+        self._conn.send((str(session.path), session.data, kwargs))
+        started = last_progress = time.monotonic()
+        page = 0
+        while True:
+            now = time.monotonic()
+            page_left = last_progress + self.page_timeout - now
+            document_left = started + self.document_timeout - now
+            if min(page_left, document_left) <= 0:
+                self._kill()
+                self.restarts += 1
+                self.timeouts += 1
+                if document_left <= 0:
+                    raise ExtractionTimeoutError(f"Timed out: document exceeded {self.document_timeout}s")
+                raise ExtractionTimeoutError(f"Timed out: page {page + 1} exceeded {self.page_timeout}s")
+
+            try:
+                if not self._conn.poll(min(page_left, document_left)):
+                    continue
+                kind, payload = self._conn.recv()
+            except (EOFError, OSError):
+                self._kill()
+                self.restarts += 1
+                raise PDFExtractionError("Extraction worker crashed.")
+
+            if kind == "page":
+                page, last_progress = payload, time.monotonic()
+            elif kind == "progress":
+                progress_queue.put(payload)
+            elif kind == "done":
+                result, error, latency = payload
+                self._latency[self._process.pid] = latency
+                if error is not None:
+                    raise PDFExtractionError(error)
+                return result
+
+    def latency_report(self) -> list[dict]:
+        """OCR latency summaries from every worker that finished a document."""
+        return [summary for report in self._latency.values() for summary in report]
+
+    def close(self):
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._conn.send(None)
+                self._process.join(5)
+            except (BrokenPipeError, OSError):
+                pass
+        self._kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -8,10 +8,10 @@ import time
 import importlib
 import sys
 
-from config import BRAND_COLORS, ASSETS_DIR
+from config import BRAND_COLORS, ASSETS_DIR, OCR_FAST_MODE, DEFAULT_OCR_PROFILE
 from processing_engine import run_processing_job
 from file_utils import open_file, ensure_folders, cleanup_temp_files
-from kyo_review_tool import ReviewWindow
+from kyo_review_tool import ReviewWindow, SearchWindow
 from version import VERSION
 import logging_utils
 from gui_components import (
@@ -29,6 +29,7 @@ class KyoQAToolApp(tk.Tk):
         self.count_fail = tk.IntVar(value=0)
         self.count_review = tk.IntVar(value=0)
         self.count_ocr = tk.IntVar(value=0)
+        self.count_timeout = tk.IntVar(value=0)
         self.count_needs_review = self.count_review
 
         self.is_processing = False
@@ -42,6 +43,8 @@ class KyoQAToolApp(tk.Tk):
         self.pause_event = threading.Event()
         self.selected_folder = tk.StringVar()
         self.selected_excel = tk.StringVar()
+        self.fast_mode_var = tk.BooleanVar(value=OCR_FAST_MODE)
+        self.ocr_profile_var = tk.StringVar(value=DEFAULT_OCR_PROFILE)
         self.selected_files_list = []
         self.status_current_file = tk.StringVar(value="Ready to process")
         self.progress_value = tk.DoubleVar(value=0)
@@ -177,7 +180,7 @@ class KyoQAToolApp(tk.Tk):
             if not excel_path:
                 messagebox.showwarning("Input Missing", "Please select a base Excel file.")
                 return
-            job = {"excel_path": excel_path, "input_path": input_path}
+            job = {"excel_path": excel_path, "input_path": input_path, "fast_mode": self.fast_mode_var.get(), "ocr_profile": self.ocr_profile_var.get()}
             self.last_run_info = job
         job["is_rerun"] = is_rerun
         self.update_ui_for_start()
@@ -194,7 +197,7 @@ class KyoQAToolApp(tk.Tk):
             return
         files = [item["pdf_path"] for item in self.reviewable_files]
         self.log_message(f"Re-running {len(files)} flagged files...", "info")
-        self.start_processing(job={"excel_path": self.result_file_path, "input_path": files}, is_rerun=True)
+        self.start_processing(job={"excel_path": self.result_file_path, "input_path": files, "fast_mode": self.fast_mode_var.get(), "ocr_profile": self.ocr_profile_var.get()}, is_rerun=True)
 
     def browse_excel(self):
         path = filedialog.askopenfilename(title="Select Excel Template", filetypes=[("Excel Files", "*.xlsx *.xlsm"), ("All Files", "*.*")])
@@ -277,6 +280,9 @@ class KyoQAToolApp(tk.Tk):
         ttk.Button(button_frame, text="Model Patterns", command=lambda: open_review("MODEL_PATTERNS", "Model Patterns")).pack(side="left", padx=10)
         ttk.Button(button_frame, text="QA Patterns", command=lambda: open_review("QA_NUMBER_PATTERNS", "QA Number Patterns")).pack(side="left", padx=10)
 
+    def open_search_window(self):
+        SearchWindow(self)
+
     def set_led(self, status):
         led_config = {
             "Ready": ("#107C10", BRAND_COLORS["status_default_bg"]),
@@ -303,7 +309,7 @@ class KyoQAToolApp(tk.Tk):
         self.is_paused = False
         self.cancel_event.clear()
         self.pause_event.clear()
-        for var in [self.count_pass, self.count_fail, self.count_review, self.count_ocr]: var.set(0)
+        for var in [self.count_pass, self.count_fail, self.count_review, self.count_ocr, self.count_timeout]: var.set(0)
         self.reviewable_files.clear()
         self.review_tree.delete(*self.review_tree.get_children())
         self.process_btn.config(state=tk.DISABLED)
@@ -314,6 +320,8 @@ class KyoQAToolApp(tk.Tk):
         self.exit_btn.config(state=tk.DISABLED)
         self.rerun_btn.config(state=tk.DISABLED)
         self.review_file_btn.config(state=tk.DISABLED)
+        self.fast_mode_chk.config(state=tk.DISABLED)
+        self.ocr_profile_combo.config(state=tk.DISABLED)
         self.status_current_file.set("Initializing...")
         self.time_remaining_var.set("Calculating...")
         self.progress_value.set(0)
@@ -327,6 +335,8 @@ class KyoQAToolApp(tk.Tk):
         self.stop_btn.config(state=tk.DISABLED)
         self.exit_btn.config(state=tk.NORMAL)
         self.review_btn.config(state=tk.NORMAL)
+        self.fast_mode_chk.config(state=tk.NORMAL)
+        self.ocr_profile_combo.config(state="readonly")
         if self.result_file_path: self.open_result_btn.config(state=tk.NORMAL)
         if self.reviewable_files: self.rerun_btn.config(state=tk.NORMAL)
         final_status = "Complete" if status == "Complete" else "Error"
@@ -369,7 +379,10 @@ class KyoQAToolApp(tk.Tk):
                 elif mtype == "status":
                     self.status_current_file.set(msg.get("msg", ""))
                     if "led" in msg: self.set_led(msg["led"])
-                elif mtype == "progress": self.update_progress(msg.get("current", 0), msg.get("total", 1))
+                elif mtype == "progress":
+                    # Page-weighted work units when the engine sends them, file counts otherwise
+                    if "work_total" in msg: self.update_progress(msg["work_done"], msg["work_total"])
+                    else: self.update_progress(msg.get("current", 0), msg.get("total", 1))
                 elif mtype == "increment_counter":
                     var = getattr(self, f"count_{msg.get('counter')}", None)
                     if var: var.set(var.get() + 1)
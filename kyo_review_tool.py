@@ -2,11 +2,21 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, simpledialog
 from pathlib import Path
+import queue
 import re
-import importlib
+import sqlite3
+import threading
+import time
 
-from config import BRAND_COLORS
+from config import BRAND_COLORS, PATTERN_TIME_BUDGET_SECONDS
 import config as config_module 
+from file_utils import open_file
+from gui_components import highlight_spans
+from pattern_impact import format_impact_report, preview_impact
+from pattern_profiler import format_cost, profile_patterns, sample_corpus
+from pattern_store import PATTERN_LISTS, load_patterns, update_pattern_list
+from search_index import SearchIndex
+from text_corpus import get_text_corpus
 
 #==============================================================
 # --- MODIFICATION: Rewritten to avoid f-string syntax error ---
@@ -34,16 +44,20 @@ def generate_regex_from_sample(sample: str) -> str:
 
 
 class ReviewWindow(tk.Toplevel):
-    """A generic regex pattern management tool that safely edits a separate custom_patterns.py file."""
+    """A generic regex pattern management tool that edits one pattern list of the pattern store (patterns.json)."""
     def __init__(self, parent, pattern_name: str, pattern_label: str, file_info: dict = None):
         super().__init__(parent)
         
         self.pattern_name = pattern_name
         self.pattern_label = pattern_label
         self.file_info = file_info
-        self.custom_patterns_path = Path("custom_patterns.py")
+        # Windows are opened by list name (e.g. MODEL_PATTERNS); the store is keyed by item type
+        self.item_type = next((t for t, name in PATTERN_LISTS.items() if name == pattern_name), pattern_name)
+        self._patterns = {}  # Tree item -> pattern string
+        self._costs = {}  # Pattern string -> profiler result (see pattern_profiler)
+        self._background = queue.Queue()  # (callback, result) of background work, delivered by _poll_background
         
-        self.title(f"Manage Custom: {self.pattern_label}")
+        self.title(f"Manage Patterns: {self.pattern_label}")
         self.geometry("1000x700")
         self.configure(bg=BRAND_COLORS["background"])
 
@@ -60,18 +74,26 @@ class ReviewWindow(tk.Toplevel):
         
         ttk.Label(manager_frame, text=self.pattern_label, font=("Segoe UI", 12, "bold")).grid(row=0, column=0, columnspan=2, sticky="w")
         
-        self.pattern_listbox = tk.Listbox(manager_frame, font=("Consolas", 9), height=15)
-        self.pattern_listbox.grid(row=1, column=0, columnspan=2, sticky="nsew", pady=5)
-        self.pattern_listbox.bind("<<ListboxSelect>>", self.on_pattern_select)
-        pattern_scrollbar = ttk.Scrollbar(manager_frame, orient="vertical", command=self.pattern_listbox.yview)
+        self.pattern_tree = ttk.Treeview(manager_frame, columns=("pattern", "cost"), show="headings", height=15, selectmode="browse")
+        self.pattern_tree.heading("pattern", text="Pattern")
+        self.pattern_tree.heading("cost", text="Cost (sample)")
+        self.pattern_tree.column("pattern", width=230)
+        self.pattern_tree.column("cost", width=140)
+        self.pattern_tree.tag_configure("costly", foreground=BRAND_COLORS["fail_red"])
+        self.pattern_tree.grid(row=1, column=0, columnspan=2, sticky="nsew", pady=5)
+        self.pattern_tree.bind("<<TreeviewSelect>>", self.on_pattern_select)
+        pattern_scrollbar = ttk.Scrollbar(manager_frame, orient="vertical", command=self.pattern_tree.yview)
         pattern_scrollbar.grid(row=1, column=2, sticky="ns", pady=5)
-        self.pattern_listbox.config(yscrollcommand=pattern_scrollbar.set)
+        self.pattern_tree.config(yscrollcommand=pattern_scrollbar.set)
         
         btn_frame = ttk.Frame(manager_frame)
         btn_frame.grid(row=2, column=0, columnspan=2, pady=5)
         ttk.Button(btn_frame, text="Add as New", command=self.add_pattern).pack(side="left", padx=5)
         self.remove_btn = ttk.Button(btn_frame, text="Remove Selected", command=self.remove_pattern, state=tk.DISABLED)
         self.remove_btn.pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Profile Costs", command=lambda: self.profile_patterns_async(self.listed_patterns())).pack(side="left", padx=5)
+        self.impact_btn = ttk.Button(btn_frame, text="Preview Impact", command=self.preview_impact)
+        self.impact_btn.pack(side="left", padx=5)
         
         ttk.Label(manager_frame, text="Test / Edit Pattern:", font=("Segoe UI", 10, "bold")).grid(row=3, column=0, columnspan=2, sticky="w", pady=(10,0))
         self.pattern_entry = ttk.Entry(manager_frame, font=("Consolas", 10))
@@ -86,7 +108,8 @@ class ReviewWindow(tk.Toplevel):
         self.test_btn.pack(side="left", padx=5)
         ttk.Button(test_save_frame, text="Update List", command=self.update_pattern_in_list).pack(side="left", padx=5)
         
-        ttk.Button(manager_frame, text="Save All Patterns", style="Red.TButton", command=self.save_patterns_to_config).grid(row=6, column=0, columnspan=2, pady=10, sticky="ew")
+        self.save_btn = ttk.Button(manager_frame, text="Save All Patterns", style="Red.TButton", command=self.save_patterns_to_config)
+        self.save_btn.grid(row=6, column=0, columnspan=2, pady=10, sticky="ew")
 
         self.pdf_text = tk.Text(text_frame, wrap="word", font=("Consolas", 9), relief="solid", borderwidth=1)
         self.pdf_text.pack(fill="both", expand=True, side="left")
@@ -106,53 +129,134 @@ class ReviewWindow(tk.Toplevel):
         self.load_patterns_from_config()
 
     def load_patterns_from_config(self):
-        """Dynamically loads the specified pattern list from the custom_patterns.py file."""
-        self.pattern_listbox.delete(0, tk.END)
-        patterns_to_load = []
+        """Loads this window's pattern list from the pattern store and profiles it in the background."""
+        self.pattern_tree.delete(*self.pattern_tree.get_children())
+        self._patterns.clear()
+        patterns, _ = load_patterns()
+        for pattern in patterns.get(self.item_type, []):
+            self.insert_pattern(pattern)
+        self.profile_patterns_async(self.listed_patterns())
+
+    def listed_patterns(self) -> list:
+        return [self._patterns[item] for item in self.pattern_tree.get_children()]
+
+    def insert_pattern(self, pattern: str, index="end"):
+        cost = self._costs.get(pattern)
+        item = self.pattern_tree.insert("", index, values=(pattern, format_cost(cost) if cost else ""),
+                                        tags=("costly",) if cost and (cost["over_budget"] or cost["risks"]) else ())
+        self._patterns[item] = pattern
+        return item
+
+    def _profile_texts(self) -> list:
+        texts = sample_corpus()
+        if self.file_info:
+            texts.append(self.pdf_text.get("1.0", "end"))
+        return texts
+
+    def profile_patterns_async(self, patterns: list):
+        """Times patterns over the review texts in a background thread and shows the costs in the list."""
+        if not patterns:
+            return
+        texts = self._profile_texts()
+        self.run_in_background(lambda: profile_patterns(patterns, texts), self.show_costs)
+
+    def run_in_background(self, work, callback):
+        """Runs work() in a thread and passes its result to callback() on the Tk thread."""
+        def target():
+            try:
+                self._background.put((callback, work()))
+            except Exception as e:
+                self._background.put((self._background_failed, e))
+        threading.Thread(target=target, daemon=True).start()
+        self.after(200, self._poll_background)
+
+    def _background_failed(self, error):
+        self.impact_btn.config(state=tk.NORMAL)
+        self.save_btn.config(state=tk.NORMAL)
+        self.config(cursor="")
+        messagebox.showerror("Error", f"Background task failed:\n{error}", parent=self)
+
+    def _poll_background(self):
+        if not self.winfo_exists():
+            return
         try:
-            import custom_patterns as custom_module
-            importlib.reload(custom_module)
-            patterns_to_load = getattr(custom_module, self.pattern_name, [])
-        except (ImportError, SyntaxError):
-            pass 
-        for pattern in patterns_to_load:
-            self.pattern_listbox.insert(tk.END, pattern)
+            callback, result = self._background.get_nowait()
+        except queue.Empty:
+            self.after(200, self._poll_background)
+            return
+        callback(result)
+
+    def preview_impact(self):
+        """Compares the listed patterns with the saved ones over every cached text and shows the differences."""
+        patterns, _ = load_patterns()
+        candidate = dict(patterns)
+        candidate[self.item_type] = list(dict.fromkeys(self.listed_patterns()))
+        self.impact_btn.config(state=tk.DISABLED)
+        self.run_in_background(lambda: preview_impact(candidate, patterns), self.show_impact)
+
+    def show_impact(self, report: dict):
+        self.impact_btn.config(state=tk.NORMAL)
+        window = tk.Toplevel(self)
+        window.title(f"Pattern Impact: {self.pattern_label}")
+        window.geometry("700x500")
+        text = tk.Text(window, wrap="none", font=("Consolas", 9))
+        text.pack(fill="both", expand=True)
+        text.insert("1.0", format_impact_report(report))
+        text.config(state=tk.DISABLED)
+
+    def show_costs(self, costs: list):
+        self._costs.update({cost["pattern"]: cost for cost in costs})
+        for item, pattern in self._patterns.items():
+            cost = self._costs.get(pattern)
+            if cost:
+                self.pattern_tree.item(item, values=(pattern, format_cost(cost)),
+                                       tags=("costly",) if cost["over_budget"] or cost["risks"] else ())
+
+    def check_pattern_costs(self, costs: list) -> bool:
+        """Decides whether profiled new patterns may be saved. Refuses patterns over the time budget; asks about risky ones."""
+        self.show_costs(costs)
+        refused = [c for c in costs if c["over_budget"] or c["error"]]
+        if refused:
+            lines = "\n".join(f"{c['pattern']}  ({format_cost(c)})" for c in refused)
+            messagebox.showerror("Pattern Too Slow", f"These patterns are invalid or took longer than {PATTERN_TIME_BUDGET_SECONDS} s over the sample texts and were not saved:\n\n{lines}", parent=self)
+            return False
+        risky = [c for c in costs if c["risks"]]
+        if risky:
+            lines = "\n".join(f"{c['pattern']}  ({', '.join(c['risks'])})" for c in risky)
+            return messagebox.askyesno("Backtracking Risk", f"These patterns can backtrack badly on unusual text:\n\n{lines}\n\nSave them anyway?", parent=self)
+        return True
     
     def save_patterns_to_config(self):
-        """Re-writes all pattern lists into the custom_patterns.py file correctly."""
-        all_patterns_in_listbox = self.pattern_listbox.get(0, tk.END)
-        msg = f"This will save {len(all_patterns_in_listbox)} patterns to the {self.pattern_name} list in custom_patterns.py.\n\nAre you sure?"
+        """Writes this window's pattern list to the pattern store; the other lists are kept."""
+        listed = self.listed_patterns()
+        msg = f"This will save {len(listed)} patterns to the {self.pattern_label} in the pattern store.\n\nAre you sure?"
         if not messagebox.askyesno("Confirm Save", msg, parent=self):
             return
 
+        stored = set(load_patterns()[0].get(self.item_type, []))
+        new_patterns = [p for p in listed if p not in stored]
+        if not new_patterns:
+            self._write_patterns(listed)
+            return
+        # New patterns are profiled in the background first; saving continues in _finish_save
+        self.save_btn.config(state=tk.DISABLED)
+        self.config(cursor="watch")
+        texts = self._profile_texts()
+        self.run_in_background(lambda: profile_patterns(new_patterns, texts), lambda costs: self._finish_save(listed, costs))
+
+    def _finish_save(self, listed: list, costs: list):
+        self.save_btn.config(state=tk.NORMAL)
+        self.config(cursor="")
+        if self.check_pattern_costs(costs):
+            self._write_patterns(listed)
+
+    def _write_patterns(self, listed: list):
         try:
-            all_lists_to_save = {self.pattern_name: list(all_patterns_in_listbox)}
-            all_possible_pattern_names = ["MODEL_PATTERNS", "QA_NUMBER_PATTERNS"]
-            
-            try:
-                import custom_patterns as custom_module
-                importlib.reload(custom_module)
-                for name in all_possible_pattern_names:
-                    if name != self.pattern_name:
-                        if name not in all_lists_to_save:
-                            all_lists_to_save[name] = getattr(custom_module, name, [])
-            except (ImportError, SyntaxError):
-                pass
-
-            file_content = "# custom_patterns.py\n# This file stores user-defined regex patterns.\n"
-            
-            for name, patterns in all_lists_to_save.items():
-                file_content += f"\n{name} = [\n"
-                for pattern in patterns:
-                    safe_pattern = pattern.replace("'", "\\'")
-                    file_content += f"    r'{safe_pattern}',\n"
-                file_content += "]\n"
-            
-            self.custom_patterns_path.write_text(file_content, encoding='utf-8')
-            messagebox.showinfo("Success", "Custom patterns saved successfully!\nChanges will apply on the next run.", parent=self)
+            version = update_pattern_list(self.item_type, listed)
+            messagebox.showinfo("Success", f"Patterns saved successfully (version {version}).\nA running job applies them from its next document.", parent=self)
             self.destroy()
         except Exception as e:
-            messagebox.showerror("Save Failed", f"Could not save patterns to file:\n{e}", parent=self)
+            messagebox.showerror("Save Failed", f"Could not save patterns to the pattern store:\n{e}", parent=self)
 
     def update_pattern_in_list(self):
         new_pattern = self.pattern_entry.get().strip()
@@ -160,21 +264,24 @@ class ReviewWindow(tk.Toplevel):
             messagebox.showwarning("Input Error", "Test/Edit Pattern box is empty.", parent=self)
             return
             
-        selection_indices = self.pattern_listbox.curselection()
-        if not selection_indices:
-            self.pattern_listbox.insert(tk.END, new_pattern)
+        selection = self.pattern_tree.selection()
+        if not selection:
+            self.insert_pattern(new_pattern)
         else:
-            idx = selection_indices[0]
-            self.pattern_listbox.delete(idx)
-            self.pattern_listbox.insert(idx, new_pattern)
+            item = selection[0]
+            idx = self.pattern_tree.index(item)
+            self.pattern_tree.delete(item)
+            del self._patterns[item]
+            self.insert_pattern(new_pattern, idx)
+        self.profile_patterns_async([new_pattern])
 
     def on_pattern_select(self, event):
-        selection_indices = self.pattern_listbox.curselection()
-        if not selection_indices:
+        selection = self.pattern_tree.selection()
+        if not selection:
             self.remove_btn.config(state=tk.DISABLED)
             self.pattern_entry.delete(0, tk.END)
             return
-        selected_pattern = self.pattern_listbox.get(selection_indices[0])
+        selected_pattern = self._patterns[selection[0]]
         self.pattern_entry.delete(0, tk.END)
         self.pattern_entry.insert(0, selected_pattern)
         self.remove_btn.config(state=tk.NORMAL)
@@ -182,16 +289,18 @@ class ReviewWindow(tk.Toplevel):
     def add_pattern(self):
         new_pattern = self.pattern_entry.get().strip()
         if new_pattern:
-            self.pattern_listbox.insert(tk.END, new_pattern)
+            self.insert_pattern(new_pattern)
             self.pattern_entry.delete(0, tk.END)
+            self.profile_patterns_async([new_pattern])
         else:
             messagebox.showwarning("Input Error", "Test/Edit Pattern box is empty. Cannot add.", parent=self)
 
     def remove_pattern(self):
-        selection_indices = self.pattern_listbox.curselection()
-        if not selection_indices: return
+        selection = self.pattern_tree.selection()
+        if not selection: return
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to remove the selected pattern?"):
-            self.pattern_listbox.delete(selection_indices[0])
+            self.pattern_tree.delete(selection[0])
+            del self._patterns[selection[0]]
             self.on_pattern_select(None)
 
     def test_pattern(self):
@@ -206,9 +315,7 @@ class ReviewWindow(tk.Toplevel):
             if not matches:
                 messagebox.showinfo("No Matches", "The pattern did not find any matches in the text.", parent=self)
                 return
-            for match in matches:
-                start, end = match.span()
-                self.pdf_text.tag_add("highlight", f"1.0+{start}c", f"1.0+{end}c")
+            highlight_spans(self.pdf_text, content, {"highlight": [match.span() for match in matches]})
             self.pdf_text.see(f"1.0+{matches[0].start()-100}c")
             messagebox.showinfo("Success!", f"Found {len(matches)} match(es).", parent=self)
         except re.error as e:
@@ -229,7 +336,10 @@ class ReviewWindow(tk.Toplevel):
             
     def load_text_file(self):
         try:
-            if self.file_info and "txt_path" in self.file_info:
+            text = get_text_corpus().read(self.file_info["text_key"]) if self.file_info and "text_key" in self.file_info else None
+            if text is not None:
+                self.pdf_text.insert("1.0", f"--- Filename: {self.file_info.get('filename', '')} ---\n\n{text}")
+            elif self.file_info and "txt_path" in self.file_info:
                 txt_path = self.file_info["txt_path"]
                 with open(txt_path, 'r', encoding='utf-8') as f:
                     content = f.read()
@@ -239,4 +349,78 @@ class ReviewWindow(tk.Toplevel):
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load text file:\n{e}", parent=self)
             self.pdf_text.insert("1.0", "Error: Could not load text file for review.")
-            self.pdf_text.config(state=tk.DISABLED)
\ No newline at end of file
+            self.pdf_text.config(state=tk.DISABLED)
+
+class SearchWindow(tk.Toplevel):
+    """Searches the extracted text of every processed document (see search_index)."""
+    MODES = {"All words": "all", "Phrase": "phrase", "Word prefixes": "prefix"}
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self._results = {}  # Tree item -> search result
+
+        self.title("Search Documents")
+        self.geometry("900x550")
+        self.configure(bg=BRAND_COLORS["background"])
+
+        query_frame = ttk.Frame(self, padding=10)
+        query_frame.pack(fill="x")
+        query_frame.columnconfigure(1, weight=1)
+        ttk.Label(query_frame, text="Words:").grid(row=0, column=0, sticky="w")
+        self.query_entry = ttk.Entry(query_frame, font=("Consolas", 10))
+        self.query_entry.grid(row=0, column=1, sticky="ew", padx=5)
+        self.query_entry.bind("<Return>", lambda e: self.run_search())
+        self.mode_var = tk.StringVar(value="All words")
+        ttk.Combobox(query_frame, textvariable=self.mode_var, values=list(self.MODES), state="readonly", width=12).grid(row=0, column=2, padx=5)
+        ttk.Button(query_frame, text="Search", command=self.run_search).grid(row=0, column=3, rowspan=2, sticky="ns", padx=5)
+        ttk.Label(query_frame, text="Regex filter:").grid(row=1, column=0, sticky="w", pady=(5,0))
+        self.regex_entry = ttk.Entry(query_frame, font=("Consolas", 10))
+        self.regex_entry.grid(row=1, column=1, columnspan=2, sticky="ew", padx=5, pady=(5,0))
+        self.regex_entry.bind("<Return>", lambda e: self.run_search())
+
+        self.summary_label = ttk.Label(self, text="Search by part number, error code or phrase. Double-click a result to open the PDF.", padding=(10, 0))
+        self.summary_label.pack(fill="x")
+
+        results_frame = ttk.Frame(self, padding=10)
+        results_frame.pack(fill="both", expand=True)
+        self.results_tree = ttk.Treeview(results_frame, columns=("file", "snippet"), show="headings", selectmode="browse")
+        self.results_tree.heading("file", text="File Name")
+        self.results_tree.heading("snippet", text="Context")
+        self.results_tree.column("file", width=220)
+        self.results_tree.column("snippet", width=620)
+        self.results_tree.pack(fill="both", expand=True, side="left")
+        self.results_tree.bind("<Double-1>", self.open_selected)
+        results_scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.results_tree.yview)
+        results_scrollbar.pack(fill="y", side="right")
+        self.results_tree.config(yscrollcommand=results_scrollbar.set)
+        self.query_entry.focus_set()
+
+    def run_search(self):
+        for item in self.results_tree.get_children():
+            self.results_tree.delete(item)
+        self._results.clear()
+        start = time.perf_counter()
+        try:
+            with SearchIndex() as index:
+                results = index.search(self.query_entry.get(), self.MODES[self.mode_var.get()], self.regex_entry.get().strip() or None)
+                total = index.document_count()
+        except (ValueError, sqlite3.Error) as e:
+            messagebox.showwarning("Search", str(e), parent=self)
+            return
+        for result in results:
+            item = self.results_tree.insert("", "end", values=(result["filename"], result["snippet"]))
+            self._results[item] = result
+        self.summary_label.config(text=f"{len(results)} of {total} indexed document(s) in {(time.perf_counter() - start) * 1000:.0f} ms.")
+
+    def open_selected(self, event=None):
+        selection = self.results_tree.selection()
+        if not selection:
+            return
+        path = self._results[selection[0]].get("path")
+        if not path or not Path(path).exists():
+            messagebox.showwarning("Not Found", "The PDF has been moved or deleted since it was indexed.", parent=self)
+            return
+        try:
+            open_file(path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open file:\n{e}", parent=self)
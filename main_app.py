@@ -9,11 +9,17 @@ import re
 from pathlib import Path
 import fitz # PyMuPDF
 import os
+import queue
 import subprocess
 import sys
+import threading
 
 # Import our new data harvesting module
 import data_harvester
+from config import PATTERN_TIME_BUDGET_SECONDS
+from gui_components import highlight_spans
+from pattern_profiler import format_cost, profile_patterns, sample_corpus
+from pattern_store import load_patterns, update_pattern_list
 
 # This is the third version of the "Bravo" phase.
 # Phase B: Pre-release - Version VC-9
@@ -235,6 +241,7 @@ class KyoQAToolApp(tk.Tk):
         self.review_filter_var = tk.StringVar(value="All")
         self.pattern_target_field = tk.StringVar(value="Model")
         self.processed_files = [] 
+        self._found_targets = []  # Found items listed in the "Go to" box of the review tab
         self.status_current_file = tk.StringVar(value="Ready to process.")
         self.progress_value = tk.DoubleVar(value=0)
         self.time_remaining_var = tk.StringVar(value="--:--")
@@ -395,6 +402,10 @@ class KyoQAToolApp(tk.Tk):
         ttk.Button(nav_controls_frame, text="< Prev Doc", image=self.prev_icon, compound="left", command=self.select_prev_file).pack(side="left")
         ttk.Button(nav_controls_frame, text="Next Doc >", image=self.next_icon, compound="right", command=self.select_next_file).pack(side="left", padx=5)
         ttk.Button(nav_controls_frame, text="Re-scan Document", image=self.rescan_icon, compound="left", command=self.on_rescan).pack(side="left", padx=5)
+        ttk.Label(nav_controls_frame, text="Go to:").pack(side="left", padx=(10, 2))
+        self.found_combo = ttk.Combobox(nav_controls_frame, state="readonly", width=32)
+        self.found_combo.pack(side="left")
+        self.found_combo.bind("<<ComboboxSelected>>", self.on_found_select)
         ttk.Button(nav_controls_frame, text="Open Original PDF", image=self.open_icon, compound="left", command=self.open_original_pdf).pack(side="right")
         
         self.reason_label = ttk.Label(right_pane, text="Reason: N/A", style="Reason.TLabel")
@@ -427,7 +438,8 @@ class KyoQAToolApp(tk.Tk):
         editor_buttons.grid(row=3, column=0, columnspan=2, sticky="w", pady=(5,0))
         ttk.Button(editor_buttons, text="Suggest from Highlight", command=self.on_suggest_pattern).pack(side="left")
         ttk.Button(editor_buttons, text="Test Pattern", command=self.on_test_pattern).pack(side="left", padx=10)
-        ttk.Button(editor_buttons, text="Save to Custom Patterns", style="Red.TButton", command=self.on_save_custom_pattern).pack(side="right")
+        self.save_pattern_button = ttk.Button(editor_buttons, text="Save to Custom Patterns", style="Red.TButton", command=self.on_save_custom_pattern)
+        self.save_pattern_button.pack(side="right")
 
     def toggle_fullscreen(self, event=None):
         self.is_fullscreen = not self.is_fullscreen
@@ -499,7 +511,7 @@ class KyoQAToolApp(tk.Tk):
             txt_path.write_text(full_text, encoding='utf-8')
             
             # Run the harvester
-            harvest_results = data_harvester.harvest_all_data(full_text)
+            harvest_results = data_harvester.harvest_all_data(full_text, page_starts=extraction_result.get("page_starts"))
             
             status = "Needs Review" if not harvest_results["found_items"] else "Pass"
             if extraction_result["ocr_used"]:
@@ -507,7 +519,7 @@ class KyoQAToolApp(tk.Tk):
 
             file_data = {
                 "id": str(pdf_path), "filename": pdf_path.name, "status": status,
-                "text": full_text, "found_items": harvest_results["found_items"],
+                "text": full_text, "found_items": harvest_results["found_items"], "page_starts": extraction_result.get("page_starts"),
                 "status_reason": harvest_results["status_reason"], "original_path": pdf_path
             }
             self.ui_queue.put({"type": "add_file", "data": file_data})
@@ -562,9 +574,32 @@ class KyoQAToolApp(tk.Tk):
             self.doc_text.config(state=tk.NORMAL)
             self.doc_text.delete("1.0", tk.END)
             self.doc_text.insert("1.0", file_data["text"])
-            for item in file_data.get("found_items", []): self._highlight_text(item["text"], f"{item['type']}_found")
+            self._highlight_found_items(file_data)
             self.doc_text.config(state=tk.DISABLED)
 
+    def _highlight_found_items(self, file_data):
+        """Highlights the harvested items from their spans, and lists them in the "Go to" box."""
+        spans_by_tag = {}
+        for item in file_data.get("found_items", []):
+            tag = f"{item['type']}_found"
+            if "spans" in item: spans_by_tag.setdefault(tag, []).extend(item["spans"])
+            else: self._highlight_text(item["text"], tag)  # Results from before spans were recorded
+        highlight_spans(self.doc_text, file_data["text"], spans_by_tag)
+        self._found_targets = [item for item in file_data.get("found_items", []) if item.get("spans")]
+        labels = []
+        for item in self._found_targets:
+            pages = f" (p. {', '.join(str(page) for page in item['pages'])})" if item.get("pages") else ""
+            labels.append(f"{item['text']}{pages}")
+        self.found_combo.config(values=labels); self.found_combo.set("")
+
+    def on_found_select(self, event=None):
+        index = self.found_combo.current()
+        if index < 0 or index >= len(self._found_targets): return
+        start, end = self._found_targets[index]["spans"][0]
+        self.doc_text.tag_remove(tk.SEL, "1.0", tk.END)
+        self.doc_text.tag_add(tk.SEL, f"1.0+{start}c", f"1.0+{end}c")
+        self.doc_text.see(f"1.0+{start}c")
+
     def select_next_file(self):
         selection = self.review_tree.selection()
         if not selection and self.review_tree.get_children(): self.review_tree.selection_set(self.review_tree.get_children()[0]); return
@@ -618,9 +653,7 @@ class KyoQAToolApp(tk.Tk):
             matches = list(re.finditer(pattern_str, content, re.IGNORECASE))
             if not matches: messagebox.showinfo("No Matches", "The pattern did not find any matches.", parent=self)
             else:
-                for match in matches:
-                    start_index = f"1.0+{match.start()}c"; end_index = f"1.0+{match.end()}c"
-                    self.doc_text.tag_add(highlight_tag, start_index, end_index)
+                highlight_spans(self.doc_text, content, {highlight_tag: [match.span() for match in matches]})
                 self.doc_text.see(f"1.0+{matches[0].start()}c")
         except re.error as e: messagebox.showerror("Invalid Pattern", f"The regular expression is invalid:\n{e}", parent=self)
         finally: self.doc_text.config(state=tk.DISABLED)
@@ -632,45 +665,64 @@ class KyoQAToolApp(tk.Tk):
         file_index = next((i for i, f in enumerate(self.processed_files) if f["id"] == item_id), -1)
         if file_index != -1:
             file_data = self.processed_files[file_index]
-            harvest_results = data_harvester.harvest_all_data(file_data["text"])
+            harvest_results = data_harvester.harvest_all_data(file_data["text"], page_starts=file_data.get("page_starts"))
             file_data["found_items"] = harvest_results["found_items"]; file_data["status_reason"] = harvest_results["status_reason"]
             file_data["status"] = "Needs Review" if not harvest_results["found_items"] else "Pass"
             self.review_tree.item(item_id, values=(file_data["filename"], file_data["status"]))
             self.on_file_select()
             messagebox.showinfo("Re-scan Complete", f"Re-scanned '{file_data['filename']}'.\nNew Status: {file_data['status']}", parent=self)
 
+    def run_in_background(self, work, callback, failed):
+        """Runs work() in a thread and passes its result to callback(), or its exception to failed(), on the Tk thread."""
+        results = queue.Queue(maxsize=1)
+        def target():
+            try:
+                results.put((callback, work()))
+            except Exception as e:
+                results.put((failed, e))
+        threading.Thread(target=target, daemon=True).start()
+        self.after(200, self._poll_background, results)
+
+    def _poll_background(self, results):
+        try:
+            callback, result = results.get_nowait()
+        except queue.Empty:
+            self.after(200, self._poll_background, results)
+            return
+        callback(result)
+
     def on_save_custom_pattern(self):
         pattern = self.pattern_entry.get().strip()
         if not pattern: messagebox.showwarning("Input Error", "Pattern cannot be empty.", parent=self); return
         target_field = self.pattern_target_field.get()
         
-        field_map = {"Model": "MODEL_PATTERNS", "QA Number": "QA_NUMBER_PATTERNS", "Author": "AUTHOR_PATTERNS", "Topic": "TOPIC_PATTERNS"}
-        list_name = field_map.get(target_field)
-        if not list_name: messagebox.showerror("Error", "Invalid target field selected."); return
-        
-        # FIX: Correctly handle backslashes in f-string
-        safe_pattern = pattern.replace("'", "\\'")
-        new_pattern_line = f"    r'{safe_pattern}',\n"
+        field_map = {"Model": "model", "QA Number": "qa_number", "Author": "author", "Topic": "topic"}
+        item_type = field_map.get(target_field)
+        if not item_type: messagebox.showerror("Error", "Invalid target field selected."); return
+
+        # Time the pattern over the review texts first, off the Tk thread; a pattern over the budget is never saved
+        doc_text = self.doc_text.get("1.0", tk.END)
+        self.save_pattern_button.config(state=tk.DISABLED)
+        self.run_in_background(lambda: profile_patterns([pattern], sample_corpus() + [doc_text])[0],
+                               lambda cost: self._save_profiled_pattern(pattern, item_type, target_field, cost),
+                               self._pattern_profile_failed)
+
+    def _pattern_profile_failed(self, error):
+        self.save_pattern_button.config(state=tk.NORMAL)
+        messagebox.showerror("Error", f"Could not time the pattern:\n{error}", parent=self)
+
+    def _save_profiled_pattern(self, pattern, item_type, target_field, cost):
+        self.save_pattern_button.config(state=tk.NORMAL)
+        if cost["over_budget"] or cost["error"]:
+            messagebox.showerror("Pattern Too Slow", f"The pattern is invalid or took longer than {PATTERN_TIME_BUDGET_SECONDS} s over the sample texts ({format_cost(cost)}). It was not saved.", parent=self); return
+        if cost["risks"] and not messagebox.askyesno("Backtracking Risk", f"The pattern can backtrack badly on unusual text ({', '.join(cost['risks'])}).\n\nSave it anyway?", parent=self): return
 
         try:
-            if not CUSTOM_PATTERNS_FILE.exists():
-                initial_content = "# custom_patterns.py\n\nMODEL_PATTERNS = []\n\nQA_NUMBER_PATTERNS = []\n\nAUTHOR_PATTERNS = []\n\nTOPIC_PATTERNS = []\n"
-                CUSTOM_PATTERNS_FILE.write_text(initial_content)
-
-            lines = CUSTOM_PATTERNS_FILE.read_text().splitlines()
-            
-            try:
-                list_start_index = next(i for i, line in enumerate(lines) if line.strip().startswith(list_name))
-                lines.insert(list_start_index + 1, new_pattern_line)
-                CUSTOM_PATTERNS_FILE.write_text("\n".join(lines))
-                messagebox.showinfo("Success", f"Pattern saved to {list_name} in custom_patterns.py", parent=self)
-            except StopIteration:
-                with open(CUSTOM_PATTERNS_FILE, "a") as f:
-                    f.write(f"\n{list_name} = [\n{new_pattern_line}]\n")
-                messagebox.showinfo("Success", f"Pattern list created and pattern saved in custom_patterns.py", parent=self)
-
+            patterns, _ = load_patterns()
+            version = update_pattern_list(item_type, patterns.get(item_type, []) + [pattern])
+            messagebox.showinfo("Success", f"Pattern saved to the {target_field} patterns ({format_cost(cost)}; pattern store version {version}).", parent=self)
         except Exception as e:
-            messagebox.showerror("File Error", f"Could not save to custom_patterns.py:\n{e}", parent=self)
+            messagebox.showerror("File Error", f"Could not save to the pattern store:\n{e}", parent=self)
 
 if __name__ == "__main__":
     app = KyoQAToolApp()
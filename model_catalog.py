@@ -0,0 +1,232 @@
+# model_catalog.py
+# Known-model catalog: exact, single-pass lookup of every valid model string.
+#
+# The reference workbook and our ServiceNow exports already list every valid
+# model in their "Meta" column. The harvester's regexes (e.g.
+# \bTASKalfa\s*[\w-]+\b) over-match and then need manual review, so known models
+# are looked up first, in one pass over the text, with an Aho-Corasick automaton
+# built from the catalog; the regexes remain the fallback for models the catalog
+# has not seen yet.
+#
+# Building the automaton means reading the workbooks, so it is pickled to
+# MODEL_CATALOG_CACHE and rebuilt only when a source workbook (or the
+# standardization rules) change.
+#
+#   python model_catalog.py    (rebuilds the cache and prints the catalog size)
+
+import pickle
+import re
+from collections import deque
+
+import openpyxl
+
+from config import META_COLUMN_NAME, MODEL_CATALOG_CACHE, MODEL_CATALOG_SOURCES, STANDARDIZATION_RULES
+from pattern_engine import fold_text
+
+CATALOG_FORMAT = 2  # Bump when the pickled layout changes
+_SEPARATORS = re.compile(r"[,;\n]+")
+
+
+def standardize_model(model: str) -> str:
+    """Applies STANDARDIZATION_RULES and collapses whitespace, e.g. 'TASKalfa-4020i' -> 'TASKalfa 4020i'."""
+    for variant, standard in STANDARDIZATION_RULES.items():
+        model = model.replace(variant, standard)
+    return " ".join(model.split())
+
+
+def read_catalog_models(workbook_path) -> set[str]:
+    """Every model listed in the Meta column of a workbook's first sheet, standardized."""
+    workbook = openpyxl.load_workbook(workbook_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+        if META_COLUMN_NAME not in headers:
+            print(f"No '{META_COLUMN_NAME}' column in {workbook_path}. Skipping it for the model catalog.")
+            return set()
+        column = headers.index(META_COLUMN_NAME)
+        models = set()
+        for row in rows:
+            if column >= len(row) or not row[column]:
+                continue
+            for entry in _SEPARATORS.split(str(row[column])):
+                entry = standardize_model(entry)
+                # Model names always carry a number; this drops stray words and notes
+                if entry and len(entry) <= 40 and any(ch.isdigit() for ch in entry):
+                    models.add(entry)
+        return models
+    finally:
+        workbook.close()
+
+
+def _key_variants(model: str) -> set[str]:
+    """The spellings looked up for one model: as listed, without spaces and hyphenated."""
+    return {fold_text(model), fold_text(model.replace(" ", "")), fold_text(model.replace(" ", "-"))}
+
+
+class ModelCatalog:
+    """
+    An Aho-Corasick automaton over the known models.
+
+    Matching is case-insensitive and treats any run of whitespace as one space,
+    so a model broken over two OCR lines is still found. Matches must start and
+    end on a word boundary.
+    """
+
+    def __init__(self, models):
+        self.models = sorted(set(models))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # Per state: [(key length, canonical model), ...]
+        for model in self.models:
+            for key in _key_variants(model):
+                self._add(key, model)
+        self._link()
+        # Where a match can begin: a character the automaton starts with, not preceded by a letter or digit
+        root = "".join(re.escape(ch) for ch in sorted(self._goto[0]))
+        self._start = re.compile(f"(?<![^\\W_])[{root}]") if root else None
+
+    def __len__(self):
+        return len(self.models)
+
+    def _add(self, key: str, model: str):
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(key), model))
+
+    def _link(self):
+        """Breadth-first failure links; each state also inherits the outputs of its failure state."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> list[tuple[int, int, str]]:
+        """
+        Known models in the text, in one pass.
+
+        Returns:
+            [(start, end, canonical model), ...] in text order, without
+            overlaps (the longest model wins where two overlap).
+        """
+        folded = fold_text(text)
+        if len(folded) != len(text):
+            folded = text.lower()  # Keep offsets aligned with the original text
+        goto, fail, out = self._goto, self._fail, self._out
+        positions = []  # Original offset of every character fed to the automaton
+        hits = []
+        state, previous_space = 0, False
+        index, size = 0, len(folded)
+        while index < size:
+            if not state:
+                # No match in progress: skip ahead to the next place one can begin
+                begin = self._start.search(folded, index) if self._start else None
+                if begin is None:
+                    break
+                index, previous_space = begin.start(), False
+                positions.clear()
+            ch = folded[index]
+            index += 1
+            if ch.isspace():
+                if previous_space:
+                    continue  # A whitespace run counts as one space
+                ch, previous_space = " ", True
+            else:
+                previous_space = False
+            positions.append(index - 1)
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, model in out[state]:
+                start, end = positions[len(positions) - length], index
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    hits.append((start, end, model))
+
+        # Leftmost, then longest, without overlaps
+        hits.sort(key=lambda hit: (hit[0], hit[0] - hit[1]))
+        found, last_end = [], -1
+        for start, end, model in hits:
+            if start >= last_end:
+                found.append((start, end, model))
+                last_end = end
+        return found
+
+
+def _source_stamps() -> dict:
+    return {str(path): path.stat().st_mtime for path in MODEL_CATALOG_SOURCES if path.exists()}
+
+
+def build_model_catalog() -> ModelCatalog | None:
+    """Reads every source workbook, builds the automaton and pickles it. None without sources."""
+    stamps = _source_stamps()
+    if not stamps:
+        return None
+    models = set()
+    for path in stamps:
+        try:
+            models |= read_catalog_models(path)
+        except Exception as e:
+            print(f"Could not read model catalog source {path}: {e}")
+    catalog = ModelCatalog(models)
+    try:
+        MODEL_CATALOG_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        with open(MODEL_CATALOG_CACHE, "wb") as f:
+            pickle.dump({"format": CATALOG_FORMAT, "sources": stamps, "rules": STANDARDIZATION_RULES,
+                         "catalog": catalog}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        print(f"Could not write the model catalog cache: {e}")
+    return catalog
+
+
+def _load_cached_catalog(stamps: dict) -> ModelCatalog | None:
+    try:
+        with open(MODEL_CATALOG_CACHE, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if (cached.get("format"), cached.get("sources"), cached.get("rules")) != (CATALOG_FORMAT, stamps, STANDARDIZATION_RULES):
+        return None  # A source workbook or the rules changed since it was built
+    return cached["catalog"]
+
+
+_catalog = None
+_catalog_stamps = None
+
+
+def get_model_catalog() -> ModelCatalog | None:
+    """
+    The known-model catalog, or None when no source workbook exists.
+
+    Loaded from the pickle cache when it is current, otherwise rebuilt. Source
+    modification times are re-checked on every call, so a replaced workbook
+    is picked up by the next document.
+    """
+    global _catalog, _catalog_stamps
+    stamps = _source_stamps()
+    if not stamps:
+        return None
+    if _catalog is None or stamps != _catalog_stamps:
+        _catalog = _load_cached_catalog(stamps) or build_model_catalog()
+        _catalog_stamps = stamps
+    return _catalog
+
+
+if __name__ == "__main__":
+    catalog = build_model_catalog()
+    if catalog is None:
+        print("No model catalog source workbook found. See MODEL_CATALOG_SOURCES in config.py.")
+    else:
+        print(f"Model catalog: {len(catalog)} models from {len(_source_stamps())} workbook(s), cached in {MODEL_CATALOG_CACHE}.")
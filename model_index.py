@@ -0,0 +1,178 @@
+# model_index.py
+# Inverted index from models and QA/SB numbers to the documents that mention them.
+#
+# Finding every article that applies to one model used to mean scanning the
+# output workbook or processing the PDFs again. Each job now records, for every
+# document it processed, the models and QA/SB numbers harvested from it and the
+# workbook row its result was written to, in an SQLite file (MODEL_INDEX_PATH).
+#
+# Documents are keyed by content hash, like the search index. A model is looked
+# up by a key that ignores case, whitespace and the spellings that
+# STANDARDIZATION_RULES merge, so "taskalfa-5054ci", "TASKalfa 5054ci" and
+# "TASKalfa5054ci" find the same documents. Lookups are single index seeks.
+#
+#   python cli_runner.py lookup "TASKalfa 5054ci" [--prefix] [--type model|qa_number]
+
+import sqlite3
+import time
+from pathlib import Path
+
+from config import MODEL_INDEX_PATH, STANDARDIZATION_RULES
+from model_catalog import standardize_model
+from pattern_engine import fold_text
+
+INDEX_FORMAT = 1
+INDEXED_TYPES = ("model", "qa_number")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    content_hash TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    path TEXT,
+    status TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_key TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    item_type TEXT NOT NULL,
+    term TEXT NOT NULL,
+    PRIMARY KEY (term_key, content_hash, item_type)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_document ON postings (content_hash);
+CREATE TABLE IF NOT EXISTS workbook_rows (
+    content_hash TEXT NOT NULL,
+    workbook TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (content_hash, workbook)
+) WITHOUT ROWID;
+"""
+
+
+def term_key(term: str) -> str:
+    """The lookup key of a model or QA/SB number: folded, standardized and without whitespace."""
+    key = fold_text(term)
+    for variant, standard in STANDARDIZATION_RULES.items():
+        key = key.replace(fold_text(variant), fold_text(standard))
+    return "".join(key.split())
+
+
+class ModelIndex:
+    """The model/QA number index at MODEL_INDEX_PATH. Usable as a context manager."""
+
+    def __init__(self, path: Path = MODEL_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, INDEX_FORMAT):
+            self.conn.executescript("DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS postings; "
+                                    "DROP TABLE IF EXISTS workbook_rows;")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {INDEX_FORMAT}")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def record_documents(self, results) -> int:
+        """
+        Replaces the indexed models and QA/SB numbers of processed documents.
+
+        Args:
+            results: Processing results ({"content_hash", "filename",
+                "found_items", "status", ...}); results without a content
+                hash (e.g. unreadable files) are skipped.
+
+        Returns:
+            The number of documents recorded.
+        """
+        recorded = 0
+        with self.conn:
+            for result in results:
+                content_hash = result.get("content_hash")
+                if not content_hash:
+                    continue
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO documents (content_hash, filename, path, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (content_hash, result["filename"], result.get("path"), result.get("status"), time.time()))
+                self.conn.execute("DELETE FROM postings WHERE content_hash = ?", (content_hash,))
+                postings = {}
+                for item in result.get("found_items") or []:
+                    if item["type"] in INDEXED_TYPES:
+                        term = standardize_model(item["text"]) if item["type"] == "model" else item["text"]
+                        postings.setdefault((term_key(term), item["type"]), term)
+                self.conn.executemany(
+                    "INSERT INTO postings (term_key, content_hash, item_type, term) VALUES (?, ?, ?, ?)",
+                    [(key, content_hash, item_type, term) for (key, item_type), term in postings.items()])
+                recorded += 1
+        return recorded
+
+    def record_rows(self, workbook, rows: dict):
+        """Records the workbook row each document's result was written to: {content_hash: row number}."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO workbook_rows (content_hash, workbook, row) VALUES (?, ?, ?)",
+                [(content_hash, str(workbook), row) for content_hash, row in rows.items()])
+
+    def lookup(self, term: str, item_type: str | None = None, prefix: bool = False) -> list[dict]:
+        """
+        Documents that mention a model or QA/SB number.
+
+        Args:
+            term: e.g. "TASKalfa 5054ci" or "SB-1234"; spelling variants are
+                merged (see `term_key`).
+            item_type: "model" or "qa_number" to search one kind only.
+            prefix: Also match longer terms starting with `term`,
+                e.g. "TASKalfa 50" for the whole series.
+
+        Returns:
+            [{"content_hash", "filename", "path", "status", "item_type",
+              "term", "rows": [{"workbook", "row"}, ...]}, ...] by filename.
+        """
+        key = term_key(term)
+        if not key:
+            return []
+        where = "p.term_key >= ? AND p.term_key < ?" if prefix else "p.term_key = ?"
+        params = [key, key + "\U0010ffff"] if prefix else [key]
+        if item_type:
+            where += " AND p.item_type = ?"
+            params.append(item_type)
+        hits = [{"content_hash": h, "filename": f, "path": p, "status": s, "item_type": t, "term": term_text, "rows": []}
+                for h, f, p, s, t, term_text in self.conn.execute(
+                    "SELECT d.content_hash, d.filename, d.path, d.status, p.item_type, p.term "
+                    f"FROM postings p JOIN documents d ON d.content_hash = p.content_hash WHERE {where} "
+                    "ORDER BY d.filename, p.term", params)]
+        by_hash = {}
+        for hit in hits:
+            by_hash.setdefault(hit["content_hash"], []).append(hit)
+        hashes = list(by_hash)
+        for i in range(0, len(hashes), 500):  # SQLite's limit on bound parameters
+            chunk = hashes[i:i + 500]
+            for content_hash, workbook, row in self.conn.execute(
+                    f"SELECT content_hash, workbook, row FROM workbook_rows WHERE content_hash IN ({','.join('?' * len(chunk))}) "
+                    "ORDER BY workbook, row", chunk):
+                for hit in by_hash[content_hash]:
+                    hit["rows"].append({"workbook": workbook, "row": row})
+        return hits
+
+    def document_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def format_lookup(hits: list[dict]) -> str:
+    """Plain-text lookup result for the command line."""
+    if not hits:
+        return "No indexed documents mention it."
+    lines = []
+    for hit in hits:
+        rows = ", ".join(f"{Path(r['workbook']).name} row {r['row']}" for r in hit["rows"]) or "no workbook row"
+        lines.append(f"{hit['filename']}  [{hit['status']}]  {hit['term']}  ({rows})")
+    return "\n".join(lines)
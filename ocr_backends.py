@@ -0,0 +1,362 @@
+# ocr_backends.py
+# OCR backend layer shared by ocr_utils and pdf_processor.
+#
+# pytesseract starts a new tesseract process for every image and reloads the
+# traineddata each time. When the optional `tesserocr` package is installed,
+# this module keeps a small pool of long-lived Tesseract API handles instead:
+# each one is created once per worker with its language data loaded, and pages
+# are fed to it continuously. pytesseract remains the fallback backend.
+
+import os
+import threading
+import time
+from collections import deque
+from queue import Queue
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # Optional - falls back to pytesseract
+    tesserocr = None
+
+from config import (
+    OCR_BACKEND, OCR_POOL_SIZE, OCR_LANG, OCR_PROFILES, DEFAULT_OCR_PROFILE,
+    OCR_LANGUAGE_DETECTION, OCR_SCRIPT_LANGS, OCR_SCRIPT_MIN_CONFIDENCE, OCR_SCRIPT_PROBE_MAX_SIDE,
+)
+
+
+def resolve_backend(requested: str = OCR_BACKEND) -> str:
+    """Returns the backend that will actually be used for a requested name."""
+    if requested == "pytesseract":
+        return "pytesseract"
+    if tesserocr is None:
+        if requested == "tesserocr":
+            print("tesserocr is not installed. Falling back to pytesseract.")
+        return "pytesseract"
+    return "tesserocr"
+
+
+def get_ocr_profile(name: str | None = None) -> dict:
+    """Returns the named profile from config.OCR_PROFILES (the default profile if unknown), plus its name."""
+    name = name or DEFAULT_OCR_PROFILE
+    if name not in OCR_PROFILES:
+        print(f"Unknown OCR profile '{name}'. Using '{DEFAULT_OCR_PROFILE}'.")
+        name = DEFAULT_OCR_PROFILE
+    return {"name": name, **OCR_PROFILES[name]}
+
+
+class PytesseractRecognizer:
+    """Fallback recognizer. Spawns one tesseract process per call."""
+    backend = "pytesseract"
+
+    def __init__(self, lang: str, oem: int | None = None):
+        self.lang = lang
+        self.oem = oem
+
+    def _config(self, psm: int | None, whitelist: str | None) -> str:
+        options = []
+        if self.oem is not None:
+            options.append(f"--oem {self.oem}")
+        if psm is not None:
+            options.append(f"--psm {psm}")
+        if whitelist:
+            options.append(f"-c tessedit_char_whitelist={whitelist}")
+        return " ".join(options)
+
+    def recognize(self, image, psm: int | None = None, whitelist: str | None = None) -> str:
+        return pytesseract.image_to_string(image, lang=self.lang, config=self._config(psm, whitelist))
+
+    def recognize_lines(self, image, psm: int | None = None, whitelist: str | None = None) -> list:
+        """Returns [(text, (x0, y0, x1, y1)), ...], one entry per recognized text line."""
+        data = pytesseract.image_to_data(image, lang=self.lang, config=self._config(psm, whitelist),
+                                         output_type=pytesseract.Output.DICT)
+        lines = {}
+        for i, word in enumerate(data["text"]):
+            if data["level"][i] != 5 or not word.strip():
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            x0, y0 = data["left"][i], data["top"][i]
+            x1, y1 = x0 + data["width"][i], y0 + data["height"][i]
+            if key in lines:
+                words, (bx0, by0, bx1, by1) = lines[key]
+                words.append(word)
+                lines[key] = (words, (min(bx0, x0), min(by0, y0), max(bx1, x1), max(by1, y1)))
+            else:
+                lines[key] = ([word], (x0, y0, x1, y1))
+        return [(" ".join(words), box) for words, box in lines.values()]
+
+    def close(self):
+        pass
+
+
+class TesserocrRecognizer:
+    """Persistent recognizer. Language data is loaded once, in the constructor."""
+    backend = "tesserocr"
+
+    def __init__(self, lang: str, oem: int | None = None):
+        self.lang = lang
+        self.oem = oem
+        if oem is None:
+            self._api = tesserocr.PyTessBaseAPI(lang=lang)
+        else:
+            self._api = tesserocr.PyTessBaseAPI(lang=lang, oem=oem)
+        self._default_psm = self._api.GetPageSegMode()
+
+    def _set_image(self, image, psm: int | None, whitelist: str | None):
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        self._api.SetPageSegMode(psm if psm is not None else self._default_psm)
+        self._api.SetVariable("tessedit_char_whitelist", whitelist or "")
+        self._api.SetImage(image)
+
+    def recognize(self, image, psm: int | None = None, whitelist: str | None = None) -> str:
+        self._set_image(image, psm, whitelist)
+        return self._api.GetUTF8Text()
+
+    def recognize_lines(self, image, psm: int | None = None, whitelist: str | None = None) -> list:
+        """Returns [(text, (x0, y0, x1, y1)), ...], one entry per recognized text line."""
+        self._set_image(image, psm, whitelist)
+        self._api.Recognize()
+        level = tesserocr.RIL.TEXTLINE
+        lines = []
+        for result in tesserocr.iterate_level(self._api.GetIterator(), level):
+            text = result.GetUTF8Text(level)
+            box = result.BoundingBox(level)
+            if text and text.strip() and box:
+                lines.append((text.strip(), box))
+        return lines
+
+    def close(self):
+        self._api.End()
+
+
+class LatencyStats:
+    """Thread-safe per-page latency accumulator for one pool."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.pages = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.pages += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self._recent.append(seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+            mean = self.total_seconds / self.pages if self.pages else 0.0
+            return {
+                "pages": self.pages,
+                "mean_ms": round(mean * 1000, 1),
+                "p95_ms": round(p95 * 1000, 1),
+                "max_ms": round(self.max_seconds * 1000, 1),
+            }
+
+
+class RecognizerPool:
+    """
+    A bounded pool of recognizers for one language and engine mode.
+
+    Recognizers are created lazily, up to `size`, and reused for the lifetime of
+    the process. Callers simply call `recognize()`; a free recognizer is checked
+    out for the duration of the page and returned afterwards.
+    """
+
+    def __init__(self, lang: str = OCR_LANG, size: int = OCR_POOL_SIZE, backend: str = OCR_BACKEND,
+                 oem: int | None = None):
+        self.lang = lang
+        self.oem = oem
+        self.size = max(1, size)
+        self.backend = resolve_backend(backend)
+        self.stats = LatencyStats()
+        self._idle = Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_recognizer(self):
+        if self.backend == "tesserocr":
+            try:
+                return TesserocrRecognizer(self.lang, self.oem)
+            except RuntimeError as e:
+                # Usually missing traineddata for tesserocr's TESSDATA_PREFIX.
+                print(f"Could not start tesserocr for '{self.lang}': {e}. Falling back to pytesseract.")
+                self.backend = "pytesseract"
+        return PytesseractRecognizer(self.lang, self.oem)
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle.empty() and self._created < self.size:
+                self._created += 1
+                return self._new_recognizer()
+        return self._idle.get()
+
+    def _run(self, method: str, image, psm, whitelist):
+        recognizer = self._acquire()
+        start = time.perf_counter()
+        try:
+            return getattr(recognizer, method)(image, psm, whitelist)
+        finally:
+            self.stats.record(time.perf_counter() - start)
+            self._idle.put(recognizer)
+
+    def recognize(self, image, psm: int | None = None, whitelist: str | None = None) -> str:
+        """Runs OCR on a PIL image or NumPy array and records the page latency."""
+        return self._run("recognize", image, psm, whitelist)
+
+    def recognize_lines(self, image, psm: int | None = None, whitelist: str | None = None) -> list:
+        """Like `recognize`, but returns each text line with its bounding box in image pixels."""
+        return self._run("recognize_lines", image, psm, whitelist)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+        self._created = 0
+
+    def summary(self) -> dict:
+        return {"backend": self.backend, "lang": self.lang, "oem": self.oem, **self.stats.summary()}
+
+
+class ScriptDetector:
+    """
+    Detects the dominant script of a page with Tesseract's orientation and
+    script detection (OSD) on a downscaled copy. Only the small "osd" model is
+    loaded, once, on first use. With the pytesseract backend every detection is
+    another tesseract process, so `select_ocr_lang` only detects with tesserocr.
+    """
+
+    def __init__(self, backend: str = OCR_BACKEND):
+        self.backend = resolve_backend(backend)
+        self._api = None
+        self._lock = threading.Lock()
+
+    def _probe(self, image):
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert("L"))
+        scale = max(image.shape[:2]) / OCR_SCRIPT_PROBE_MAX_SIDE
+        if scale > 1:
+            size = (max(1, int(image.shape[1] / scale)), max(1, int(image.shape[0] / scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return image
+
+    def detect(self, image) -> tuple[str | None, float]:
+        """Returns (script name, confidence), or (None, 0.0) when there is too little text to tell."""
+        probe = self._probe(image)
+        if self.backend == "tesserocr":
+            with self._lock:
+                if self._api is None:
+                    self._api = tesserocr.PyTessBaseAPI(lang="osd", psm=tesserocr.PSM.OSD_ONLY)
+                self._api.SetImage(Image.fromarray(probe))
+                result = self._api.DetectOrientationScript()
+            if not result:
+                return None, 0.0
+            return result["script_name"], result["script_conf"]
+        try:
+            osd = pytesseract.image_to_osd(probe, config="--psm 0", output_type=pytesseract.Output.DICT)
+        except pytesseract.TesseractError:
+            return None, 0.0  # "Too few characters" - nothing to detect
+        return osd.get("script"), osd.get("script_conf", 0.0)
+
+
+# --- PER-PROCESS POOL REGISTRY ---
+# Pools are keyed by language and engine mode, and owned by the process that created them, so a
+# forked worker never reuses a Tesseract handle that belongs to its parent.
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+_detector = None
+_detector_pid = None
+_languages = None  # (pid, installed traineddata names or None when unknown)
+_missing_langs = set()  # Language packs already reported missing by this process
+
+
+def get_ocr_pool(lang: str = OCR_LANG, oem: int | None = None) -> RecognizerPool:
+    """Returns this process's recognizer pool for `lang` and `oem`, creating it on first use."""
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get((lang, oem))
+        if pool is None:
+            pool = _pools[(lang, oem)] = RecognizerPool(lang, oem=oem)
+        return pool
+
+
+def installed_languages(backend: str) -> set | None:
+    """The traineddata names Tesseract can load, read once per process; None when they cannot be listed."""
+    global _languages
+    if _languages is None or _languages[0] != os.getpid():
+        try:
+            if backend == "tesserocr":
+                names = tesserocr.get_languages()[1]
+            else:
+                names = pytesseract.get_languages(config="")
+            _languages = (os.getpid(), set(names))
+        except Exception as e:
+            print(f"Could not list the installed Tesseract languages: {e}")
+            _languages = (os.getpid(), None)
+    return _languages[1]
+
+
+def _has_languages(lang: str, backend: str) -> bool:
+    """True when every pack of a "jpn+eng" style language string is installed."""
+    installed = installed_languages(backend)
+    return installed is not None and all(part in installed for part in lang.split("+"))
+
+
+def select_ocr_lang(image) -> str:
+    """
+    Picks the language pack for one page (or region) image.
+
+    Returns the OCR_SCRIPT_LANGS entry for the detected script when detection
+    is confident and its language packs are installed, otherwise OCR_LANG.
+    Detection only runs with the tesserocr backend, where it is an in-process
+    call; with pytesseract every page is OCR'd with OCR_LANG. The detector is
+    created once per process.
+    """
+    global _detector, _detector_pid
+    if not OCR_LANGUAGE_DETECTION:
+        return OCR_LANG
+    with _pools_lock:
+        if _detector is None or _detector_pid != os.getpid():
+            _detector = ScriptDetector()
+            _detector_pid = os.getpid()
+    if _detector.backend != "tesserocr" or not _has_languages("osd", _detector.backend):
+        return OCR_LANG
+    try:
+        script, confidence = _detector.detect(image)
+    except Exception as e:
+        print(f"Script detection failed: {e}. Using '{OCR_LANG}'.")
+        return OCR_LANG
+    if script not in OCR_SCRIPT_LANGS or confidence < OCR_SCRIPT_MIN_CONFIDENCE:
+        return OCR_LANG
+    lang = OCR_SCRIPT_LANGS[script]
+    if not _has_languages(lang, _detector.backend):
+        if lang not in _missing_langs:
+            _missing_langs.add(lang)
+            print(f"'{script}' script detected but the '{lang}' traineddata is not installed. Using '{OCR_LANG}'.")
+        return OCR_LANG
+    return lang
+
+
+def ocr_latency_report() -> list[dict]:
+    """Per-pool latency summaries for every pool used in this process."""
+    with _pools_lock:
+        return [pool.summary() for pool in _pools.values() if pool.stats.pages]
+
+
+def format_latency_summary(summary: dict) -> str:
+    engine = f", oem {summary['oem']}" if summary.get("oem") is not None else ""
+    return (f"OCR latency ({summary['backend']}, {summary['lang']}{engine}): {summary['pages']} pages, "
+            f"mean {summary['mean_ms']} ms, p95 {summary['p95_ms']} ms, max {summary['max_ms']} ms")
@@ -0,0 +1,143 @@
+# ocr_pipeline.py
+# Render/OCR pipelining inside one worker.
+#
+# Each page goes through two stages: a render stage (text-layer check, embedded
+# image decode or MuPDF rendering, preprocessing) and an OCR stage (Tesseract).
+# Run strictly in sequence, MuPDF and Tesseract never overlap. PagePipeline runs
+# the render stage in a background thread that prepares the next pages while the
+# caller's thread OCRs the current one; a bounded queue caps how many prepared
+# pages are held in memory at once.
+#
+# All document access happens in the render thread. The only exception, tiled
+# OCR of oversized pages, takes the pipeline lock so the two never touch the
+# document at the same time.
+
+import queue
+import threading
+
+from config import OCR_PIPELINE_LOOKAHEAD
+from document_session import DocumentSession
+from image_preprocessing import pixmap_to_array, preprocess_page
+from ocr_backends import get_ocr_pool, select_ocr_lang
+from tiled_ocr import needs_tiling, ocr_page_tiled
+
+PAGE_TILED = "tiled"  # prepare_page() result for pages that must be OCR'd tile by tile
+_DONE = object()
+
+
+def prepare_page(session: DocumentSession, index: int, profile: dict):
+    """
+    Render stage for one page.
+
+    Returns:
+        The preprocessed image, None for a blank page, or PAGE_TILED when the
+        page is too large to render in one piece.
+    """
+    if needs_tiling(session, index, profile["dpi"]):
+        return PAGE_TILED
+    # Take the embedded scan (or render the page) and run the shared preprocessing stage
+    pix = session.ocr_pixmap(index, dpi=profile["dpi"])
+    return preprocess_page(pixmap_to_array(pix), profile["preprocess"])
+
+
+def recognize_page(image, profile: dict, psm: int | None = None) -> tuple[str, str]:
+    """OCR stage for a prepared page image. Returns (text, language pack used)."""
+    # The multi-language model only runs on pages whose script needs it
+    lang = select_ocr_lang(image)
+    psm = psm if psm is not None else profile["psm"]
+    return get_ocr_pool(lang, oem=profile["oem"]).recognize(image, psm=psm), lang
+
+
+class PagePipeline:
+    """
+    Iterates over a document's pages with rendering running ahead of OCR.
+
+    Args:
+        session: The open document.
+        profile: An OCR profile from `ocr_backends.get_ocr_profile`.
+        direct_text: Optional callable(page_index) returning the page's text
+            layer when it is good enough, or None when the page needs OCR.
+            Without it every page is OCR'd.
+        psm: Page segmentation mode; the profile's when None.
+        lookahead: Pages the render stage may prepare ahead of the OCR stage.
+
+    Yields (in page order) dictionaries with "page", "text", "ocr_used",
+    "blank", "tiled" and "lang". Closing the iterator early stops the render
+    stage, so unread pages are never rendered.
+    """
+
+    def __init__(self, session: DocumentSession, profile: dict, direct_text=None,
+                 psm: int | None = None, lookahead: int = OCR_PIPELINE_LOOKAHEAD):
+        self.session = session
+        self.profile = profile
+        self.direct_text = direct_text
+        self.psm = psm
+        self._queue = queue.Queue(maxsize=max(1, lookahead))
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _render_stage(self):
+        try:
+            for index in range(self.session.page_count):
+                if self._stop.is_set():
+                    return
+                with self._lock:
+                    text = self.direct_text(index) if self.direct_text else None
+                    prepared = prepare_page(self.session, index, self.profile) if text is None else None
+                self._put((index, text, prepared, None))
+        except Exception as e:
+            self._put((None, None, None, e))
+        finally:
+            self._put(_DONE)
+
+    def __iter__(self):
+        self._thread = threading.Thread(target=self._render_stage, daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                index, text, prepared, error = item
+                if error is not None:
+                    raise error
+                page = {"page": index, "text": text, "ocr_used": text is None,
+                        "blank": False, "tiled": False, "lang": None}
+                if text is None:  # Pages with direct text are passed through as they are
+                    if prepared is None:
+                        page.update(text="", blank=True)  # Blank page - nothing for Tesseract to read
+                    elif isinstance(prepared, str) and prepared == PAGE_TILED:
+                        with self._lock:
+                            page.update(text=ocr_page_tiled(self.session, index, self.profile, psm=self.psm), tiled=True)
+                    else:
+                        page["text"], page["lang"] = recognize_page(prepared, self.profile, self.psm)
+                del prepared
+                yield page
+        finally:
+            self.close()
+
+    def close(self):
+        """Stops the render stage and drops any pages it prepared ahead."""
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -3,62 +3,135 @@
 # Date: 2025-07-24
 # Version: VC-10
 
-import fitz  # PyMuPDF
 import pytesseract
-from PIL import Image
-import io
+
+from document_session import DocumentSession
+from ocr_backends import get_ocr_profile
+from ocr_pipeline import PAGE_TILED, PagePipeline, prepare_page, recognize_page
+from page_classifier import PAGE_IMAGE
+from tiled_ocr import ocr_page_tiled
 
 # This module contains the logic for extracting text from PDFs,
 # including a fallback to OCR for scanned documents.
 
 MIN_TEXT_LENGTH_FOR_DIGITAL = 100 # If a PDF has less than this much text, assume it's scanned.
+MIN_TEXT_LENGTH_PER_PAGE = 50 # Pages with less direct text than this are OCR'd on their own when iterating.
+EXTRACTION_ERROR_PREFIXES = ("TESSERACT NOT FOUND", "Error extracting text:") # extract_text_from_pdf reports failures as its text
+
+def _ocr_page(session: DocumentSession, page_num: int, profile: dict) -> str:
+    """Renders one page, preprocesses it and OCRs it with an OCR profile. Blank pages return an empty string."""
+    image = prepare_page(session, page_num, profile)
+    if image is None:
+        return ""  # Blank page - nothing for Tesseract to read
+    if isinstance(image, str) and image == PAGE_TILED:
+        return ocr_page_tiled(session, page_num, profile)  # Oversized page - bounded memory
+    # Use the shared recognizer pool (persistent Tesseract when available)
+    # You may need to configure the path to tesseract executable
+    # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+    return recognize_page(image, profile)[0]
+
+def _is_ocr_needed(source) -> bool:
+    """True when the PDF has no usable text layer. Uses the page classifier, not a full text extraction."""
+    session, owned = DocumentSession.ensure(source)
+    try:
+        return session.is_corrupt or session.needs_ocr(MIN_TEXT_LENGTH_FOR_DIGITAL)
+    finally:
+        if owned:
+            session.close()
 
-def extract_text_from_pdf(pdf_path) -> dict:
+def extract_text_from_pdf(pdf_path, ocr_profile: str | None = None) -> dict:
     """
     Extracts text from a PDF using a hybrid strategy.
     1. Tries direct text extraction via PyMuPDF.
     2. If that fails, falls back to OCR with Tesseract.
 
     Args:
-        pdf_path: The Path object for the PDF file.
+        pdf_path: The Path object for the PDF file, or an open DocumentSession
+            (the document is then neither re-read nor re-parsed).
+        ocr_profile: Name of an entry in config.OCR_PROFILES (default profile if None).
 
     Returns:
-        A dictionary containing the extracted text and a flag indicating if OCR was used.
-        Example: {"text": "...", "ocr_used": True}
+        A dictionary containing the extracted text, a flag indicating if OCR was
+        used and the offset in the text where each page starts.
+        Example: {"text": "...", "ocr_used": True, "page_starts": [0, 1841, ...]}
     """
     full_text = ""
+    page_starts = []
     ocr_performed = False
+    session = None
+    owned = False
+    profile = get_ocr_profile(ocr_profile)
 
     try:
+        session, owned = DocumentSession.ensure(pdf_path)
+        if session.is_corrupt:
+            raise ValueError(session.open_error)
+
         # --- Stage 1: Attempt Direct Text Extraction ---
-        doc = fitz.open(pdf_path)
-        for page in doc:
-            full_text += page.get_text()
-        doc.close()
+        # Scanned documents are recognized from their page structure and go straight to OCR.
+        if not session.needs_ocr(MIN_TEXT_LENGTH_FOR_DIGITAL):
+            for page_num in range(session.page_count):
+                page_starts.append(len(full_text))
+                full_text += session.page_text(page_num)
 
         # --- Stage 2: Check if OCR is needed ---
         if len(full_text.strip()) < MIN_TEXT_LENGTH_FOR_DIGITAL:
             ocr_performed = True
             full_text = "" # Reset text to fill with OCR content
-            doc = fitz.open(pdf_path)
-            for page_num, page in enumerate(doc):
-                # Convert page to an image
-                pix = page.get_pixmap(dpi=300)
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
-                
-                # Use Tesseract to perform OCR on the image
-                try:
-                    # You may need to configure the path to tesseract executable
-                    # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-                    page_text = pytesseract.image_to_string(image, lang='eng')
-                    full_text += page_text + "\n"
-                except pytesseract.TesseractNotFoundError:
-                    return {"text": "TESSERACT NOT FOUND. Please install Tesseract-OCR and ensure it's in your system's PATH.", "ocr_used": True}
-            doc.close()
-
-        return {"text": full_text.strip(), "ocr_used": ocr_performed}
+            page_starts = []
+            # The next pages are rendered while the current one is OCR'd
+            try:
+                for page in PagePipeline(session, profile):
+                    page_starts.append(len(full_text))
+                    if page["text"]:
+                        full_text += page["text"] + "\n"
+            except pytesseract.TesseractNotFoundError:
+                return {"text": "TESSERACT NOT FOUND. Please install Tesseract-OCR and ensure it's in your system's PATH.", "ocr_used": True}
+
+        lead = len(full_text) - len(full_text.lstrip())  # Offsets are in the stripped text
+        return {"text": full_text.strip(), "ocr_used": ocr_performed,
+                "page_starts": [max(0, start - lead) for start in page_starts]}
 
     except Exception as e:
-        print(f"Critical error during text extraction for {pdf_path.name}: {e}")
+        name = session.name if session else getattr(pdf_path, "name", pdf_path)
+        print(f"Critical error during text extraction for {name}: {e}")
         return {"text": f"Error extracting text: {e}", "ocr_used": False}
+    finally:
+        if owned:
+            session.close()
+
+def iter_page_text(pdf_path, ocr_profile: str | None = None):
+    """
+    Yields the text of a PDF one page at a time, OCR'ing only pages without a text layer.
+
+    Pages are rendered at most OCR_PIPELINE_LOOKAHEAD pages ahead of the OCR,
+    so closing the generator early (see `data_harvester.harvest_pages`) skips
+    the remaining pages. Errors such as a missing Tesseract install are raised
+    to the caller.
+
+    Args:
+        pdf_path: Path to the PDF file, or an open DocumentSession.
+        ocr_profile: Name of an entry in config.OCR_PROFILES (default profile if None).
+
+    Yields:
+        A dictionary per page.
+        Example: {"page": 0, "text": "...", "ocr_used": False}
+    """
+    profile = get_ocr_profile(ocr_profile)
+    session, owned = DocumentSession.ensure(pdf_path)
+    try:
+        if session.is_corrupt:
+            raise ValueError(f"Could not open {session.name}: {session.open_error}")
+        labels = session.page_labels()
+        def direct_text(page_num):
+            if labels[page_num] == PAGE_IMAGE:
+                return None  # No usable text layer - skip the extraction
+            text = session.page_text(page_num)
+            return text if len(text.strip()) >= MIN_TEXT_LENGTH_PER_PAGE else None
+
+        with PagePipeline(session, profile, direct_text) as pipeline:
+            for page in pipeline:
+                yield {"page": page["page"], "text": page["text"], "ocr_used": page["ocr_used"]}
+    finally:
+        if owned:
+            session.close()
@@ -26,6 +26,27 @@ include = [
     "file_utils.py",
     "logging_utils.py",
     "ocr_utils.py",
+    "ocr_backends.py",
+    "image_preprocessing.py",
+    "roi_ocr.py",
+    "document_session.py",
+    "job_watchdog.py",
+    "tiled_ocr.py",
+    "ocr_pipeline.py",
+    "page_buffers.py",
+    "page_classifier.py",
+    "pattern_engine.py",
+    "pattern_store.py",
+    "pattern_profiler.py",
+    "pattern_impact.py",
+    "search_index.py",
+    "model_index.py",
+    "text_corpus.py",
+    "patterns.json",
+    "model_catalog.py",
+    "fuzzy_models.py",
+    "parallel_ocr.py",
+    "benchmarks.py",
     "custom_exceptions.py",
     "config.py",
     "version.py",
@@ -0,0 +1,85 @@
+# page_buffers.py
+# Shared-memory transport for page images between render and OCR processes.
+#
+# Pickling a 25 MB page image through a multiprocessing queue copies it twice
+# and serializes it through a pipe. Instead, the parent creates a fixed pool of
+# shared-memory slots. A render process takes a free slot, writes the raw gray
+# samples into it and sends only a small descriptor (slot, shape); the OCR
+# process reads the samples in place and hands the slot back. Because slots are
+# recycled, the pool also caps how many prepared pages exist at any moment.
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class PageBufferPool:
+    """
+    A recycled pool of shared-memory page slots.
+
+    Create it in the parent with `PageBufferPool.create()`, pass `handle()` to
+    worker processes and rebuild it there with `PageBufferPool.attach()`. Only
+    the creating process unlinks the memory, in `close()`.
+    """
+
+    def __init__(self, names: list[str], slot_bytes: int, free_slots, owner: bool):
+        self.names = names
+        self.slot_bytes = slot_bytes
+        self._free = free_slots
+        self._owner = owner
+        self._segments = {}
+
+    @classmethod
+    def create(cls, context, slot_count: int, slot_bytes: int) -> "PageBufferPool":
+        """Allocates `slot_count` slots of `slot_bytes` each. `context` is a multiprocessing context."""
+        segments = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slot_count)]
+        free_slots = context.Queue()
+        for slot in range(slot_count):
+            free_slots.put(slot)
+        pool = cls([s.name for s in segments], slot_bytes, free_slots, owner=True)
+        pool._segments = dict(enumerate(segments))
+        return pool
+
+    def handle(self) -> tuple:
+        """Picklable description of the pool for worker processes."""
+        return self.names, self.slot_bytes, self._free
+
+    @classmethod
+    def attach(cls, handle: tuple) -> "PageBufferPool":
+        names, slot_bytes, free_slots = handle
+        return cls(names, slot_bytes, free_slots, owner=False)
+
+    def _segment(self, slot: int) -> shared_memory.SharedMemory:
+        segment = self._segments.get(slot)
+        if segment is None:
+            segment = self._segments[slot] = shared_memory.SharedMemory(name=self.names[slot])
+        return segment
+
+    def fits(self, image: np.ndarray) -> bool:
+        return image.nbytes <= self.slot_bytes
+
+    def write(self, image: np.ndarray) -> dict:
+        """
+        Copies a gray page image into a free slot, waiting for one if all are busy.
+
+        Returns:
+            The descriptor to send to the reader: {"slot", "shape"}.
+        """
+        slot = self._free.get()
+        view = np.ndarray(image.shape, dtype=np.uint8, buffer=self._segment(slot).buf)
+        view[...] = image
+        return {"slot": slot, "shape": image.shape}
+
+    def read(self, descriptor: dict) -> np.ndarray:
+        """A NumPy view of the slot's samples. Valid until `release()` is called for it."""
+        return np.ndarray(descriptor["shape"], dtype=np.uint8, buffer=self._segment(descriptor["slot"]).buf)
+
+    def release(self, descriptor: dict):
+        self._free.put(descriptor["slot"])
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+            if self._owner:
+                segment.unlink()
+        self._segments.clear()
@@ -0,0 +1,128 @@
+# page_classifier.py
+# Fast scanned-vs-digital page classification.
+#
+# Deciding whether a document needs OCR used to mean extracting its whole text
+# layer first - wasted work on a 500-page digital manual. The classifier looks
+# at structural signals MuPDF answers without laying out any text: the fonts a
+# page references and the images it places (and how much of the page they
+# cover). Extracted characters are only counted on the first few pages, to catch
+# documents whose fonts are declared but draw no usable text (e.g. a scan with
+# an empty OCR layer).
+#
+# Labels: "text" (text layer, little or no image), "mixed" (text layer over a
+# large image, e.g. a searchable scan) and "image" (no usable text layer).
+#
+# The labels pick the extractor for each page and weight the job's ETA (see
+# WorkEstimate). They do not reorder the job: documents are extracted one at a
+# time, so processing the OCR-bound ones first would not finish it any sooner.
+
+import fitz  # PyMuPDF
+
+from config import CLASSIFIER_IMAGE_COVERAGE, CLASSIFIER_MIN_PAGE_CHARS, CLASSIFIER_SAMPLE_PAGES, PAGE_COST
+
+PAGE_TEXT = "text"
+PAGE_MIXED = "mixed"
+PAGE_IMAGE = "image"
+
+
+def image_coverage(page, has_fonts: bool = True) -> float:
+    """
+    Fraction of the page covered by placed images (capped at 1.0).
+
+    Pages with fonts skip the content-stream scan when their resources list no
+    image at all; font-less pages are always scanned, since inline images are
+    not listed in the resources.
+    """
+    if has_fonts and not page.get_images():
+        return 0.0
+    area = page.rect.get_area()
+    if not area:
+        return 0.0
+    covered = 0.0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & page.rect
+        if not bbox.is_empty:
+            covered += bbox.get_area()
+    return min(1.0, covered / area)
+
+
+def _label(page, has_text: bool) -> str:
+    if not has_text:
+        return PAGE_IMAGE
+    return PAGE_MIXED if image_coverage(page) >= CLASSIFIER_IMAGE_COVERAGE else PAGE_TEXT
+
+
+def classify_pages(doc, page_text=None) -> list[str]:
+    """
+    Labels every page of a document as "text", "image" or "mixed".
+
+    Args:
+        doc: An open fitz.Document.
+        page_text: Optional callable(index) returning a page's text layer, e.g.
+            `DocumentSession.page_text`, so the sampled pages' text is cached
+            for the extraction that follows.
+
+    Returns:
+        One label per page, in page order.
+    """
+    page_text = page_text or (lambda i: doc[i].get_text())
+    sample = min(CLASSIFIER_SAMPLE_PAGES, doc.page_count)
+    labels = []
+
+    # Leading pages: fonts must actually draw some characters
+    font_pages = silent_pages = 0
+    for i in range(sample):
+        has_text = bool(doc[i].get_fonts())
+        if has_text:
+            font_pages += 1
+            if len(page_text(i).strip()) < CLASSIFIER_MIN_PAGE_CHARS:
+                has_text = False
+                silent_pages += 1
+        labels.append(_label(doc[i], has_text))
+
+    # Remaining pages: fonts alone decide, unless every sampled font page drew nothing
+    fonts_reliable = not font_pages or silent_pages < font_pages
+    for i in range(sample, doc.page_count):
+        page = doc[i]
+        labels.append(_label(page, fonts_reliable and bool(page.get_fonts())))
+    return labels
+
+
+def labels_cost(labels: list[str] | None) -> float:
+    """
+    Relative processing cost of a document, from its page labels and PAGE_COST.
+
+    Documents that were never classified (cache hits, unreadable or encrypted
+    files) count as one text page.
+    """
+    return max(PAGE_COST[PAGE_TEXT], sum(PAGE_COST[label] for label in labels or ()))
+
+
+class WorkEstimate:
+    """
+    The job's work done and expected in total, for its ETA.
+
+    Each document's cost is added once it has been processed (see
+    `labels_cost`), so no file is opened just for the estimate. Documents not
+    reached yet are expected to cost the average so far.
+    """
+
+    def __init__(self, documents: int):
+        self.documents = documents
+        self.processed = 0
+        self.done = 0.0
+
+    def add(self, cost: float):
+        self.processed += 1
+        self.done += cost
+
+    @property
+    def total(self) -> float:
+        average = self.done / self.processed if self.processed else PAGE_COST[PAGE_TEXT]
+        return self.done + max(0, self.documents - self.processed) * average
+
+
+def summarize(labels: list[str]) -> str:
+    """E.g. '12 text, 3 image' - for log lines."""
+    counts = {kind: labels.count(kind) for kind in (PAGE_TEXT, PAGE_MIXED, PAGE_IMAGE)}
+    return ", ".join(f"{n} {kind}" for kind, n in counts.items() if n) or "no pages"
@@ -0,0 +1,189 @@
+# parallel_ocr.py
+# Multi-process OCR engine: render processes feed OCR processes.
+#
+# Rendering (MuPDF and preprocessing) and recognition (Tesseract) run in
+# separate pools of processes, so the pages of one document are OCR'd on
+# several cores at once. Prepared page images travel from the render processes
+# to the OCR processes through page_buffers.PageBufferPool ("shared_memory",
+# the default): only a small slot descriptor goes over the queue. The "pickle"
+# transport sends the arrays through the queue instead and is kept for
+# comparison (see benchmarks.py page-transport).
+
+import itertools
+import multiprocessing
+import queue
+
+from config import OCR_PAGE_TRANSPORT, OCR_PARALLEL_WORKERS, OCR_RENDER_WORKERS, OCR_TILE_MAX_PIXELS
+from custom_exceptions import PDFExtractionError
+from document_session import DocumentSession
+from ocr_backends import get_ocr_profile
+from ocr_pipeline import PAGE_TILED, prepare_page, recognize_page
+from page_buffers import PageBufferPool
+from tiled_ocr import ocr_page_tiled
+
+TRANSPORTS = ("shared_memory", "pickle")
+RESULT_POLL_SECONDS = 1.0  # How often a waiting caller checks that the workers are still alive
+
+
+def _render_worker(tasks, pages, results, buffers_handle):
+    """Render process: prepares pages and hands them to the OCR processes."""
+    buffers = PageBufferPool.attach(buffers_handle) if buffers_handle else None
+    session = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            job, pdf_path, index, profile_name, psm = task
+            try:
+                # Tasks arrive document by document, so one open session is kept.
+                if session is None or str(session.path) != pdf_path:
+                    if session is not None:
+                        session.close()
+                    session = DocumentSession(pdf_path)
+                profile = get_ocr_profile(profile_name)
+                image = prepare_page(session, index, profile)
+                if image is None:
+                    results.put((job, index, "", None))  # Blank page
+                elif isinstance(image, str) and image == PAGE_TILED:
+                    results.put((job, index, ocr_page_tiled(session, index, profile, psm=psm), None))
+                elif buffers is not None and buffers.fits(image):
+                    pages.put((job, index, profile_name, psm, buffers.write(image), None))
+                else:
+                    pages.put((job, index, profile_name, psm, None, image))
+            except Exception as e:
+                results.put((job, index, None, f"{type(e).__name__}: {e}"))
+    finally:
+        if session is not None:
+            session.close()
+        if buffers is not None:
+            buffers.close()
+
+
+def _ocr_worker(pages, results, buffers_handle):
+    """OCR process: recognizes prepared pages, reading shared-memory slots in place."""
+    buffers = PageBufferPool.attach(buffers_handle) if buffers_handle else None
+    try:
+        while True:
+            item = pages.get()
+            if item is None:
+                return
+            job, index, profile_name, psm, descriptor, image = item
+            try:
+                if descriptor is not None:
+                    image = buffers.read(descriptor)
+                text, _ = recognize_page(image, get_ocr_profile(profile_name), psm)
+                results.put((job, index, text, None))
+            except Exception as e:
+                results.put((job, index, None, f"{type(e).__name__}: {e}"))
+            finally:
+                image = None  # Drop the view before the slot is reused
+                if descriptor is not None:
+                    buffers.release(descriptor)
+    finally:
+        if buffers is not None:
+            buffers.close()
+
+
+class ParallelOcrEngine:
+    """
+    A pool of render and OCR processes shared by all documents of a batch.
+
+    Use as a context manager; the processes and shared memory are released on
+    exit.
+    """
+
+    def __init__(self, ocr_workers: int = OCR_PARALLEL_WORKERS, render_workers: int = OCR_RENDER_WORKERS,
+                 transport: str = OCR_PAGE_TRANSPORT):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown page transport '{transport}'. Expected one of {TRANSPORTS}.")
+        ocr_workers, render_workers = max(1, ocr_workers), max(1, render_workers)
+        self.transport = transport
+        context = multiprocessing.get_context("spawn")
+        self._tasks, self._pages, self._results = context.Queue(), context.Queue(), context.Queue()
+
+        # Enough slots to keep every OCR process busy with one page queued behind it.
+        # Pages above OCR_TILE_MAX_PIXELS are tiled, so one slot always holds a page.
+        self._buffers = None
+        if transport == "shared_memory":
+            self._buffers = PageBufferPool.create(context, 2 * ocr_workers + render_workers, OCR_TILE_MAX_PIXELS)
+        handle = self._buffers.handle() if self._buffers else None
+
+        self._renderers = [context.Process(target=_render_worker, args=(self._tasks, self._pages, self._results, handle), daemon=True)
+                           for _ in range(render_workers)]
+        self._recognizers = [context.Process(target=_ocr_worker, args=(self._pages, self._results, handle), daemon=True)
+                             for _ in range(ocr_workers)]
+        for process in self._renderers + self._recognizers:
+            process.start()
+        self._jobs = itertools.count()
+
+    def ocr_pages(self, pdf_path, page_indices: list[int] | None = None, ocr_profile: str | None = None,
+                  psm: int | None = None) -> list[str]:
+        """
+        OCRs pages of one document in parallel.
+
+        Args:
+            pdf_path: Path to the PDF file, or an open DocumentSession.
+            page_indices: Pages to OCR (all pages if None).
+            ocr_profile: Name of an entry in config.OCR_PROFILES (default profile if None).
+            psm: Page segmentation mode; the profile's when None.
+
+        Returns:
+            The text of each requested page, in the order requested. Blank
+            pages return an empty string; a page requested twice is OCR'd once.
+
+        Raises:
+            PDFExtractionError: A page failed or a worker process died.
+        """
+        session, owned = DocumentSession.ensure(pdf_path)
+        try:
+            if session.is_corrupt or session.is_encrypted:
+                raise PDFExtractionError(f"'{session.name}' is corrupt or password-protected.")
+            if page_indices is None:
+                page_indices = list(range(session.page_count))
+            path = str(session.path.resolve())
+        finally:
+            if owned:
+                session.close()
+
+        profile_name = get_ocr_profile(ocr_profile)["name"]
+        job = next(self._jobs)
+        pending = list(dict.fromkeys(page_indices))  # Results are keyed by page
+        for index in pending:
+            self._tasks.put((job, path, index, profile_name, psm))
+
+        texts = {}
+        while len(texts) < len(pending):
+            try:
+                result_job, index, text, error = self._results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                if not all(p.is_alive() for p in self._renderers + self._recognizers):
+                    raise PDFExtractionError("An OCR worker process exited unexpectedly.")
+                continue
+            if result_job != job:
+                continue  # Late result of an earlier job that was abandoned after an error
+            if error is not None:
+                raise PDFExtractionError(f"OCR failed on page {index + 1}: {error}")
+            texts[index] = text
+        return [texts[i] for i in page_indices]
+
+    def close(self):
+        for _ in self._renderers:
+            self._tasks.put(None)
+        for process in self._renderers:
+            process.join(10)
+        for _ in self._recognizers:
+            self._pages.put(None)
+        for process in self._recognizers:
+            process.join(10)
+        for process in self._renderers + self._recognizers:
+            if process.is_alive():
+                process.kill()
+        if self._buffers is not None:
+            self._buffers.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,424 @@
+# pattern_engine.py
+# Single-pass, compiled pattern matching for data_harvester.
+#
+# harvest_all_data used to call re.finditer once per raw pattern string, so the
+# whole text was rescanned for every pattern, and it de-duplicated with a linear
+# scan of everything found so far. PatternEngine compiles the patterns of the
+# pattern store (see pattern_store) once into one matcher: a zero-width lookahead with one
+# named group per pattern, which stops only at positions where at least one
+# pattern matches. The text is scanned once. At each stop the patterns after the
+# one that matched are tried anchored at that position, and every pattern keeps
+# its own next start, so the result equals a separate finditer per pattern -
+# including matches of different patterns that overlap. Items are de-duplicated
+# with a set.
+#
+# The combined matcher is guarded by the set of characters any pattern can
+# start with, so the regex engine is only entered at plausible positions.
+# Patterns that cannot share it (backreferences, their own named groups, inline
+# global flags, no known first character) and patterns that produce an empty
+# match are run with their own finditer, so results never change.
+#
+# Before scanning, each pattern family (patterns sharing a required literal such
+# as "ecosys") is checked with a plain case-insensitive substring search; the
+# combined matcher is built only from the families present in the text, and
+# cached per active set.
+
+import bisect
+import itertools
+import re
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_constants, sre_parse
+
+from pattern_store import load_patterns
+
+_NOT_COMBINABLE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?\(")  # Backreferences, named groups, conditionals
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: r"\d", sre_constants.CATEGORY_NOT_DIGIT: r"\D",
+    sre_constants.CATEGORY_WORD: r"\w", sre_constants.CATEGORY_NOT_WORD: r"\W",
+    sre_constants.CATEGORY_SPACE: r"\s", sre_constants.CATEGORY_NOT_SPACE: r"\S",
+}
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)}
+
+
+def _class_items(items) -> set | None:
+    """Character-class fragments for a parsed [...] set, or None if it is negated or unusual."""
+    fragments = set()
+    for kind, value in items:
+        if kind is sre_constants.LITERAL:
+            fragments.add(re.escape(chr(value)))
+        elif kind is sre_constants.RANGE:
+            fragments.add(f"{re.escape(chr(value[0]))}-{re.escape(chr(value[1]))}")
+        elif kind is sre_constants.CATEGORY and value in _CATEGORIES:
+            fragments.add(_CATEGORIES[value])
+        else:
+            return None
+    return fragments
+
+
+def _first_chars(items) -> tuple[set | None, bool]:
+    """
+    (class fragments a match can start with, whether the match can be empty)
+    for a parsed pattern. The fragments are None when the start is unknown.
+    """
+    fragments = set()
+    for op, av in items:
+        if op is sre_constants.AT:
+            continue  # \b, ^ and friends consume nothing
+        if op is sre_constants.LITERAL:
+            first, nullable = {re.escape(chr(av))}, False
+        elif op is sre_constants.IN:
+            first, nullable = _class_items(av), False
+        elif op is sre_constants.BRANCH:
+            first, nullable = set(), False
+            for alternative in av[1]:
+                alt_first, alt_nullable = _first_chars(alternative)
+                if alt_first is None:
+                    return None, True
+                first |= alt_first
+                nullable = nullable or alt_nullable
+        elif op is sre_constants.SUBPATTERN:
+            first, nullable = _first_chars(av[-1])
+        elif op in _REPEATS:
+            first, nullable = _first_chars(av[2])
+            nullable = nullable or av[0] == 0
+        else:
+            return None, True
+        if first is None:
+            return None, True
+        fragments |= first
+        if not nullable:
+            return fragments, False
+    return fragments, True
+
+
+def first_char_class(pattern: str, flags: int = 0) -> set | None:
+    """Class fragments covering every character a match of `pattern` can start with, or None."""
+    try:
+        fragments, nullable = _first_chars(sre_parse.parse(pattern, flags))
+    except Exception:
+        return None
+    return None if nullable else fragments
+
+
+# --- REQUIRED LITERALS (prefilter) ---
+# Most patterns are anchored on literal tokens (TASKalfa, ECOSYS, FS-, QA, ...).
+# A pattern can only match a text that contains one of its required literals,
+# so a cheap case-insensitive substring check decides whether it runs at all.
+MIN_PREFILTER_LITERAL = 2  # Shorter literals are too common to be worth checking
+MAX_LITERAL_CHOICES = 32  # Cap on the alternatives a literal choice like (PF|DF|MK)- expands to
+_FOLD_EXTRAS = str.maketrans({"ſ": "s", "ı": "i", "İ": "i"})  # Non-ASCII letters re.IGNORECASE equates with s/i
+
+
+def fold_text(text: str) -> str:
+    """Case-folds a text the way the prefilter compares literals (a superset of re.IGNORECASE for ASCII)."""
+    return text.lower() if text.isascii() else text.translate(_FOLD_EXTRAS).lower()
+
+
+def _literal_char(op, av) -> str | None:
+    if op is sre_constants.LITERAL and av < 128:
+        return chr(av).lower()
+    if op is sre_constants.IN and len(av) == 1 and av[0][0] is sre_constants.LITERAL and av[0][1] < 128:
+        return chr(av[0][1]).lower()  # A one-character set such as [-]
+    return None
+
+
+def _literal_choices(items) -> set | None:
+    """The strings a purely literal parsed sequence (literals and literal alternations) can spell, else None."""
+    choices = {""}
+    for op, av in items:
+        if op is sre_constants.AT:
+            continue
+        char = _literal_char(op, av)
+        if char is not None:
+            choices = {c + char for c in choices}
+            continue
+        if op is sre_constants.SUBPATTERN:
+            inner = _literal_choices(av[-1])
+        elif op is sre_constants.BRANCH:
+            inner = set()
+            for alternative in av[1]:
+                alt_choices = _literal_choices(alternative)
+                if alt_choices is None:
+                    return None
+                inner |= alt_choices
+        else:
+            return None
+        if inner is None or len(choices) * len(inner) > MAX_LITERAL_CHOICES:
+            return None
+        choices = {c + i for c in choices for i in inner}
+    return choices
+
+
+def _required_literals(items, candidates: list):
+    """Appends to `candidates` every literal choice set a match of the parsed sequence must contain."""
+    run = {""}
+    for op, av in items:
+        if op is sre_constants.AT:
+            continue  # Zero-width: the literal run continues across \b
+        if _literal_char(op, av) is not None or op in (sre_constants.SUBPATTERN, sre_constants.BRANCH):
+            inner = _literal_choices([(op, av)])
+            if inner is not None and len(run) * len(inner) <= MAX_LITERAL_CHOICES:
+                run = {r + i for r in run for i in inner}
+                continue
+        candidates.append(run)
+        run = {""}
+        if op is sre_constants.SUBPATTERN:
+            _required_literals(av[-1], candidates)
+        elif op in _REPEATS and av[0] >= 1:
+            _required_literals(av[2], candidates)
+    candidates.append(run)
+
+
+def required_literals(pattern: str, flags: int = 0) -> frozenset | None:
+    """
+    Literal strings (lower case) of which every match must contain at least one,
+    e.g. {"taskalfa"} for r"\\bTASKalfa\\s*[\\w-]+\\b", or None when the pattern
+    has no usable literal.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return None
+    candidates = []
+    _required_literals(parsed, candidates)
+    best = max(candidates, key=lambda choice: (min(map(len, choice)), -len(choice)))
+    return frozenset(best) if min(map(len, best)) >= MIN_PREFILTER_LITERAL else None
+
+
+class _Scanner:
+    """The combined, first-character-guarded matcher for one set of active patterns."""
+
+    def __init__(self, entries: list, active: tuple, starts: dict, flags: int):
+        combined = [i for i in active if starts[i] and PatternEngine._combinable(entries[i][1].pattern, flags)]
+        self.regex = None
+        self.combined = []
+        if combined:
+            guard = "".join(sorted(set().union(*(starts[i] for i in combined))))
+            alternatives = "|".join(f"(?P<p{i}>{entries[i][1].pattern})" for i in combined)
+            try:
+                self.regex = re.compile(f"(?=[{guard}])(?=(?:{alternatives}))", flags)
+                self.combined = combined
+            except (re.error, RecursionError, OverflowError):
+                pass  # Everything falls back to one finditer per pattern
+        self.fallback = [i for i in active if i not in set(self.combined)]
+        # Regex group number -> position of that pattern in the alternation
+        self.group_rank = {self.regex.groupindex[f"p{i}"]: rank for rank, i in enumerate(self.combined)} if self.regex else {}
+
+
+class PatternEngine:
+    """
+    All harvest patterns, compiled once.
+
+    Args:
+        patterns: {item type: [pattern, ...]}, in the order items are reported.
+        flags: Regex flags applied to every pattern.
+        version: Pattern store version the patterns came from, if any.
+    """
+
+    def __init__(self, patterns: dict, flags: int = re.IGNORECASE, version: str | None = None):
+        self.patterns = patterns
+        self.flags = flags
+        self.version = version
+        self.entries = []  # (item type, compiled pattern), in report order
+        for item_type, regex_list in patterns.items():
+            for pattern in regex_list:
+                try:
+                    self.entries.append((item_type, re.compile(pattern, flags)))
+                except re.error as e:
+                    # This will catch any invalid regex patterns
+                    print(f"Regex error for pattern '{pattern}': {e}")
+        self._starts = {i: first_char_class(compiled.pattern, flags) for i, (_, compiled) in enumerate(self.entries)}
+
+        # Pattern families: entries sharing the same required literals are checked together
+        self.families = {}
+        self._always = []
+        for i, (_, compiled) in enumerate(self.entries):
+            literals = required_literals(compiled.pattern, flags)
+            if literals is None:
+                self._always.append(i)
+            else:
+                self.families.setdefault(literals, []).append(i)
+        self._scanners = {}  # Active entry indices -> _Scanner
+
+    @staticmethod
+    def _combinable(pattern: str, flags: int) -> bool:
+        if _NOT_COMBINABLE.search(pattern):
+            return False
+        try:
+            re.compile(f"(?=(?P<p>{pattern}))", flags)  # Inline global flags fail here
+        except re.error:
+            return False
+        return True
+
+    def active_entries(self, text: str) -> tuple:
+        """Indices of the entries that can match the text: those whose family literals occur in it."""
+        folded = fold_text(text)
+        active = list(self._always)
+        for literals, indices in self.families.items():
+            if any(literal in folded for literal in literals):
+                active.extend(indices)
+        return tuple(sorted(active))
+
+    def _scanner(self, active: tuple) -> _Scanner:
+        scanner = self._scanners.get(active)
+        if scanner is None:
+            scanner = self._scanners[active] = _Scanner(self.entries, active, self._starts, self.flags)
+        return scanner
+
+    def entry_keys(self) -> list[str]:
+        """A stable key per entry, e.g. 'model:\\bFS-\\d+DN\\b', for storing its matches."""
+        return [f"{item_type}:{compiled.pattern}" for item_type, compiled in self.entries]
+
+    def find(self, text: str, only: set | None = None) -> list[list[tuple[int, int]]]:
+        """
+        Matches every pattern against the text in one scan.
+
+        Pattern families whose literals do not occur in the text are skipped.
+
+        Args:
+            text: The text to scan.
+            only: Entry indices to match; the others get no spans. All if None.
+
+        Returns:
+            For each entry in `self.entries`, the (start, end) spans of its
+            matches in text order - what `re.finditer` would return for that
+            pattern alone.
+        """
+        hits = [[] for _ in self.entries]
+        active = self.active_entries(text)
+        if only is not None:
+            active = tuple(i for i in active if i in only)
+        if not active:
+            return hits
+        scanner = self._scanner(active)
+        redo = []
+        if scanner.regex is not None:
+            combined = scanner.combined
+            next_start = [0] * len(combined)
+            for stop in scanner.regex.finditer(text):
+                pos = stop.start()
+                first = scanner.group_rank[stop.lastindex]
+                # Patterns earlier in the alternation already failed at this position
+                for rank in range(first, len(combined)):
+                    if next_start[rank] > pos:
+                        continue  # Would overlap this pattern's previous match
+                    if rank == first:
+                        start, end = stop.span(stop.lastindex)
+                    else:
+                        match = self.entries[combined[rank]][1].match(text, pos)
+                        if match is None:
+                            continue
+                        start, end = match.span()
+                    if start == end:
+                        next_start[rank] = len(text) + 1
+                        redo.append(combined[rank])  # Empty matches follow finditer's own rules
+                        continue
+                    hits[combined[rank]].append((start, end))
+                    next_start[rank] = end
+
+        for i in scanner.fallback + redo:
+            hits[i] = [match.span() for match in self.entries[i][1].finditer(text)]
+        return hits
+
+    def harvest(self, text: str, known_models: list | None = None, page_starts: list | None = None) -> list[dict]:
+        """
+        Found items in report order, each (type, text) once.
+
+        Args:
+            text: The text to harvest.
+            known_models: Optional models found by other means, e.g. catalog
+                hits: {"start", "end", "text", ...} dictionaries in text order,
+                not overlapping. They are reported first (with any extra keys,
+                such as a fuzzy match's confidence), and "model" pattern
+                matches overlapping one of them are dropped. OCR corrections
+                (entries with an "ocr_text") that overlap a "model" pattern
+                match are dropped instead: text a model pattern matches as
+                written is never corrected to a different catalog model.
+            page_starts: Optional offset in the text where each page starts,
+                in page order (see ocr_utils.extract_text_from_pdf).
+
+        Returns:
+            [{"type", "text", "spans": [[start, end], ...], "pages": [1, ...]}, ...]
+            with every occurrence's character span in text order, and the
+            1-based pages they are on ("pages" only when page_starts is given).
+        """
+        return self.assemble(text, self.find(text), known_models, page_starts)
+
+    def assemble(self, text: str, spans: list, known_models: list | None = None,
+                 page_starts: list | None = None) -> list[dict]:
+        """
+        Builds `harvest`'s items from match spans, e.g. spans kept from an
+        earlier `find` (see data_harvester.reharvest).
+
+        Args:
+            spans: For each entry, its (start, end) spans, as `find` returns them.
+        """
+        found_items, by_key = [], {}
+        known_models = _uncorrected_matches(known_models or [], self.entries, spans)
+        known_starts = [known["start"] for known in known_models]
+        known_ends = [known["end"] for known in known_models]  # Sorted too: known models do not overlap
+        for known in known_models:
+            item = by_key.get(("model", known["text"]))
+            if item is None:
+                extras = {k: v for k, v in known.items() if k not in ("start", "end", "text")}
+                item = by_key[("model", known["text"])] = {"type": "model", "text": known["text"], **extras, "spans": set()}
+                found_items.append(item)
+            item["spans"].add((known["start"], known["end"]))
+        for (item_type, _), entry_spans in zip(self.entries, spans):
+            for start, end in entry_spans:
+                if item_type == "model" and known_models:
+                    first_after = bisect.bisect_right(known_ends, start)
+                    if first_after < len(known_models) and known_starts[first_after] < end:
+                        continue  # The catalog already read this model exactly
+                matched = text[start:end]
+                stripped = matched.strip()
+                key = (item_type, stripped)
+                item = by_key.get(key)
+                if item is None:
+                    item = by_key[key] = {"type": item_type, "text": stripped, "spans": set()}
+                    found_items.append(item)
+                start += len(matched) - len(matched.lstrip())
+                item["spans"].add((start, start + len(stripped)))
+        for item in found_items:
+            item["spans"] = [list(span) for span in sorted(item["spans"])]
+            if page_starts:
+                item["pages"] = sorted({max(1, bisect.bisect_right(page_starts, start)) for start, _ in item["spans"]})
+        return found_items
+
+
+def _uncorrected_matches(known_models: list, entries: list, spans: list) -> list:
+    """Known models without the OCR corrections that overlap a "model" pattern match."""
+    if not any("ocr_text" in known for known in known_models):
+        return known_models
+    model_spans = sorted(span for (item_type, _), entry_spans in zip(entries, spans)
+                         if item_type == "model" for span in entry_spans)
+    starts = [start for start, _ in model_spans]
+    reach = list(itertools.accumulate((end for _, end in model_spans), max))  # Furthest end so far
+    kept = []
+    for known in known_models:
+        if "ocr_text" in known:
+            before = bisect.bisect_left(starts, known["end"])  # Matches starting before the correction ends
+            if before and reach[before - 1] > known["start"]:
+                continue
+        kept.append(known)
+    return kept
+
+
+_engine = None
+
+
+def get_pattern_engine() -> PatternEngine:
+    """
+    The engine for the pattern store's current version.
+
+    Cheap to call per document: the store is only re-read when its file changed,
+    and the engine is only recompiled when the store's version changed.
+    """
+    global _engine
+    patterns, version = load_patterns()
+    if _engine is None or _engine.version != version:
+        _engine = PatternEngine(patterns, version=version)
+    return _engine
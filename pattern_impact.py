@@ -0,0 +1,171 @@
+# pattern_impact.py
+# Corpus-wide preview of a pattern change.
+#
+# Testing a pattern in the review window only checks the one text on screen;
+# whether the change breaks other documents used to show up in the next batch.
+# The processing engine keeps each cached result's extracted text in the text
+# corpus (see text_corpus), so a candidate pattern set can be run over every
+# cached text without touching a PDF. The current and the
+# candidate pattern sets are both harvested over the same text, so the report
+# shows only what the change itself does: models gained or lost, and status
+# flips between Pass and Needs Review.
+#
+# Only model patterns decide models and status, and a document can only change
+# if a model pattern that was added or removed matches in it. Each text is
+# first scanned with just those patterns (usually skipped outright by their
+# literal prefilter); the full harvests run only where they match. Texts are
+# spread over worker processes, each of which compiles the pattern sets once.
+#
+#   python pattern_impact.py candidate.json    (a pattern store file with the candidate patterns)
+
+import json
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+
+from config import CACHE_DIR, PREVIEW_MIN_PARALLEL_DOCS, PREVIEW_WORKERS
+from data_harvester import find_known_models
+from pattern_engine import PatternEngine
+from pattern_store import load_patterns, pattern_version
+from text_corpus import has_cached_text, read_cached_text
+
+_worker_engines = None  # (current, candidate, changed model patterns) PatternEngines of a preview worker
+
+
+def cached_documents() -> list[dict]:
+    """
+    Cached results that have their extracted text, newest per filename.
+
+    Returns:
+        [{"filename", "cache_path", "ocr_used"}, ...]
+    """
+    newest = {}
+    for cache_path in CACHE_DIR.glob("*.json"):
+        if not has_cached_text(cache_path):
+            continue
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            mtime = cache_path.stat().st_mtime
+        except (OSError, json.JSONDecodeError):
+            continue
+        if "filename" not in cached or cached.get("status") == "Fail":
+            continue
+        known = newest.get(cached["filename"])
+        if known is None or mtime > known[0]:
+            newest[cached["filename"]] = (mtime, {"filename": cached["filename"], "cache_path": str(cache_path),
+                                                  "ocr_used": bool(cached.get("ocr_used"))})
+    return [doc for _, doc in sorted(newest.values(), key=lambda entry: entry[1]["filename"])]
+
+
+def _models(text: str, known_models: list, engine: PatternEngine) -> list[str]:
+    return [item["text"] for item in engine.harvest(text, known_models) if item["type"] == "model"]
+
+
+def _changed_model_patterns(current: dict, candidate: dict) -> list[str]:
+    return sorted(set(current.get("model", [])) ^ set(candidate.get("model", [])))
+
+
+def _init_worker(current: dict, candidate: dict):
+    global _worker_engines
+    changed = PatternEngine({"model": _changed_model_patterns(current, candidate)})
+    _worker_engines = (PatternEngine(current), PatternEngine(candidate), changed)
+
+
+def _compare(doc: dict) -> dict | None:
+    """
+    Harvests one cached text with both pattern sets. None when the text is
+    unreadable; "before" and "after" are None when no changed pattern matches.
+    """
+    text = read_cached_text(Path(doc["cache_path"]))
+    if text is None:
+        return None
+    current, candidate, changed = _worker_engines
+    if not any(changed.find(text)):
+        return {"filename": doc["filename"], "before": None, "after": None}
+    # Catalog lookups do not depend on the patterns, so both sets share them
+    known_models = find_known_models(text, doc["ocr_used"])
+    before = _models(text, known_models, current)
+    after = _models(text, known_models, candidate)
+    return {"filename": doc["filename"], "before": before, "after": after}
+
+
+def preview_impact(candidate: dict, current: dict | None = None, workers: int = PREVIEW_WORKERS) -> dict:
+    """
+    Runs a candidate pattern set over every cached text and compares it with the current one.
+
+    Args:
+        candidate: {item type: [pattern, ...]} to try.
+        current: The pattern set to compare with; the pattern store's if None.
+        workers: Worker processes (all CPUs when 0). Small corpora are
+            compared in this process.
+
+    Returns:
+        {"documents": number compared, "current_version", "candidate_version",
+         "changed": [{"filename", "gained", "lost", "status_before", "status_after"}, ...],
+         "to_pass": count, "to_review": count}
+    """
+    if current is None:
+        current, _ = load_patterns()
+    docs = cached_documents()
+    if not _changed_model_patterns(current, candidate):
+        results = [{"filename": doc["filename"], "before": None, "after": None} for doc in docs]
+    elif len(docs) < PREVIEW_MIN_PARALLEL_DOCS:
+        _init_worker(current, candidate)
+        results = [_compare(doc) for doc in docs]
+    else:
+        processes = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes, initializer=_init_worker, initargs=(current, candidate)) as pool:
+            results = list(pool.imap_unordered(_compare, docs, chunksize=max(1, len(docs) // (processes * 8))))
+
+    report = {"documents": 0, "current_version": pattern_version(current), "candidate_version": pattern_version(candidate),
+              "changed": [], "to_pass": 0, "to_review": 0}
+    for result in results:
+        if result is None:
+            continue
+        report["documents"] += 1
+        before, after = result["before"], result["after"]
+        if before is None:
+            continue
+        gained = [m for m in after if m not in before]
+        lost = [m for m in before if m not in after]
+        if not gained and not lost:
+            continue
+        # Same rule as the processing engine: a document without models needs review
+        status_before = "Pass" if before else "Needs Review"
+        status_after = "Pass" if after else "Needs Review"
+        report["changed"].append({"filename": result["filename"], "gained": gained, "lost": lost,
+                                  "status_before": status_before, "status_after": status_after})
+        if status_before != status_after:
+            report["to_pass" if status_after == "Pass" else "to_review"] += 1
+    report["changed"].sort(key=lambda change: (change["status_before"] == change["status_after"], change["filename"]))
+    return report
+
+
+def format_impact_report(report: dict) -> str:
+    """A plain-text diff report for the review window and the command line."""
+    lines = [f"Pattern change {report['current_version']} -> {report['candidate_version']} "
+             f"over {report['documents']} cached document(s):",
+             f"  {len(report['changed'])} document(s) change models, {report['to_pass']} Needs Review -> Pass, "
+             f"{report['to_review']} Pass -> Needs Review", ""]
+    for change in report["changed"]:
+        flip = f"  [{change['status_before']} -> {change['status_after']}]" if change["status_before"] != change["status_after"] else ""
+        lines.append(f"{change['filename']}{flip}")
+        if change["gained"]:
+            lines.append(f"    + {', '.join(change['gained'])}")
+        if change["lost"]:
+            lines.append(f"    - {', '.join(change['lost'])}")
+    if not report["documents"]:
+        lines.append("No cached texts yet. Process some documents first.")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python pattern_impact.py candidate.json")
+        sys.exit(2)
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        candidate_patterns = json.load(f)["patterns"]
+    print(format_impact_report(preview_impact(candidate_patterns)))
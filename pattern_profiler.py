@@ -0,0 +1,285 @@
+# pattern_profiler.py
+# Cost analysis for harvest patterns.
+#
+# Patterns are added by hand in the review windows, and one badly written
+# nested quantifier such as (\w+\s?)* can backtrack for minutes on a noisy OCR
+# page. Two checks catch them before they reach a job:
+#
+# - Static: the parsed pattern is searched for the constructs that backtrack
+#   exponentially - a repeated group whose body can split the same text in
+#   several ways (nested quantifiers), and a repeated alternation whose branches
+#   can start with the same character.
+# - Timed: each pattern runs over a sample of extracted texts plus a few
+#   near-miss probes (its required literal followed by a long run of one
+#   character). Python's re cannot be interrupted, so the timing runs in a
+#   separate process that is killed when a pattern exceeds
+#   PATTERN_TIME_BUDGET_SECONDS.
+#
+# The review windows refuse patterns over the budget, and each job logs its
+# slowest patterns with their match counts.
+
+import multiprocessing
+import queue
+import re
+import string
+import time
+
+from config import PATTERN_PROFILE_SAMPLE_CHARS, PATTERN_REPORT_TOP, PATTERN_TIME_BUDGET_SECONDS, PDF_TXT_DIR
+from pattern_engine import _first_chars, required_literals, sre_constants, sre_parse
+from text_corpus import get_text_corpus
+
+WORKER_START_SECONDS = 30  # Grace period for the timing process to start
+WORKER_POLL_SECONDS = 0.2  # How often a wait checks that the timing process is still running
+PROBE_LENGTH = 32
+_PROBE_RUNS = ("a", "1", " ", "-", "a1", "a ")
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_REPEAT_LIMIT = 16  # Repeats allowing more iterations than this count as unbounded
+
+
+# --- STATIC CHECKS ---
+
+def _min_width(item, state) -> int:
+    return sre_parse.SubPattern(state, [item]).getwidth()[0]
+
+
+def _unwrap(body):
+    """The items of a repeated body, looking through a single enclosing group."""
+    items = list(body)
+    while len(items) == 1 and items[0][0] is sre_constants.SUBPATTERN:
+        items = list(items[0][1][-1])
+    return items
+
+
+def _ambiguous_body(body) -> bool:
+    """True if a repeat's body is a variable repeat padded only by optional items, e.g. \\w+\\s?."""
+    items = _unwrap(body)
+    variable = [item for item in items if item[0] in _REPEATS and item[1][1] > 1]
+    if not variable:
+        return False
+    return all(item in variable or _min_width(item, body.state) == 0 for item in items)
+
+
+def _first_char_set(items) -> set | None:
+    fragments, _ = _first_chars(items)
+    if not fragments:
+        return None
+    try:
+        first = re.compile(f"[{''.join(fragments)}]", re.IGNORECASE)
+    except re.error:
+        return None
+    return {ch for ch in string.printable if first.match(ch)}
+
+
+def _overlapping(alternatives) -> bool:
+    seen = set()
+    for alternative in alternatives:
+        first = _first_char_set(alternative)
+        if first is None or first & seen:
+            return True
+        seen |= first
+    return False
+
+
+def _scan(items, in_repeat: bool, risks: list):
+    for op, av in items:
+        if op in _REPEATS:
+            repeated = av[1] > _REPEAT_LIMIT
+            if repeated and _ambiguous_body(av[2]) and "nested quantifier" not in risks:
+                risks.append("nested quantifier")
+            _scan(av[2], in_repeat or repeated, risks)
+        elif op is sre_constants.BRANCH:
+            if in_repeat and _overlapping(av[1]) and "overlapping alternatives in a repeated group" not in risks:
+                risks.append("overlapping alternatives in a repeated group")
+            for alternative in av[1]:
+                _scan(alternative, in_repeat, risks)
+        elif op is sre_constants.SUBPATTERN:
+            _scan(av[-1], in_repeat, risks)
+
+
+def backtracking_risks(pattern: str, flags: int = re.IGNORECASE) -> list[str]:
+    """
+    Constructs in a pattern that can backtrack exponentially.
+
+    Returns:
+        Descriptions such as ["nested quantifier"]; empty when none were found
+        or the pattern does not parse.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return []
+    risks = []
+    _scan(parsed, False, risks)
+    return risks
+
+
+# --- TIMING ---
+
+def probe_texts(pattern: str, flags: int = re.IGNORECASE) -> list[str]:
+    """Near-miss inputs for a pattern: its required literal, a long run of one character, then a stop."""
+    literals = required_literals(pattern, flags)
+    prefix = min(literals) if literals else ""
+    return [f"{prefix}{run * (PROBE_LENGTH // len(run))}\x00!" for run in _PROBE_RUNS]
+
+
+def _timing_worker(patterns, texts, flags, results):
+    """Timing process: runs each pattern over the sample and its probes, reporting one result per pattern."""
+    results.put(("ready", None, None, None))
+    for index, pattern in enumerate(patterns):
+        start = time.perf_counter()
+        matches, error = 0, None
+        try:
+            compiled = re.compile(pattern, flags)
+            for text in texts:
+                matches += sum(1 for _ in compiled.finditer(text))
+            for probe in probe_texts(pattern, flags):
+                for _ in compiled.finditer(probe):
+                    pass
+        except re.error as e:
+            matches, error = None, str(e)
+        results.put((index, time.perf_counter() - start, matches, error))
+
+
+def _next_result(process, results, timeout: float):
+    """
+    The timing process's next message.
+
+    Raises:
+        queue.Empty: Nothing arrived within the timeout.
+        ChildProcessError: The process exited without sending it.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=max(0.0, min(WORKER_POLL_SECONDS, deadline - time.monotonic())))
+        except queue.Empty:
+            if not process.is_alive():
+                try:
+                    return results.get(timeout=WORKER_POLL_SECONDS)  # Sent just before it exited
+                except queue.Empty:
+                    raise ChildProcessError(f"The timing process exited unexpectedly (exit code {process.exitcode}).") from None
+            if time.monotonic() >= deadline:
+                raise
+
+
+def profile_patterns(patterns: list[str], texts: list[str], budget: float = PATTERN_TIME_BUDGET_SECONDS,
+                     flags: int = re.IGNORECASE) -> list[dict]:
+    """
+    Times each pattern over the texts, with the static checks.
+
+    A pattern that runs past the budget is stopped (the timing process is
+    killed and restarted for the remaining patterns). If the timing process
+    dies on a pattern, that pattern gets the error and the rest are timed in
+    a new process.
+
+    Args:
+        patterns: Pattern strings.
+        texts: Sample texts, e.g. from `sample_corpus`.
+        budget: Longest one pattern may take, in seconds.
+        flags: Regex flags, as used by the harvester.
+
+    Returns:
+        One dict per pattern, in order: {"pattern", "seconds" (None if stopped),
+        "matches" (in the texts), "over_budget", "risks", "error"}.
+    """
+    costs = [{"pattern": p, "seconds": None, "matches": None, "over_budget": False,
+              "risks": backtracking_risks(p, flags), "error": None} for p in patterns]
+    context = multiprocessing.get_context("spawn")
+    next_index = 0
+    while next_index < len(patterns):
+        results = context.Queue()
+        remaining = patterns[next_index:]
+        process = context.Process(target=_timing_worker, args=(remaining, texts, flags, results), daemon=True)
+        process.start()
+        try:
+            _next_result(process, results, WORKER_START_SECONDS)
+            for _ in range(len(remaining)):
+                cost = costs[next_index]
+                try:
+                    _, seconds, matches, error = _next_result(process, results, budget)
+                except queue.Empty:
+                    cost["over_budget"] = True
+                    next_index += 1
+                    break  # The process is stuck in this pattern; restart after it
+                except ChildProcessError as e:
+                    cost["error"] = str(e)
+                    next_index += 1
+                    break  # It died in this pattern; restart after it
+                cost.update(seconds=seconds, matches=matches, error=error, over_budget=seconds > budget)
+                next_index += 1
+        except (queue.Empty, ChildProcessError):
+            print("The pattern timing process did not start.")
+            break
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+    return costs
+
+
+def sample_corpus(max_chars: int = PATTERN_PROFILE_SAMPLE_CHARS) -> list[str]:
+    """
+    Extracted texts to profile against, up to max_chars: the newest texts of the
+    text corpus (see text_corpus), or the review texts in PDF_TXT_DIR before
+    anything was stored there.
+    """
+    corpus = get_text_corpus()
+    entries = sorted((corpus.entry(key) for key in corpus.keys()), key=lambda entry: entry["time"], reverse=True)
+    chosen, total = [], 0
+    for entry in entries:
+        if total >= max_chars:
+            break
+        chosen.append(entry["key"])
+        total += entry["chars"]
+    texts, total = [], 0
+    for _, text in corpus.iter_texts(chosen):
+        text = text[:max_chars - total]
+        texts.append(text)
+        total += len(text)
+    if texts:
+        return texts
+
+    paths = sorted(PDF_TXT_DIR.glob("*.txt"), key=lambda p: p.stat().st_mtime, reverse=True) if PDF_TXT_DIR.exists() else []
+    for path in paths:
+        if total >= max_chars:
+            break
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")[:max_chars - total]
+        except OSError:
+            continue
+        texts.append(text)
+        total += len(text)
+    return texts
+
+
+class TextSample:
+    """The first `max_chars` characters of text seen during a job, for its pattern cost report."""
+
+    def __init__(self, max_chars: int = PATTERN_PROFILE_SAMPLE_CHARS):
+        self.max_chars = max_chars
+        self.texts = []
+        self.chars = 0
+
+    def add(self, text: str):
+        room = self.max_chars - self.chars
+        if room > 0 and text:
+            self.texts.append(text[:room])
+            self.chars += min(room, len(text))
+
+
+def format_cost(cost: dict) -> str:
+    """E.g. '12.3 ms, 45 matches', 'over budget' or 'not timed' - for the review window and job log."""
+    if cost["error"]:
+        return "invalid"
+    if cost["over_budget"]:
+        return "over budget" if cost["seconds"] is None else f"over budget ({cost['seconds'] * 1000:.0f} ms)"
+    # Not measured, e.g. when the timing process did not start
+    text = "not timed" if cost["seconds"] is None else f"{cost['seconds'] * 1000:.1f} ms, {cost['matches']} matches"
+    return f"{text}, {', '.join(cost['risks'])}" if cost["risks"] else text
+
+
+def slowest_patterns(costs: list[dict], top: int = PATTERN_REPORT_TOP) -> list[dict]:
+    """The `top` most expensive patterns, stopped ones first. Patterns that were not timed are left out."""
+    ranked = sorted((c for c in costs if not c["error"] and (c["over_budget"] or c["seconds"] is not None)),
+                    key=lambda c: (c["over_budget"], c["seconds"] or 0.0), reverse=True)
+    return ranked[:top]
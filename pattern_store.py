@@ -0,0 +1,171 @@
+# pattern_store.py
+# Versioned data-file store for the harvest patterns.
+#
+# Harvest patterns used to live in three places: data_harvester.PATTERNS, the
+# lists in config.py, and custom_patterns.py, which the review window rewrote as
+# Python source and re-imported. They now live in one JSON file,
+# PATTERN_STORE_PATH:
+#
+#   {"format": 1, "patterns": {"model": [...], "qa_number": [...]}}
+#
+# The store's version is a short hash of its patterns, so the same pattern set
+# has the same version whoever saved it, and every harvest result records the
+# version that produced it.
+#
+# The file is stat'ed on every read but only re-read and re-hashed when its
+# modification time (or size) changes; the compiled matcher in pattern_engine is
+# keyed on the version, so it is rebuilt only when the patterns really changed.
+# A running job picks up a saved change with its next document, without any
+# module being re-imported.
+#
+# When the file does not exist yet, it is seeded once from the legacy sources.
+
+import hashlib
+import json
+import os
+import re
+import runpy
+from pathlib import Path
+
+import config
+from config import PATTERN_STORE_PATH
+
+STORE_FORMAT = 1
+# Item type -> legacy list name in config.py / custom_patterns.py (also used by the review window)
+PATTERN_LISTS = {"model": "MODEL_PATTERNS", "qa_number": "QA_NUMBER_PATTERNS"}
+LEGACY_CUSTOM_PATTERNS = config.BASE_DIR / "custom_patterns.py"
+
+
+def pattern_version(patterns: dict) -> str:
+    """Content hash of a pattern set: 12 hex digits, independent of key order."""
+    canonical = json.dumps(patterns, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def legacy_patterns() -> dict:
+    """
+    The pattern set as the legacy sources define it, used to seed a new store.
+
+    Built-in patterns (data_harvester.PATTERNS) first, then the config.py and
+    custom_patterns.py lists, each pattern string once per item type.
+    """
+    from data_harvester import PATTERNS  # Imported here: data_harvester depends on this module
+
+    custom = {}
+    if LEGACY_CUSTOM_PATTERNS.exists():
+        try:
+            namespace = runpy.run_path(str(LEGACY_CUSTOM_PATTERNS))
+            custom = {name: list(namespace.get(name, [])) for name in PATTERN_LISTS.values()}
+        except Exception as e:
+            print(f"Could not load custom_patterns.py: {e}")
+
+    merged = {}
+    for item_type in list(PATTERNS) + [t for t in PATTERN_LISTS if t not in PATTERNS]:
+        list_name = PATTERN_LISTS.get(item_type)
+        sources = [PATTERNS.get(item_type, [])]
+        if list_name:
+            sources += [getattr(config, list_name, []), custom.get(list_name, [])]
+        merged[item_type] = list(dict.fromkeys(p for source in sources for p in source))
+    return merged
+
+
+def _stamp(path: Path):
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def validate_patterns(patterns: dict):
+    """Raises ValueError for a malformed pattern set or a pattern that does not compile."""
+    if not isinstance(patterns, dict):
+        raise ValueError("The pattern set must map item types to lists of patterns.")
+    for item_type, regex_list in patterns.items():
+        if not isinstance(regex_list, list) or not all(isinstance(p, str) for p in regex_list):
+            raise ValueError(f"The '{item_type}' patterns must be a list of strings.")
+        for pattern in regex_list:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid {item_type} pattern '{pattern}': {e}") from e
+
+
+def save_patterns(patterns: dict, path: Path = PATTERN_STORE_PATH) -> str:
+    """
+    Validates and writes a whole pattern set.
+
+    The file is replaced atomically, so a job reading the store never sees a
+    half-written file.
+
+    Returns:
+        The new version.
+
+    Raises:
+        ValueError: A pattern is invalid; the store is left unchanged.
+    """
+    validate_patterns(patterns)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"format": STORE_FORMAT, "patterns": patterns}, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(temp_path, path)
+    return pattern_version(patterns)
+
+
+def update_pattern_list(item_type: str, regex_list: list[str], path: Path = PATTERN_STORE_PATH) -> str:
+    """Replaces the patterns of one item type, keeping the others. Returns the new version."""
+    patterns, _ = load_patterns(path)
+    patterns = dict(patterns)
+    patterns[item_type] = list(dict.fromkeys(regex_list))
+    return save_patterns(patterns, path)
+
+
+_cache = {"path": None, "stamp": None, "patterns": None, "version": None}
+
+
+def load_patterns(path: Path = PATTERN_STORE_PATH) -> tuple[dict, str]:
+    """
+    The current pattern set and its version.
+
+    The file is only read when its modification time or size changed since the
+    last call. A missing store is seeded from the legacy sources; a store that
+    cannot be read keeps the last good pattern set.
+
+    Returns:
+        ({item type: [pattern, ...]}, version). Treat the dictionary as read-only.
+    """
+    path = Path(path)
+    stamp = _stamp(path)
+    if stamp is None:
+        try:
+            save_patterns(legacy_patterns(), path)
+            print(f"Pattern store created at {path} from the built-in, config and custom patterns.")
+        except (OSError, ValueError) as e:
+            print(f"Could not create the pattern store {path}: {e}")
+            patterns = legacy_patterns()
+            return patterns, pattern_version(patterns)
+        stamp = _stamp(path)
+
+    if (str(path), stamp) != (_cache["path"], _cache["stamp"]):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            patterns = stored["patterns"]
+            validate_patterns(patterns)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Could not read the pattern store {path}: {e}")
+            if _cache["patterns"] is None:
+                patterns = legacy_patterns()
+                return patterns, pattern_version(patterns)
+            return _cache["patterns"], _cache["version"]
+        _cache.update(path=str(path), stamp=stamp, patterns=patterns, version=pattern_version(patterns))
+    return _cache["patterns"], _cache["version"]
+
+
+if __name__ == "__main__":
+    patterns, version = load_patterns()
+    counts = ", ".join(f"{len(regex_list)} {item_type}" for item_type, regex_list in patterns.items())
+    print(f"Pattern store {PATTERN_STORE_PATH}: version {version} ({counts}).")
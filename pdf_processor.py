@@ -9,11 +9,15 @@ from pathlib import Path
 import sys
 
 # Third-party libraries - install from requirements.txt
-import cv2
-import fitz  # This is PyMuPDF
-import numpy as np
 import pytesseract
 
+from document_session import DocumentSession
+from config import DEFAULT_OCR_PROFILE, OCR_LANG, OCR_PARALLEL_WORKERS
+from ocr_backends import get_ocr_profile, ocr_latency_report, format_latency_summary
+from ocr_pipeline import PagePipeline
+from page_classifier import PAGE_IMAGE, summarize
+from parallel_ocr import ParallelOcrEngine
+
 # --- Configuration ---
 # Set the path to the Tesseract executable if it's not in your system's PATH
 # For Windows:
@@ -28,6 +32,8 @@ FAILED_LOCKED_DIR = OUTPUT_DIR / "failed_locked"
 FAILED_OCR_DIR = OUTPUT_DIR / "failed_ocr"
 # Increased threshold for more reliable fallback detection
 MIN_TEXT_LENGTH_PER_PAGE = 50 
+# OCR profile from config.OCR_PROFILES (engine mode, DPI, preprocessing)
+OCR_PROFILE = DEFAULT_OCR_PROFILE
 
 # --- Setup Logging ---
 # This will create a log file and also print messages to the console.
@@ -57,58 +63,127 @@ def is_tesseract_installed():
         logging.error("Please install Tesseract-OCR from https://github.com/tesseract-ocr/tesseract")
         return False
 
-def is_pdf_locked(pdf_path: Path) -> bool:
-    """Checks if a PDF is encrypted using PyMuPDF."""
+def is_pdf_locked(pdf_path) -> bool:
+    """Checks if a PDF is encrypted or unreadable. Accepts a path or an open DocumentSession."""
+    session, owned = None, False
     try:
-        with fitz.open(pdf_path) as doc:
-            if doc.is_encrypted:
-                logging.warning(f"'{pdf_path.name}' is password-protected.")
-                return True
+        session, owned = DocumentSession.ensure(pdf_path)
+        if session.is_corrupt:
+            logging.error(f"Could not open '{session.name}'. It may be corrupt. Error: {session.open_error}")
+            return True
+        if session.is_encrypted:
+            logging.warning(f"'{session.name}' is password-protected.")
+            return True
     except Exception as e:
-        logging.error(f"Could not open '{pdf_path.name}'. It may be corrupt. Error: {e}")
+        logging.error(f"Could not open '{Path(pdf_path).name}'. It may be corrupt. Error: {e}")
         return True
+    finally:
+        if owned:
+            session.close()
     return False
 
-def extract_text_with_hybrid_approach(pdf_path: Path) -> str:
+def _ocr_with_engine(session, engine, direct_text, profile, psm) -> str:
+    """Hybrid extraction with the multi-process OCR engine: all OCR pages of the document run at once."""
+    pages = {}
+    for i in range(session.page_count):
+        text = direct_text(i)
+        if text is not None:
+            logging.info(f"  - Page {i+1}: Direct text extraction successful.")
+            pages[i] = f"\n--- Page {i+1} ---\n{text}"
+    ocr_indices = [i for i in range(session.page_count) if i not in pages]
+    if ocr_indices:
+        logging.warning(f"  - {len(ocr_indices)} page(s) found little text. Fell back to parallel OCR "
+                        f"({engine.transport} page transport).")
+        for i, text in zip(ocr_indices, engine.ocr_pages(session, ocr_indices, profile["name"], psm=psm)):
+            if text.strip():
+                pages[i] = f"\n--- Page {i+1} (OCR) ---\n{text.strip()}"
+    return "".join(pages[i] for i in sorted(pages))
+
+def extract_text_with_hybrid_approach(pdf_path, ocr_profile: str = OCR_PROFILE, engine=None) -> str:
     """
     Extracts text from a PDF using a hybrid strategy.
     1. Tries intelligent direct text extraction via PyMuPDF.
     2. If that fails, falls back to OCR with preprocessing.
+    Accepts a path or an open DocumentSession. With a ParallelOcrEngine, the OCR
+    pages are rendered and recognized in its worker processes.
     """
     full_text = ""
+    session, owned = None, False
+    profile = get_ocr_profile(ocr_profile)
     try:
-        with fitz.open(pdf_path) as doc:
-            for i, page in enumerate(doc):
-                # --- Stage 1: Attempt Intelligent Direct Text Extraction ---
-                # Using "simple" preserves layout better than the default "text".
-                # sort=True maintains the natural reading order.
-                direct_text = page.get_text("simple", sort=True).strip()
-                
-                if len(direct_text) > MIN_TEXT_LENGTH_PER_PAGE:
+        session, owned = DocumentSession.ensure(pdf_path)
+        labels = session.page_labels()
+        logging.info(f"  - Page types: {summarize(labels)}.")
+
+        def direct_text(i):
+            if labels[i] == PAGE_IMAGE:
+                return None  # Scanned page - no text layer worth extracting
+            # --- Stage 1: Attempt Intelligent Direct Text Extraction ---
+            # Using "simple" preserves layout better than the default "text".
+            # sort=True maintains the natural reading order.
+            text = session.page_text(i, "simple", sort=True).strip()
+            return text if len(text) > MIN_TEXT_LENGTH_PER_PAGE else None
+
+        # --- Stage 2: Fallback to OCR ---
+        # Pages without a usable text layer are rendered (or their embedded scan decoded) and
+        # preprocessed in a background thread while the previous page is being OCR'd.
+        # This script reads each page as one text block unless the profile says otherwise.
+        psm = profile["psm"] if profile["psm"] is not None else 6
+        if engine is not None:
+            return _ocr_with_engine(session, engine, direct_text, profile, psm).strip()
+        with PagePipeline(session, profile, direct_text, psm=psm) as pipeline:
+            for page in pipeline:
+                i = page["page"]
+                if not page["ocr_used"]:
                     logging.info(f"  - Page {i+1}: Direct text extraction successful.")
-                    full_text += f"\n--- Page {i+1} ---\n{direct_text}"
-                else:
-                    # --- Stage 2: Fallback to OCR ---
-                    logging.warning(f"  - Page {i+1}: Direct extraction found little text. Falling back to OCR.")
-                    pix = page.get_pixmap(dpi=300)
-                    img_cv = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
-                    
-                    if img_cv.shape[2] == 4:
-                        img_cv = cv2.cvtColor(img_cv, cv2.COLOR_BGRA2GRAY)
-                    else:
-                        img_cv = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-
-                    thresh_image = cv2.threshold(img_cv, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-                    denoised_image = cv2.medianBlur(thresh_image, 3)
-                    
-                    ocr_text = pytesseract.image_to_string(denoised_image, lang='eng', config='--psm 6')
-                    full_text += f"\n--- Page {i+1} (OCR) ---\n{ocr_text.strip()}"
-        
+                    full_text += f"\n--- Page {i+1} ---\n{page['text']}"
+                    continue
+                logging.warning(f"  - Page {i+1}: Direct extraction found little text. Fell back to OCR.")
+                if page["blank"]:
+                    logging.info(f"  - Page {i+1}: Blank page. Skipped OCR.")
+                    continue
+                if page["tiled"]:
+                    logging.info(f"  - Page {i+1}: Oversized page. OCR'd in tiles.")
+                if page["lang"] and page["lang"] != OCR_LANG:
+                    logging.info(f"  - Page {i+1}: Detected non-Latin script. OCR language: {page['lang']}.")
+                full_text += f"\n--- Page {i+1} (OCR) ---\n{page['text'].strip()}"
+    
         return full_text.strip()
 
     except Exception as e:
-        logging.error(f"Text extraction process failed for '{pdf_path.name}'. Error: {e}")
+        name = session.name if session else Path(pdf_path).name
+        logging.error(f"Text extraction process failed for '{name}'. Error: {e}")
         return ""
+    finally:
+        if owned:
+            session.close()
+
+def _process_pdf(pdf_path: Path, engine=None):
+    """Extracts one PDF and moves it to the matching output folder."""
+    logging.info(f"--- Processing '{pdf_path.name}' ---")
+
+    # Read and parse the file once for the lock check and the extraction.
+    with DocumentSession(pdf_path) as session:
+        locked = is_pdf_locked(session)
+        extracted_text = "" if locked else extract_text_with_hybrid_approach(session, engine=engine)
+        if session.embedded_pages or session.rendered_pages:
+            logging.info(f"  - OCR images: {session.embedded_pages} embedded scan(s), "
+                         f"{session.rendered_pages} rendered page(s).")
+
+    if locked:
+        shutil.move(pdf_path, FAILED_LOCKED_DIR / pdf_path.name)
+        return
+
+    if extracted_text:
+        text_file_path = PROCESSED_DIR / f"{pdf_path.stem}.txt"
+        with open(text_file_path, "w", encoding="utf-8") as f:
+            f.write(extracted_text)
+        
+        shutil.move(pdf_path, PROCESSED_DIR / pdf_path.name)
+        logging.info(f"Successfully processed '{pdf_path.name}'.")
+    else:
+        logging.error(f"Failed to extract any text from '{pdf_path.name}'. Moving to failed folder.")
+        shutil.move(pdf_path, FAILED_OCR_DIR / pdf_path.name)
 
 def main():
     """Main function to orchestrate the PDF processing pipeline."""
@@ -125,26 +200,17 @@ def main():
 
     logging.info(f"Found {len(pdf_files)} PDF(s) to process.")
 
-    for pdf_path in pdf_files:
-        logging.info(f"--- Processing '{pdf_path.name}' ---")
-
-        if is_pdf_locked(pdf_path):
-            shutil.move(pdf_path, FAILED_LOCKED_DIR / pdf_path.name)
-            continue
-
-        extracted_text = extract_text_with_hybrid_approach(pdf_path)
-
-        if extracted_text:
-            text_file_path = PROCESSED_DIR / f"{pdf_path.stem}.txt"
-            with open(text_file_path, "w", encoding="utf-8") as f:
-                f.write(extracted_text)
-            
-            shutil.move(pdf_path, PROCESSED_DIR / pdf_path.name)
-            logging.info(f"Successfully processed '{pdf_path.name}'.")
-        else:
-            logging.error(f"Failed to extract any text from '{pdf_path.name}'. Moving to failed folder.")
-            shutil.move(pdf_path, FAILED_OCR_DIR / pdf_path.name)
-
+    # Optional multi-process OCR, shared by all files of the run
+    engine = ParallelOcrEngine() if OCR_PARALLEL_WORKERS > 0 else None
+    try:
+        for pdf_path in pdf_files:
+            _process_pdf(pdf_path, engine)
+    finally:
+        if engine is not None:
+            engine.close()
+
+    for summary in ocr_latency_report():
+        logging.info(format_latency_summary(summary))
     logging.info("PDF processing pipeline finished.")
 
 
@@ -1,5 +1,5 @@
 # processing_engine.py
-import shutil, time, json, openpyxl, re
+import shutil, time, json, openpyxl, re, sqlite3
 from queue import Queue
 from pathlib import Path
 from datetime import datetime
@@ -7,10 +7,21 @@ from openpyxl.styles import PatternFill, Alignment
 from openpyxl.utils import get_column_letter
 
 from config import *
-from custom_exceptions import FileLockError
-from data_harvesters import harvest_all_data
+from custom_exceptions import FileLockError, ExtractionTimeoutError, PDFExtractionError
+from data_harvester import harvest_pages, reharvest
+from document_session import DocumentSession
 from file_utils import is_file_locked
-from ocr_utils import extract_text_from_pdf, _is_ocr_needed
+from job_watchdog import DocumentWatchdog
+from ocr_utils import iter_page_text, _is_ocr_needed
+from page_classifier import WorkEstimate, labels_cost
+from pattern_engine import get_pattern_engine
+from pattern_profiler import TextSample, format_cost, profile_patterns, slowest_patterns
+from pattern_store import load_patterns
+from roi_ocr import extract_text_fast
+from search_index import SearchIndex
+from model_index import ModelIndex
+from text_corpus import read_cached_text, write_cached_text
+from ocr_backends import ocr_latency_report, format_latency_summary, resolve_backend
 
 def clear_review_folder():
     if PDF_TXT_DIR.exists():
@@ -20,18 +31,149 @@ def clear_review_folder():
             except OSError as e:
                 print(f"Error deleting review file {f}: {e}")
 
-def get_cache_path(pdf_path):
+def extraction_mode(fast_mode=False, full_text=False):
+    """How much of a document an extraction reads: "fast" (header regions first), "full" or "" (stops once the fields are found)."""
+    return "fast" if fast_mode else "full" if full_text else ""
+
+def get_cache_path(pdf_path, content_hash=None, ocr_profile=None, mode=""):
+    # Keyed by content hash when known, so a replaced or edited PDF never gets a stale result,
+    # by OCR profile, so a faster profile's result is never reused for a more accurate run,
+    # and by extraction mode, so text cut short by an early stop or fast mode never stands in
+    # for a full-text run (or a fast-mode result for a normal one).
+    if content_hash:
+        profile_key = f"_{ocr_profile}" if ocr_profile else ""
+        mode_key = f"_{mode}" if mode else ""
+        return CACHE_DIR / f"{pdf_path.stem}_{content_hash[:16]}{profile_key}{mode_key}.json"
     try:
         return CACHE_DIR / f"{pdf_path.stem}_{pdf_path.stat().st_size}.json"
     except FileNotFoundError:
         return CACHE_DIR / f"{pdf_path.stem}_unknown.json"
 
 # --- UPDATED FUNCTION ---
-def process_single_pdf(pdf_path, progress_queue, ignore_cache=False):
+def process_single_pdf(pdf_path, progress_queue, ignore_cache=False, fast_mode=False, full_text=False, watchdog=None, ocr_profile=DEFAULT_OCR_PROFILE, text_sample=None, search_index=None, work=None):
     # Ensure pdf_path is a Path object for consistency
     pdf_path = Path(pdf_path)
+    # Read the file once. The cache key (content hash) comes from this buffer, and the same bytes
+    # are parsed once for the encrypted/corrupt checks, the text layer and every OCR render.
+    try:
+        # FIX: Resolve to an absolute path to prevent file open errors
+        session = DocumentSession(pdf_path.resolve())
+    except OSError as e:
+        progress_queue.put({"type": "log", "tag": "error", "msg": f"Could not read {pdf_path.name}: {e}"})
+        progress_queue.put({"type": "file_complete", "status": "Fail"})
+        if work is not None:
+            work.add(labels_cost(None))
+        return {"filename": pdf_path.name, "models": "Error: Could not read file", "author": "", "status": "Fail", "ocr_used": False, "review_info": None}
+    with session:
+        result = _process_document(session, pdf_path, progress_queue, ignore_cache, fast_mode, full_text, watchdog, ocr_profile, text_sample, search_index)
+        if work is not None:
+            # From the page labels the extraction computed anyway; cache hits count as one text page
+            work.add(session.work_cost())
+        return result
+
+def extract_document(session, progress_queue, fast_mode=False, full_text=False, ocr_profile=DEFAULT_OCR_PROFILE):
+    """
+    Opens, checks, extracts and harvests one document. Runs inside the watchdog worker.
+
+    Returns:
+        {"error": reason, "ocr_used": False} for unreadable documents, otherwise
+        {"text": ..., "found_items": [...], "status_reason": ..., "ocr_used": bool,
+        "pattern_version": ..., "harvest_cache": per-pattern matches (see data_harvester.reharvest),
+        "page_labels": [...]}.
+    """
+    filename = session.name
+    if session.is_corrupt or session.is_encrypted:
+        reason = "Encrypted PDF" if session.is_encrypted else "Corrupt PDF"
+        progress_queue.put({"type": "log", "tag": "error", "msg": f"{filename}: {reason}"})
+        return {"error": reason, "ocr_used": False}
+
+    ocr_required = _is_ocr_needed(session)
+    if ocr_required:
+        progress_queue.put({"type": "status", "msg": filename, "led": "OCR"})
+        progress_queue.put({"type": "increment_counter", "counter": "ocr"})
+
+    # Fast mode OCRs the header/model regions first and only falls back to the full document when needed.
+    # Otherwise pages are harvested as they are extracted, and extraction stops once the
+    # stop conditions are met (unless the job asked for the full text).
+    engine = get_pattern_engine()  # One pattern version for the whole document
+    try:
+        if fast_mode:
+            fast = extract_text_fast(session, ocr_profile=ocr_profile)
+            extracted_text = fast["text"]
+            # A full-text harvest that also keeps each pattern's matches
+            harvest = reharvest(extracted_text, None, fast["ocr_used"], engine, fast.get("page_starts"))
+        else:
+            stop_conditions = None if full_text else HARVEST_STOP_CONDITIONS
+            harvest = harvest_pages(iter_page_text(session, ocr_profile), stop_conditions, engine)
+            extracted_text = harvest["text"]
+    except PDFExtractionError as e:
+        # No text at all: a failure, but not one to cache (the next run may have Tesseract)
+        progress_queue.put({"type": "log", "tag": "error", "msg": f"Text extraction failed for {filename}: {e}"})
+        return {"error": str(e), "ocr_used": ocr_required, "page_labels": session.page_labels()}
+    except Exception as e:
+        progress_queue.put({"type": "log", "tag": "error", "msg": f"Text extraction failed for {filename}: {e}"})
+        return {"text": "", "found_items": [], "status_reason": str(e), "ocr_used": ocr_required,
+                "page_labels": session.page_labels()}
+    # Both harvests keep each pattern's matches, so a later pattern change only runs the new patterns
+    return {"text": extracted_text, "found_items": harvest["found_items"],
+            "status_reason": harvest["status_reason"], "ocr_used": ocr_required,
+            "pattern_version": harvest["pattern_version"], "harvest_cache": harvest["harvest_cache"],
+            "page_labels": session.page_labels()}
+
+def _harvest_result(filename, pdf_path, extracted_text, harvest, ocr_required, ocr_profile, progress_queue, cache_path):
+    """The cached result for a harvested document; writes the review text when no model was found."""
+    models = [item["text"] for item in harvest["found_items"] if item["type"] == "model"]
+    data = {
+        "models": ", ".join(models) if models else "Not Found",
+        "author": "",
+        "found_items": harvest["found_items"],
+        "status_reason": harvest["status_reason"],
+        "pattern_version": harvest.get("pattern_version"),
+    }
+    if data["models"] == "Not Found":
+        status = "Needs Review"
+        review_txt_path = PDF_TXT_DIR / f"{pdf_path.stem}.txt"
+        with open(review_txt_path, 'w', encoding='utf-8') as f:
+            f.write(f"--- Filename: {filename} ---\n\n{extracted_text}")
+        # Review windows read the text from the corpus by key, the .txt file is the fallback
+        review_info = {"filename": filename, "reason": "No models", "txt_path": str(review_txt_path), "pdf_path": str(pdf_path),
+                       "text_key": cache_path.stem}
+        progress_queue.put({"type": "review_item", "data": review_info})
+    else:
+        status = "Pass"
+        review_info = None
+    return {"filename": filename, **data, "status": status, "ocr_used": ocr_required, "ocr_profile": ocr_profile,
+            "review_info": review_info, "harvest_cache": harvest.get("harvest_cache")}
+
+def _refresh_cached_result(cached_data, cache_path, pdf_path, progress_queue):
+    """
+    Brings a cached result up to the current pattern version by running only
+    the patterns it has no matches for. Returns None when its text was not kept.
+    """
+    extracted_text = read_cached_text(cache_path)
+    if not extracted_text:
+        return None
+    harvest = reharvest(extracted_text, cached_data.get("harvest_cache"), cached_data.get("ocr_used", False))
+    result = _harvest_result(pdf_path.name, pdf_path, extracted_text, harvest, cached_data.get("ocr_used", False),
+                             cached_data.get("ocr_profile"), progress_queue, cache_path)
+    result["content_hash"] = cached_data.get("content_hash")
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    progress_queue.put({"type": "log", "tag": "info", "msg": f"Re-harvested {pdf_path.name} for pattern version {harvest['pattern_version']} ({harvest['patterns_run']} of {len(result['harvest_cache']['matches'])} patterns run)."})
+    return result
+
+def _index_text(search_index, session, pdf_path, text, progress_queue):
+    """Adds a finished document's text to the job's search index (see search_index)."""
+    if search_index is None or not text or not text.strip():
+        return
+    try:
+        search_index.add_document(session.content_hash, pdf_path.name, text, str(pdf_path.resolve()))
+    except sqlite3.Error as e:
+        progress_queue.put({"type": "log", "tag": "warning", "msg": f"Could not add {pdf_path.name} to the search index: {e}"})
+
+def _process_document(session, pdf_path, progress_queue, ignore_cache, fast_mode, full_text, watchdog, ocr_profile, text_sample=None, search_index=None):
     filename = pdf_path.name
-    cache_path = get_cache_path(pdf_path)
+    cache_path = get_cache_path(pdf_path, session.content_hash, ocr_profile, extraction_mode(fast_mode, full_text))
 
     # FIX: Announce which file is being processed for live feedback in the terminal
     progress_queue.put({"type": "log", "tag": "info", "msg": f"Processing: {filename}"})
@@ -44,8 +186,20 @@ def process_single_pdf(pdf_path, progress_queue, ignore_cache=False):
                 raise KeyError
             
             progress_queue.put({"type": "log", "tag": "info", "msg": f"Loaded from cache: {filename}"})
-            if cached_data.get("status") == "Needs Review":
+            cached_data["content_hash"] = session.content_hash
+            refreshed = None
+            if cached_data.get("status") != "Fail" and cached_data.get("pattern_version") != get_pattern_engine().version:
+                # The patterns changed since this result was harvested
+                refreshed = _refresh_cached_result(cached_data, cache_path, pdf_path, progress_queue)
+                if refreshed is None:
+                    progress_queue.put({"type": "log", "tag": "warning", "msg": f"Could not re-harvest {filename} for the current patterns: its text was not kept. Using the cached result."})
+                else:
+                    cached_data = refreshed  # _harvest_result already queued its review item
+            if refreshed is None and cached_data.get("status") == "Needs Review":
                 progress_queue.put({"type": "review_item", "data": cached_data.get("review_info")})
+            if search_index is not None and not search_index.has_document(session.content_hash):
+                # Processed before the search index existed
+                _index_text(search_index, session, pdf_path, read_cached_text(cache_path), progress_queue)
             progress_queue.put({"type": "file_complete", "status": cached_data.get("status")})
             if cached_data.get("ocr_used"):
                 progress_queue.put({"type": "increment_counter", "counter": "ocr"})
@@ -54,44 +208,99 @@ def process_single_pdf(pdf_path, progress_queue, ignore_cache=False):
              progress_queue.put({"type": "log", "tag": "warning", "msg": f"Corrupt cache for {filename}. Reprocessing..."})
 
     progress_queue.put({"type": "status", "msg": filename, "led": "Queued"})
-    
-    # FIX: Pass the absolute string path to the OCR utility to prevent file open errors
-    absolute_pdf_path = str(pdf_path.resolve())
-    
-    ocr_required = _is_ocr_needed(absolute_pdf_path)
-    if ocr_required:
-        progress_queue.put({"type": "status", "msg": filename, "led": "OCR"})
-        progress_queue.put({"type": "increment_counter", "counter": "ocr"})
-    
-    extracted_text = extract_text_from_pdf(absolute_pdf_path)
+
+    # With a watchdog, the document is parsed and OCR'd in a worker process that is killed
+    # if a page or the whole document runs past its time budget.
+    try:
+        if watchdog is not None:
+            extraction = watchdog.run(session, progress_queue, fast_mode=fast_mode, full_text=full_text, ocr_profile=ocr_profile)
+        else:
+            extraction = extract_document(session, progress_queue, fast_mode, full_text, ocr_profile)
+    except ExtractionTimeoutError as e:
+        # Not cached: a rerun with a larger budget (or a fixed file) should try again.
+        progress_queue.put({"type": "log", "tag": "error", "msg": f"{filename}: {e}"})
+        progress_queue.put({"type": "increment_counter", "counter": "timeout"})
+        progress_queue.put({"type": "file_complete", "status": "Fail"})
+        return {"filename": filename, "models": f"Error: {e}", "author": "", "status": "Fail", "ocr_used": False, "review_info": None}
+    except PDFExtractionError as e:
+        progress_queue.put({"type": "log", "tag": "error", "msg": f"{filename}: {e}"})
+        progress_queue.put({"type": "file_complete", "status": "Fail"})
+        return {"filename": filename, "models": "Error: Text Extraction Failed", "author": "", "status": "Fail", "ocr_used": False, "review_info": None}
+
+    # The watchdog worker classified its own copy of the document
+    session.adopt_page_labels(extraction.get("page_labels"))
+    if "error" in extraction:
+        result = {"filename": filename, "models": f"Error: {extraction['error']}", "author": "", "status": "Fail", "ocr_used": False, "review_info": None}
+        progress_queue.put({"type": "file_complete", "status": result["status"]})
+        return result
+
+    ocr_required = extraction["ocr_used"]
+    extracted_text = extraction["text"]
+    if text_sample is not None:
+        text_sample.add(extracted_text)
+
     if not extracted_text.strip():
         result = {"filename": filename, "models": "Error: Text Extraction Failed", "author": "", "status": "Fail", "ocr_used": ocr_required, "review_info": None}
     else:
         progress_queue.put({"type": "status", "msg": filename, "led": "AI"})
-        data = harvest_all_data(extracted_text, filename)
-        if data["models"] == "Not Found":
-            status = "Needs Review"
-            review_txt_path = PDF_TXT_DIR / f"{pdf_path.stem}.txt"
-            with open(review_txt_path, 'w', encoding='utf-8') as f:
-                f.write(f"--- Filename: {filename} ---\n\n{extracted_text}")
-            review_info = {"filename": filename, "reason": "No models", "txt_path": str(review_txt_path), "pdf_path": str(pdf_path)}
-            progress_queue.put({"type": "review_item", "data": review_info})
-        else:
-            status = "Pass"
-            review_info = None
-        result = {"filename": filename, **data, "status": status, "ocr_used": ocr_required, "review_info": review_info}
+        result = _harvest_result(filename, pdf_path, extracted_text, extraction, ocr_required, ocr_profile, progress_queue, cache_path)
+    result["content_hash"] = session.content_hash
 
     with open(cache_path, 'w', encoding='utf-8') as f:
         json.dump(result, f)
+    if extracted_text.strip():
+        # Kept in the text corpus for re-harvests, pattern previews and reviews, which never re-read the PDF
+        write_cached_text(cache_path, extracted_text, (result.get("harvest_cache") or {}).get("page_starts"))
+        _index_text(search_index, session, pdf_path, extracted_text, progress_queue)
     progress_queue.put({"type": "file_complete", "status": result["status"]})
     return result
 
+def _report_pattern_costs(text_sample, progress_queue):
+    """
+    Logs the job's slowest patterns, timed over the text it extracted (see pattern_profiler).
+
+    Only informational: a failure is logged and never fails the job, whose workbook is still to be written.
+    """
+    try:
+        patterns, version = load_patterns()
+        unique = list(dict.fromkeys(p for regex_list in patterns.values() for p in regex_list))
+        slowest = slowest_patterns(profile_patterns(unique, text_sample.texts))
+        if not slowest:
+            progress_queue.put({"type": "log", "tag": "warning", "msg": "Pattern costs could not be measured for this job."})
+            return
+        progress_queue.put({"type": "log", "tag": "info", "msg": f"Slowest patterns (version {version}, over {text_sample.chars} characters of this job's text):"})
+        for cost in slowest:
+            tag = "warning" if cost["over_budget"] or cost["risks"] else "info"
+            progress_queue.put({"type": "log", "tag": tag, "msg": f"  {cost['pattern']}: {format_cost(cost)}"})
+    except Exception as e:
+        progress_queue.put({"type": "log", "tag": "warning", "msg": f"Could not report pattern costs: {e}"})
+
+def _record_model_index(progress_queue, results, paths, workbook=None, rows=None):
+    """
+    Updates the model/QA number index (see model_index) with the job's documents,
+    and with the workbook row of each when the workbook was written.
+    """
+    try:
+        with ModelIndex() as index:
+            if rows is None:
+                recorded = index.record_documents({**res, "path": paths.get(name)} for name, res in results.items())
+                progress_queue.put({"type": "log", "tag": "info", "msg": f"Model index updated for {recorded} document(s)."})
+            else:
+                index.record_rows(workbook, rows)
+    except sqlite3.Error as e:
+        progress_queue.put({"type": "log", "tag": "warning", "msg": f"Could not update the model index: {e}"})
+
 def run_processing_job(job_info, progress_queue, cancel_event, pause_event):
     try:
         is_rerun = job_info.get("is_rerun", False)
+        fast_mode = job_info.get("fast_mode", OCR_FAST_MODE)
+        full_text = job_info.get("full_text", False)
+        ocr_profile = job_info.get("ocr_profile", DEFAULT_OCR_PROFILE)
         excel_path = Path(job_info["excel_path"])
         input_path = job_info["input_path"]
-        progress_queue.put({"type": "log", "tag": "info", "msg": "Processing job started."})
+        progress_queue.put({"type": "log", "tag": "info", "msg": f"Processing job started (OCR profile: {ocr_profile})."})
+        if resolve_backend() == "pytesseract":
+            progress_queue.put({"type": "log", "tag": "info", "msg": "OCR backend: pytesseract. The recognizer pool and script detection are off (they need tesserocr)."})
 
         if is_rerun:
             clear_review_folder()
@@ -105,19 +314,51 @@ def run_processing_job(job_info, progress_queue, cancel_event, pause_event):
         
         files = [Path(f) for f in input_path] if isinstance(input_path, list) else list(Path(input_path).glob('*.pdf'))
         results = {}
-        for i, path in enumerate(files):
-            if cancel_event.is_set():
-                break
-            if pause_event and pause_event.is_set():
-                progress_queue.put({"type": "status", "msg": "Paused", "led": "Paused"})
-                while pause_event.is_set():
-                    time.sleep(0.5)
-            progress_queue.put({"type": "progress", "current": i + 1, "total": len(files)})
-            res = process_single_pdf(path, progress_queue, ignore_cache=is_rerun)
-            if res is None:
-                res = process_single_pdf(path, progress_queue, ignore_cache=True)
-            if res:
-                results[res["filename"]] = res
+        paths = {}  # Filename -> resolved path, for the model index
+        # Files are weighted by their page mix (scanned pages cost far more than text pages),
+        # so the ETA follows the work left rather than the number of files left. Each file's
+        # weight comes from its page labels once it has been processed.
+        work = WorkEstimate(len(files))
+        # One supervised extraction worker for the whole job; replaced only when it hangs or crashes.
+        watchdog = DocumentWatchdog(extract_document) if WATCHDOG_ENABLED else None
+        # Extracted text kept for the pattern cost report at the end of the job
+        text_sample = TextSample()
+        try:
+            search_index = SearchIndex()
+        except sqlite3.Error as e:
+            progress_queue.put({"type": "log", "tag": "warning", "msg": f"Search index unavailable; documents will not be searchable: {e}"})
+            search_index = None
+        try:
+            for i, path in enumerate(files):
+                if cancel_event.is_set():
+                    break
+                if pause_event and pause_event.is_set():
+                    progress_queue.put({"type": "status", "msg": "Paused", "led": "Paused"})
+                    while pause_event.is_set():
+                        time.sleep(0.5)
+                progress_queue.put({"type": "progress", "current": i + 1, "total": len(files),
+                                    "work_done": work.done, "work_total": work.total})
+                res = process_single_pdf(path, progress_queue, ignore_cache=is_rerun, fast_mode=fast_mode, full_text=full_text, watchdog=watchdog, ocr_profile=ocr_profile, text_sample=text_sample, search_index=search_index, work=work)
+                if res is None:
+                    res = process_single_pdf(path, progress_queue, ignore_cache=True, fast_mode=fast_mode, full_text=full_text, watchdog=watchdog, ocr_profile=ocr_profile, text_sample=text_sample, search_index=search_index, work=work)
+                if res:
+                    results[res["filename"]] = res
+                    paths[res["filename"]] = str(path.resolve())
+        finally:
+            if watchdog is not None:
+                watchdog.close()
+            if search_index is not None:
+                search_index.close()
+
+        latency = watchdog.latency_report() if watchdog is not None else ocr_latency_report()
+        for summary in latency:
+            progress_queue.put({"type": "log", "tag": "info", "msg": format_latency_summary(summary)})
+        if watchdog is not None and watchdog.timeouts:
+            progress_queue.put({"type": "log", "tag": "warning", "msg": f"{watchdog.timeouts} document(s) timed out; the extraction worker was restarted {watchdog.restarts} time(s)."})
+        if text_sample.texts and not cancel_event.is_set():
+            _report_pattern_costs(text_sample, progress_queue)
+        # Also for a cancelled job: the documents it finished are indexed
+        _record_model_index(progress_queue, results, paths)
 
         if cancel_event.is_set():
             progress_queue.put({"type": "finish", "status": "Cancelled"})
@@ -131,6 +372,7 @@ def run_processing_job(job_info, progress_queue, cancel_event, pause_event):
             sheet.cell(row=1, column=len(headers) + 1).value = STATUS_COLUMN_NAME
             headers.append(STATUS_COLUMN_NAME)
         cols = {h: headers.index(h) + 1 for h in [DESCRIPTION_COLUMN_NAME, META_COLUMN_NAME, AUTHOR_COLUMN_NAME, STATUS_COLUMN_NAME]}
+        rows = {}  # Content hash -> row written, for the model index
        
         for row in sheet.iter_rows(min_row=2):
             desc = str(row[cols[DESCRIPTION_COLUMN_NAME]-1].value)
@@ -139,6 +381,8 @@ def run_processing_job(job_info, progress_queue, cancel_event, pause_event):
                     row[cols[META_COLUMN_NAME]-1].value = data["models"]
                     row[cols[AUTHOR_COLUMN_NAME]-1].value = data["author"]
                     row[cols[STATUS_COLUMN_NAME]-1].value = f"{data['status']}{' (OCR)' if data['ocr_used'] else ''}"
+                    if data.get("content_hash"):
+                        rows[data["content_hash"]] = row[0].row
                     break
         
         progress_queue.put({"type": "status", "msg": "Applying formatting...", "led": "Saving"})
@@ -164,6 +408,7 @@ def run_processing_job(job_info, progress_queue, cancel_event, pause_event):
             sheet.column_dimensions[get_column_letter(i)].width = (max_len + 2) if max_len < 60 else 60
 
         workbook.save(cloned_path)
+        _record_model_index(progress_queue, results, paths, cloned_path.resolve(), rows)
         progress_queue.put({"type": "result_path", "path": str(cloned_path)})
         progress_queue.put({"type": "finish", "status": "Complete"})
 
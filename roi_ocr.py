@@ -0,0 +1,185 @@
+# roi_ocr.py
+# Field-targeted OCR ("fast mode").
+#
+# Model names and QA/SB numbers in Kyocera leaflets nearly always sit in the
+# header block and the "Applicable models" table on page 1. Fast mode renders
+# and OCRs only those regions of interest, runs the harvester on the result,
+# and falls back to full-document OCR only when the required fields are
+# missing.
+#
+# Regions come from two places:
+#   - config.ROI_REGIONS, the hand-configured defaults.
+#   - Learned regions. Whenever a digital (text-layer) document passes through
+#     fast mode, the page positions of its harvested fields are recorded. Scans
+#     share their layout with the digital leaflets, so the area where those
+#     fields usually appear becomes an extra region.
+# Each region's hit rate is tracked so the most productive ones are tried first.
+
+import json
+
+import fitz  # PyMuPDF
+
+from config import ROI_REGIONS, ROI_REQUIRED_FIELDS, ROI_STATS_FILE
+from custom_exceptions import PDFExtractionError
+from data_harvester import harvest_all_data
+from document_session import DocumentSession
+from image_preprocessing import pixmap_to_array, preprocess_page
+from ocr_backends import get_ocr_pool, get_ocr_profile, select_ocr_lang
+from ocr_utils import extract_text_from_pdf, EXTRACTION_ERROR_PREFIXES, MIN_TEXT_LENGTH_FOR_DIGITAL
+
+LEARNED_HITS_PER_PAGE = 200  # Most recent field locations kept per page index
+LEARNED_MIN_HITS = 5         # Locations needed before a learned region is used
+LEARNED_PADDING = 0.02       # Fraction of the page added around a learned region
+LEARNED_PAGES = 2            # Only the first pages are worth learning from
+
+
+def _load_stats() -> dict:
+    try:
+        with open(ROI_STATS_FILE, "r", encoding="utf-8") as f:
+            stats = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        stats = {}
+    stats.setdefault("regions", {})
+    stats.setdefault("learned_hits", {})
+    return stats
+
+
+def _save_stats(stats: dict):
+    ROI_STATS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(ROI_STATS_FILE, "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _learned_regions(stats: dict) -> dict:
+    """Turns recorded field locations into one padded region per page index."""
+    regions = {}
+    for page_key, hits in stats["learned_hits"].items():
+        if len(hits) < LEARNED_MIN_HITS:
+            continue
+        x0 = _percentile([h[0] for h in hits], 0.1) - LEARNED_PADDING
+        y0 = _percentile([h[1] for h in hits], 0.1) - LEARNED_PADDING
+        x1 = _percentile([h[2] for h in hits], 0.9) + LEARNED_PADDING
+        y1 = _percentile([h[3] for h in hits], 0.9) + LEARNED_PADDING
+        rect = (max(0.0, x0), max(0.0, y0), min(1.0, x1), min(1.0, y1))
+        regions[f"learned_page{page_key}"] = {"page": int(page_key), "rect": rect}
+    return regions
+
+
+def get_regions(stats: dict | None = None) -> list[tuple[str, dict]]:
+    """Configured plus learned regions, best hit rate first. Untried regions count as perfect."""
+    stats = stats if stats is not None else _load_stats()
+    regions = {**ROI_REGIONS, **_learned_regions(stats)}
+
+    def hit_rate(name):
+        record = stats["regions"].get(name)
+        return record["hits"] / record["tries"] if record and record["tries"] else 1.0
+
+    return sorted(regions.items(), key=lambda item: hit_rate(item[0]), reverse=True)
+
+
+def learn_from_document(session: DocumentSession, found_items: list, stats: dict):
+    """Records where harvested fields sit on the first pages of a digital document."""
+    for page_index in range(min(session.page_count, LEARNED_PAGES)):
+        page = session.page(page_index)
+        width, height = page.rect.width, page.rect.height
+        hits = stats["learned_hits"].setdefault(str(page_index), [])
+        for item in found_items:
+            for r in page.search_for(item["text"]):
+                hits.append([r.x0 / width, r.y0 / height, r.x1 / width, r.y1 / height])
+        del hits[:-LEARNED_HITS_PER_PAGE]
+
+
+def _has_required_fields(found_items: list, required_fields: list) -> bool:
+    found_types = {item["type"] for item in found_items}
+    return all(field in found_types for field in required_fields)
+
+
+def _extract_regions(session: DocumentSession, required_fields: list, stats: dict, profile: dict) -> dict | None:
+    """OCRs regions until the required fields are found. Returns None when a full OCR is needed."""
+    if not session.needs_ocr(MIN_TEXT_LENGTH_FOR_DIGITAL):
+        # Digital document: no OCR needed, but a free chance to learn the layout.
+        page_texts = [session.page_text(i) for i in range(session.page_count)]
+        digital_text = "".join(page_texts)
+        found_items = harvest_all_data(digital_text)["found_items"]
+        learn_from_document(session, found_items, stats)
+        lead = len(digital_text) - len(digital_text.lstrip())  # Offsets are in the stripped text
+        page_starts, offset = [], -lead
+        for page_text in page_texts:
+            page_starts.append(max(0, offset))
+            offset += len(page_text)
+        return {"text": digital_text.strip(), "ocr_used": False, "page_starts": page_starts,
+                "roi_region": None, "ocr_area_fraction": 0.0}
+
+    region_texts = []
+    area = 0.0
+    for name, region in get_regions(stats):
+        if region["page"] >= session.page_count:
+            continue
+        x0, y0, x1, y1 = region["rect"]
+        r = session.page(region["page"]).rect
+        clip = fitz.Rect(r.x0 + x0 * r.width, r.y0 + y0 * r.height,
+                         r.x0 + x1 * r.width, r.y0 + y1 * r.height)
+        record = stats["regions"].setdefault(name, {"tries": 0, "hits": 0})
+        record["tries"] += 1
+        area += (x1 - x0) * (y1 - y0)
+
+        pix = session.render_page(region["page"], dpi=profile["dpi"], clip=clip, gray=True)
+        image = preprocess_page(pixmap_to_array(pix), profile["preprocess"])
+        if image is None:
+            continue
+        # Only identifiers are wanted here, so the profile may restrict the character set.
+        pool = get_ocr_pool(select_ocr_lang(image), oem=profile["oem"])
+        region_texts.append(pool.recognize(image, psm=profile["psm"], whitelist=profile["identifier_whitelist"]))
+        text = "\n".join(region_texts)
+        if _has_required_fields(harvest_all_data(text, fuzzy=True)["found_items"], required_fields):
+            record["hits"] += 1
+            return {"text": text.strip(), "ocr_used": True,
+                    "roi_region": name, "ocr_area_fraction": round(area, 3)}
+    return None
+
+
+def extract_text_fast(pdf_path, required_fields: list = ROI_REQUIRED_FIELDS, ocr_profile: str | None = None) -> dict:
+    """
+    Extracts text by OCR'ing only regions of interest, with a full-document fallback.
+
+    Args:
+        pdf_path: Path to the PDF file, or an open DocumentSession.
+        required_fields: Harvest item types that must all be found for the
+            region text to be accepted.
+        ocr_profile: Name of an entry in config.OCR_PROFILES (default profile if None).
+
+    Returns:
+        The same dictionary as `ocr_utils.extract_text_from_pdf`, plus
+        "roi_region" (the region that satisfied the fields, or None) and
+        "ocr_area_fraction" (OCR'd area relative to one full page). Region
+        text has no "page_starts".
+
+    Raises:
+        PDFExtractionError: The full-document fallback failed (e.g. Tesseract
+            is not installed), so there is no text to harvest or cache.
+    """
+    stats = _load_stats()
+    profile = get_ocr_profile(ocr_profile)
+    session, owned = DocumentSession.ensure(pdf_path)
+    try:
+        try:
+            result = _extract_regions(session, required_fields, stats, profile)
+        except Exception as e:
+            print(f"Region OCR failed for {session.name}: {e}. Falling back to full OCR.")
+            result = None
+        _save_stats(stats)
+
+        if result is None:
+            result = extract_text_from_pdf(session, ocr_profile)
+            if result["text"].startswith(EXTRACTION_ERROR_PREFIXES):
+                raise PDFExtractionError(result["text"])
+            result.update({"roi_region": None, "ocr_area_fraction": None})
+        return result
+    finally:
+        if owned:
+            session.close()
@@ -0,0 +1,195 @@
+# search_index.py
+# Full-text search over every processed document's extracted text.
+#
+# Reviewers need to know which leaflets mention a part or an error code. The
+# processing engine adds each document's text to an SQLite FTS5 index,
+# SEARCH_INDEX_PATH, as soon as the document is finished. Documents are keyed by
+# content hash, so a renamed copy is not indexed twice and an edited PDF
+# replaces its old text.
+#
+# A query is a list of words (all must occur), an exact phrase, or word
+# prefixes. Word queries are answered by the FTS index itself, newest documents
+# first, and stop at the result limit, so they stay in the millisecond range for
+# a very large corpus (ranking by relevance would score every match of a
+# common word first). A regular expression can be added as a post-filter: it
+# only runs over the texts the words matched. A regular expression without
+# words has to read every text; SQLite skips the texts without one of the
+# pattern's required literals before they reach the regex.
+#
+#   python cli_runner.py search "FS-1370DN" [--phrase | --prefix] [--regex PATTERN]
+
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from config import SEARCH_INDEX_PATH, SEARCH_RESULT_LIMIT
+from pattern_engine import required_literals
+
+INDEX_FORMAT = 1
+SEARCH_MODES = ("all", "phrase", "prefix")
+SNIPPET_CHARS = 60  # Context shown on each side of a regex match
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    path TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS document_text USING fts5(text, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+
+def _quote(term: str) -> str:
+    """An FTS5 string: the term is matched as written, whatever characters it contains."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def fts_query(query: str, mode: str = "all") -> str:
+    """
+    The FTS5 MATCH expression for a user query.
+
+    Args:
+        query: Words as typed, e.g. 'FS-1370DN paper jam'.
+        mode: "all" (every word), "phrase" (the words in this order) or
+            "prefix" (every word as the start of a word).
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'; use one of {', '.join(SEARCH_MODES)}.")
+    terms = query.split()
+    if mode == "phrase":
+        return _quote(" ".join(terms))
+    if mode == "prefix":
+        return " ".join(f"{_quote(term)}*" for term in terms)
+    return " ".join(_quote(term) for term in terms)
+
+
+def _regex_snippet(text: str, match) -> str:
+    start, end = match.span()
+    before = text[max(0, start - SNIPPET_CHARS):start]
+    after = text[end:end + SNIPPET_CHARS]
+    return " ".join(f"{before}[{match.group(0)}]{after}".split())
+
+
+class SearchIndex:
+    """The full-text index at SEARCH_INDEX_PATH. Usable as a context manager."""
+
+    def __init__(self, path: Path = SEARCH_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        # WAL lets the GUI search while a job adds documents
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, INDEX_FORMAT):
+            self.conn.executescript("DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS document_text;")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {INDEX_FORMAT}")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def has_document(self, content_hash: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM documents WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row is not None
+
+    def add_document(self, content_hash: str, filename: str, text: str, path: str | None = None):
+        """Indexes one document's text, replacing what was indexed for the same content hash."""
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM documents WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is None:
+                doc_id = self.conn.execute(
+                    "INSERT INTO documents (content_hash, filename, path, indexed_at) VALUES (?, ?, ?, ?)",
+                    (content_hash, filename, path, time.time())).lastrowid
+            else:
+                doc_id = row[0]
+                self.conn.execute("UPDATE documents SET filename = ?, path = ?, indexed_at = ? WHERE id = ?",
+                                  (filename, path, time.time(), doc_id))
+                self.conn.execute("DELETE FROM document_text WHERE rowid = ?", (doc_id,))
+            self.conn.execute("INSERT INTO document_text (rowid, text) VALUES (?, ?)", (doc_id, text))
+
+    def remove_document(self, content_hash: str):
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM documents WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is not None:
+                self.conn.execute("DELETE FROM document_text WHERE rowid = ?", (row[0],))
+                self.conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+
+    def document_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def search(self, query: str = "", mode: str = "all", regex: str | None = None,
+               limit: int = SEARCH_RESULT_LIMIT) -> list[dict]:
+        """
+        Documents matching a query, most recently indexed first.
+
+        Args:
+            query: Words to look for (see `fts_query`); may be empty when a
+                regex is given.
+            mode: "all", "phrase" or "prefix".
+            regex: Optional regular expression (case-insensitive) the text must
+                also match; the snippet then shows its first match.
+            limit: Most documents returned.
+
+        Returns:
+            [{"content_hash", "filename", "path", "snippet"}, ...]
+
+        Raises:
+            ValueError: No query and no regex, an unknown mode, or an invalid
+                regex or FTS query.
+        """
+        if not query.strip() and not regex:
+            raise ValueError("Enter words to search for or a regular expression.")
+        try:
+            compiled = re.compile(regex, re.IGNORECASE) if regex else None
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}") from e
+
+        columns = "SELECT d.content_hash, d.filename, d.path, "
+        source = " FROM document_text JOIN documents d ON d.id = document_text.rowid "
+        try:
+            if query.strip() and compiled is None:
+                rows = self.conn.execute(
+                    columns + "snippet(document_text, 0, '[', ']', '...', 12)" + source +
+                    "WHERE document_text MATCH ? ORDER BY document_text.rowid DESC LIMIT ?", (fts_query(query, mode), limit))
+                return [{"content_hash": h, "filename": f, "path": p, "snippet": s} for h, f, p, s in rows]
+            if query.strip():
+                rows = self.conn.execute(
+                    columns + "document_text.text" + source +
+                    "WHERE document_text MATCH ? ORDER BY document_text.rowid DESC", (fts_query(query, mode),))
+            else:
+                # Required literals are lower-case ASCII, which SQLite's lower() folds the same way
+                literals = sorted(required_literals(regex, re.IGNORECASE) or ())
+                where = f"WHERE {' OR '.join(['instr(lower(document_text.text), ?)'] * len(literals))} " if literals else ""
+                rows = self.conn.execute(
+                    columns + "document_text.text" + source + where + "ORDER BY document_text.rowid DESC", literals)
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search: {e}") from e
+
+        results = []
+        for content_hash, filename, path, text in rows:
+            match = compiled.search(text)
+            if match is None:
+                continue
+            results.append({"content_hash": content_hash, "filename": filename, "path": path,
+                            "snippet": _regex_snippet(text, match)})
+            if len(results) >= limit:
+                break
+        return results
+
+
+def format_results(results: list[dict]) -> str:
+    """Plain-text result list for the command line."""
+    if not results:
+        return "No documents matched."
+    return "\n".join(f"{r['filename']}\n    {r['snippet']}" for r in results)
@@ -0,0 +1,8 @@
+# conftest.py
+# The application is a set of top-level modules run from the repository root;
+# make them importable from the tests.
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
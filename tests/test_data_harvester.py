@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from data_harvester import harvest_all_data, harvest_pages, reharvest
+from pattern_engine import PatternEngine
+
+PAGES = [
+    "Service Bulletin SB-1234\nApplies to TASKalfa 3012i and PF-740.",
+    "",
+    "  Page three: QA-2040 for ECOSYS M4125idn, PF-740 again.\n",
+    "Last page. SB-1234 and FS-1370DN.",
+]
+TEXT = "\n".join(PAGES)
+PAGE_STARTS = [sum(len(page) + 1 for page in PAGES[:i]) for i in range(len(PAGES))]
+
+PATTERNS = {
+    "model": [r"\bTASKalfa\s*[\w-]+\b", r"\bECOSYS\s*[\w-]+\b", r"\bPF-\d+"],
+    "qa_number": [r"\bSB-\d+", r"\bQA-\d+"],
+}
+
+
+def _engine(patterns):
+    return PatternEngine(patterns, version=str(sorted((k, tuple(v)) for k, v in patterns.items())))
+
+
+def _stored(harvest_cache):
+    return json.loads(json.dumps(harvest_cache))  # As kept in the cache file
+
+
+@pytest.mark.parametrize("change", ["add", "remove", "modify"])
+def test_reharvest_equals_full_harvest_after_a_pattern_change(change):
+    before = reharvest(TEXT, None, engine=_engine(PATTERNS), page_starts=PAGE_STARTS)
+    patterns = {key: list(value) for key, value in PATTERNS.items()}
+    if change == "add":
+        patterns["model"].append(r"\bFS-\d+DN\b")
+    elif change == "remove":
+        patterns["qa_number"].remove(r"\bQA-\d+")
+    else:
+        patterns["model"][2] = r"\bPF-\d{3}\b"
+    engine = _engine(patterns)
+
+    after = reharvest(TEXT, _stored(before["harvest_cache"]), engine=engine)
+    full = harvest_all_data(TEXT, engine=engine, page_starts=PAGE_STARTS)
+    assert after["found_items"] == full["found_items"]
+    assert after["patterns_run"] == (0 if change == "remove" else 1)
+    assert after["pattern_version"] == engine.version
+
+
+def _check_round_trip(text, page_starts, items):
+    assert items
+    for item in items:
+        expected_pages = set()
+        for start, end in item["spans"]:
+            assert text[start:end] == item["text"]
+            expected_pages.add(max(i for i, page_start in enumerate(page_starts) if page_start <= start) + 1)
+        assert item["pages"] == sorted(expected_pages)
+
+
+def test_spans_and_pages_round_trip():
+    harvest = harvest_all_data(TEXT, engine=_engine(PATTERNS), page_starts=PAGE_STARTS)
+    _check_round_trip(TEXT, PAGE_STARTS, harvest["found_items"])
+    pf = next(item for item in harvest["found_items"] if item["text"] == "PF-740")
+    assert pf["pages"] == [1, 3]
+
+
+def test_page_by_page_harvest_round_trips_in_the_joined_text():
+    pages = [{"page": i + 1, "text": text, "ocr_used": False} for i, text in enumerate([" \n"] + PAGES)]
+    harvest = harvest_pages(iter(pages), None, _engine(PATTERNS))
+    _check_round_trip(harvest["text"], harvest["page_starts"], harvest["found_items"])
+    assert harvest["pages_read"] == len(pages)
+    assert {item["text"] for item in harvest["found_items"]} >= {"SB-1234", "QA-2040", "PF-740", "ECOSYS M4125idn"}
+
+
+def test_page_by_page_harvest_keeps_the_match_sets_of_the_joined_text():
+    pages = [{"page": i + 1, "text": text, "ocr_used": False} for i, text in enumerate(PAGES)]
+    harvest = harvest_pages(iter(pages), None, _engine(PATTERNS))
+    whole = reharvest(harvest["text"], None, engine=_engine(PATTERNS), page_starts=harvest["page_starts"])
+    assert _stored(harvest["harvest_cache"]) == _stored(whole["harvest_cache"])
+
+    patterns = {**PATTERNS, "model": PATTERNS["model"] + [r"\bFS-\d+DN\b"]}
+    after = reharvest(harvest["text"], _stored(harvest["harvest_cache"]), engine=_engine(patterns))
+    assert after["patterns_run"] == 1
+    assert after["found_items"] == harvest_all_data(harvest["text"], engine=_engine(patterns),
+                                                    page_starts=harvest["page_starts"])["found_items"]
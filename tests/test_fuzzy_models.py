@@ -0,0 +1,46 @@
+import pytest
+
+from fuzzy_models import FuzzyModelIndex
+from pattern_engine import PatternEngine
+
+CATALOG = ["TASKalfa 3012i", "TASKalfa 4012i", "ECOSYS M4125idn", "FS-C5150DN", "ECOSYS M2540dn"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FuzzyModelIndex(CATALOG)
+
+
+@pytest.mark.parametrize("ocr_text, model", [
+    ("TASKaIfa 3O12i", "TASKalfa 3012i"),
+    ("EC0SYS M4125idn", "ECOSYS M4125idn"),
+    ("FS-C515ODN", "FS-C5150DN"),
+    ("EC0SYS M2S40dn", "ECOSYS M2540dn"),
+])
+def test_confusable_characters_are_corrected(index, ocr_text, model):
+    match = index.lookup(ocr_text)
+    assert match is not None and match[0] == model and match[1] < 1.0
+
+
+@pytest.mark.parametrize("ocr_text", ["TASKalfa 5012i", "TASKalfa 4022i", "ECOSYS M4125idw", "FS-C5150DW", "FS-C5150D"])
+def test_real_edits_are_not_corrected(index, ocr_text):
+    assert index.lookup(ocr_text) is None
+
+
+def test_exact_match_has_full_confidence(index):
+    assert index.lookup("taskalfa 3012i") == ("TASKalfa 3012i", 1.0)
+
+
+def test_find_reports_corrections_in_text_order(index):
+    found = index.find("Models: EC0SYS M4125idn and TASKaIfa 3O12i.")
+    assert [(item["text"], item["ocr_text"]) for item in found] == [
+        ("ECOSYS M4125idn", "EC0SYS M4125idn"), ("TASKalfa 3012i", "TASKaIfa 3O12i")]
+
+
+def test_correction_of_a_pattern_match_is_dropped():
+    engine = PatternEngine({"model": [r"\bFS-C\w+"]})
+    text = "See FS-C515ODN and EC0SYS M4125idn."
+    corrected = FuzzyModelIndex(CATALOG).find(text)
+    models = [item["text"] for item in engine.harvest(text, corrected) if item["type"] == "model"]
+    # The pattern read "FS-C515ODN" as written; only the token no pattern matched is corrected
+    assert models == ["ECOSYS M4125idn", "FS-C515ODN"]
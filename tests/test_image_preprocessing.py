@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+
+from image_preprocessing import deskew, estimate_skew
+
+
+def _leaflet_page() -> np.ndarray:
+    """A straight page with an uneven layout: a logo block and two columns of different lengths."""
+    page = np.full((2200, 1700), 255, np.uint8)
+    cv2.rectangle(page, (100, 100), (600, 450), 0, -1)
+    for i in range(40):
+        cv2.putText(page, "Lorem ipsum dolor sit amet", (100, 550 + i * 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    for i in range(12):
+        cv2.putText(page, "TASKalfa 5054ci SB-1", (950, 550 + i * 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    return page
+
+
+def test_straight_asymmetric_page_is_not_skewed():
+    assert abs(estimate_skew(_leaflet_page())) < 0.2
+
+
+@pytest.mark.parametrize("angle", [3.0, -4.5, 1.2])
+def test_skewed_page_angle_is_recovered(angle):
+    tilted = deskew(_leaflet_page(), -angle)
+    assert estimate_skew(tilted) == pytest.approx(angle, abs=0.2)
+
+
+def test_blank_page_has_no_skew():
+    assert estimate_skew(np.full((400, 300), 255, np.uint8)) == 0.0
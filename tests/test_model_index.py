@@ -0,0 +1,55 @@
+import pytest
+
+from model_index import ModelIndex, term_key
+
+
+def _result(content_hash, filename, *models, qa=(), status="Pass"):
+    items = [{"type": "model", "text": model} for model in models]
+    items += [{"type": "qa_number", "text": number} for number in qa]
+    items.append({"type": "author", "text": "ignored"})
+    return {"content_hash": content_hash, "filename": filename, "status": status, "found_items": items,
+            "path": f"/docs/{filename}"}
+
+
+@pytest.fixture
+def index(tmp_path):
+    with ModelIndex(tmp_path / "models.sqlite3") as index:
+        index.record_documents([
+            _result("h1", "a.pdf", "TASKalfa-5054ci", qa=["SB-1234"]),
+            _result("h2", "b.pdf", "TASKalfa 5004i", "ECOSYS M2540dn"),
+            {"filename": "unreadable.pdf", "status": "Fail"},
+        ])
+        yield index
+
+
+def _names(hits):
+    return [hit["filename"] for hit in hits]
+
+
+def test_spelling_variants_share_a_key():
+    assert term_key("taskalfa-5054ci") == term_key("TASKalfa 5054ci") == term_key("TASKalfa5054ci")
+
+
+def test_lookup_exact_prefix_and_type(index):
+    assert _names(index.lookup("TASKalfa 5054ci")) == ["a.pdf"]
+    assert index.lookup("taskalfa5054CI")[0]["term"] == "TASKalfa 5054ci"
+    assert _names(index.lookup("TASKalfa 50", prefix=True)) == ["a.pdf", "b.pdf"]
+    assert _names(index.lookup("sb-1234", item_type="qa_number")) == ["a.pdf"]
+    assert index.lookup("SB-1234", item_type="model") == []
+    assert index.lookup("ignored") == [] and index.lookup("  ") == []
+    assert index.document_count() == 2
+
+
+def test_workbook_rows_are_returned(index):
+    index.record_rows("/out/kb.xlsx", {"h1": 5, "h2": 9})
+    index.record_rows("/out/kb.xlsx", {"h1": 6})
+    hit = index.lookup("TASKalfa 5054ci")[0]
+    assert hit["rows"] == [{"workbook": "/out/kb.xlsx", "row": 6}]
+    assert hit["path"] == "/docs/a.pdf"
+
+
+def test_recording_a_document_again_replaces_its_postings(index):
+    index.record_documents([_result("h1", "a.pdf", "ECOSYS M2540dn", status="Needs Review")])
+    assert index.lookup("TASKalfa 5054ci") == []
+    hits = index.lookup("ECOSYS M2540dn")
+    assert [(hit["filename"], hit["status"]) for hit in hits] == [("a.pdf", "Needs Review"), ("b.pdf", "Pass")]
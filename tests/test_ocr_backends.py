@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+import ocr_backends
+from config import OCR_LANG
+
+
+class _FakeDetector:
+    def __init__(self, backend, script=("Han", 5.0)):
+        self.backend = backend
+        self.script = script
+        self.calls = 0
+
+    def detect(self, image):
+        self.calls += 1
+        return self.script
+
+
+@pytest.fixture
+def use_detector(monkeypatch):
+    def install(detector, languages):
+        monkeypatch.setattr(ocr_backends, "OCR_LANGUAGE_DETECTION", True)
+        monkeypatch.setattr(ocr_backends, "_detector", detector)
+        monkeypatch.setattr(ocr_backends, "_detector_pid", os.getpid())
+        monkeypatch.setattr(ocr_backends, "_languages", (os.getpid(), languages))
+        monkeypatch.setattr(ocr_backends, "_missing_langs", set())
+        return detector
+    return install
+
+
+def test_detected_script_uses_its_language_pack(use_detector):
+    use_detector(_FakeDetector("tesserocr"), {"eng", "jpn", "osd"})
+    assert ocr_backends.select_ocr_lang(None) == "jpn+eng"
+
+
+def test_missing_language_pack_falls_back(use_detector):
+    use_detector(_FakeDetector("tesserocr"), {"eng", "osd"})
+    assert ocr_backends.select_ocr_lang(None) == OCR_LANG
+
+
+def test_pytesseract_backend_does_not_detect(use_detector):
+    detector = use_detector(_FakeDetector("pytesseract"), {"eng", "jpn", "osd"})
+    assert ocr_backends.select_ocr_lang(None) == OCR_LANG
+    assert detector.calls == 0
+
+
+def test_unknown_languages_fall_back(use_detector):
+    use_detector(_FakeDetector("tesserocr"), None)
+    assert ocr_backends.select_ocr_lang(None) == OCR_LANG
@@ -0,0 +1,22 @@
+import pytest
+
+from config import PAGE_COST
+from page_classifier import PAGE_IMAGE, PAGE_TEXT, WorkEstimate, labels_cost
+
+
+def test_labels_cost_sums_page_costs():
+    assert labels_cost([PAGE_TEXT, PAGE_IMAGE]) == PAGE_COST["text"] + PAGE_COST["image"]
+
+
+def test_unclassified_document_costs_one_text_page():
+    assert labels_cost(None) == PAGE_COST["text"]
+    assert labels_cost([]) == PAGE_COST["text"]
+
+
+def test_work_estimate_extrapolates_from_processed_documents():
+    work = WorkEstimate(4)
+    assert work.total == 4 * PAGE_COST["text"]
+    work.add(10)
+    work.add(2)
+    assert work.done == 12
+    assert work.total == pytest.approx(24)
@@ -0,0 +1,14 @@
+import fitz
+
+from parallel_ocr import ParallelOcrEngine
+
+
+def test_page_requested_twice_is_returned_twice(tmp_path):
+    doc = fitz.open()
+    doc.new_page()
+    doc.new_page()
+    pdf = tmp_path / "blank.pdf"
+    doc.save(str(pdf))
+    doc.close()
+    with ParallelOcrEngine(ocr_workers=1, render_workers=1) as engine:
+        assert engine.ocr_pages(pdf, [1, 0, 1, 1]) == ["", "", "", ""]
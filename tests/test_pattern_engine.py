@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from pattern_engine import PatternEngine
+from pattern_store import load_patterns
+
+TEXTS = [
+    "Service Bulletin SB-1234 / QA-2040_rev2\nApplies to TASKalfa 3012i, TASKalfa-4012i and ECOSYS M4125idn.\n"
+    "Options: PF-740, DF-7120, MK-3150. FS-1370DN FS-4200DN qa_77 sb99",
+    "No identifiers on this page.",
+    "",
+    "taskalfa5054ci ECOSYSM2540dn  PF-740PF-740 QA- SB-",
+]
+EXTRA_PATTERNS = [
+    r"\d*",                 # Matches empty strings everywhere
+    r"(?<=-)\d+",           # Lookbehind
+    r"\b(\w)\w*\1\b",       # Backreference
+    r"PF-\d+|PF",           # Overlaps itself and the shipped PF- pattern
+    r"[A-Z]{2}-\d+",        # No required literal
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    patterns, version = load_patterns()
+    return PatternEngine({**patterns, "extra": EXTRA_PATTERNS}, version=version)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_find_equals_finditer_per_pattern(engine, text):
+    expected = [[m.span() for m in compiled.finditer(text)] for _, compiled in engine.entries]
+    assert engine.find(text) == expected
+
+
+def test_find_only_runs_the_given_entries(engine):
+    text = TEXTS[0]
+    only = {0, len(engine.entries) - 1}
+    hits = engine.find(text, only=only)
+    for i, (_, compiled) in enumerate(engine.entries):
+        assert hits[i] == ([m.span() for m in compiled.finditer(text)] if i in only else [])
+
+
+def test_harvest_reports_each_item_once_in_pattern_order():
+    engine = PatternEngine({"model": [r"\bPF-\d+"], "qa_number": [r"\bSB-\d+"]})
+    items = engine.harvest("SB-1 PF-740 SB-1 PF-740")
+    assert [(item["type"], item["text"], item["spans"]) for item in items] == [
+        ("model", "PF-740", [[5, 11], [17, 23]]), ("qa_number", "SB-1", [[0, 4], [12, 16]])]
+
+
+def test_invalid_pattern_is_skipped(capsys):
+    engine = PatternEngine({"model": [r"(", r"\bPF-\d+"]})
+    assert [compiled.pattern for _, compiled in engine.entries] == [r"\bPF-\d+"]
+    assert re.search("Regex error", capsys.readouterr().out)
@@ -0,0 +1,61 @@
+import time
+
+import processing_engine
+from pattern_profiler import TextSample, format_cost, profile_patterns, slowest_patterns
+
+
+def _cost(pattern, seconds=None, over_budget=False, error=None):
+    return {"pattern": pattern, "seconds": seconds, "matches": None if seconds is None else 3,
+            "over_budget": over_budget, "risks": [], "error": error}
+
+
+def test_format_cost_handles_untimed_patterns():
+    assert format_cost(_cost("a")) == "not timed"
+    assert format_cost(_cost("a", over_budget=True)) == "over budget"
+    assert format_cost(_cost("a", seconds=0.0123)) == "12.3 ms, 3 matches"
+
+
+def test_slowest_patterns_leaves_out_untimed_patterns():
+    costs = [_cost("a"), _cost("b", seconds=0.002), _cost("c", over_budget=True), _cost("d", error="bad")]
+    assert [c["pattern"] for c in slowest_patterns(costs)] == ["c", "b"]
+
+
+def test_profile_patterns_counts_matches():
+    cost = profile_patterns([r"\d+"], ["a 12 b 3", "45"])[0]
+    assert cost["matches"] == 3 and cost["seconds"] is not None and not cost["over_budget"]
+
+
+def test_crashed_timing_process_is_an_error_not_over_budget():
+    nested = "(?:" * 3000 + "a" + ")" * 3000  # Kills the timing process with a RecursionError
+    start = time.monotonic()
+    costs = profile_patterns([r"\d+", nested, r"\w+"], ["a 12"], budget=20)
+    assert time.monotonic() - start < 20
+    assert "exited unexpectedly" in costs[1]["error"] and not costs[1]["over_budget"]
+    assert costs[0]["matches"] == 1 and costs[2]["matches"] == 2
+
+
+class _Log(list):
+    def put(self, msg):
+        self.append(msg)
+
+
+def _sample():
+    sample = TextSample()
+    sample.add("TASKalfa 3012i")
+    return sample
+
+
+def test_job_report_survives_untimed_costs(monkeypatch):
+    monkeypatch.setattr(processing_engine, "profile_patterns", lambda patterns, texts: [_cost(p) for p in patterns])
+    log = _Log()
+    processing_engine._report_pattern_costs(_sample(), log)
+    assert [m["tag"] for m in log] == ["warning"]
+
+
+def test_job_report_never_raises(monkeypatch):
+    def fail(patterns, texts):
+        raise RuntimeError("no process")
+    monkeypatch.setattr(processing_engine, "profile_patterns", fail)
+    log = _Log()
+    processing_engine._report_pattern_costs(_sample(), log)
+    assert "no process" in log[-1]["msg"]
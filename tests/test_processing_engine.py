@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+
+import fitz
+import pytest
+
+import processing_engine
+import text_corpus
+from processing_engine import extraction_mode, get_cache_path
+
+
+def test_cache_path_separates_extraction_modes():
+    pdf = Path("bulletin.pdf")
+    paths = {get_cache_path(pdf, "ab" * 32, "balanced", extraction_mode(fast, full))
+             for fast, full in [(False, False), (False, True), (True, False)]}
+    assert len(paths) == 3
+
+
+def test_default_mode_keeps_existing_cache_key():
+    pdf = Path("bulletin.pdf")
+    assert get_cache_path(pdf, "ab" * 32, "balanced").name == f"bulletin_{'ab' * 8}_balanced.json"
+    assert get_cache_path(pdf, "ab" * 32, "balanced", extraction_mode()).name == f"bulletin_{'ab' * 8}_balanced.json"
+
+
+class _Queue(list):
+    def put(self, msg):
+        self.append(msg)
+
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    """Cache, review texts and text corpus in a temporary directory."""
+    monkeypatch.setattr(processing_engine, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(processing_engine, "PDF_TXT_DIR", tmp_path / "txt")
+    monkeypatch.setattr(text_corpus, "_corpus", text_corpus.TextCorpus(tmp_path / "corpus"))
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "txt").mkdir()
+    return tmp_path
+
+
+def _bulletin(path):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "Service Bulletin SB-1234\nApplies to TASKalfa 3012i.\n" + "Replace the feed roller. " * 20)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def test_refreshed_cache_hit_keeps_content_hash(isolated_cache):
+    pdf = _bulletin(isolated_cache / "bulletin.pdf")
+    first = processing_engine.process_single_pdf(pdf, _Queue(), full_text=True)
+    assert first["content_hash"]
+    cache_path = next((isolated_cache / "cache").glob("bulletin_*.json"))
+    cached = json.loads(cache_path.read_text(encoding="utf-8"))
+    cached["pattern_version"] = "outdated"
+    del cached["content_hash"]
+    cache_path.write_text(json.dumps(cached), encoding="utf-8")
+
+    log = _Queue()
+    refreshed = processing_engine.process_single_pdf(pdf, log, full_text=True)
+    assert any("Re-harvested" in m.get("msg", "") for m in log)
+    assert refreshed["content_hash"] == first["content_hash"]
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["content_hash"] == first["content_hash"]
+
+
+def test_stale_review_item_without_kept_text_stays_in_review(isolated_cache, monkeypatch):
+    pdf = isolated_cache / "notice.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "General notice without any identifiers. " * 20)
+    doc.save(str(pdf))
+    doc.close()
+    assert processing_engine.process_single_pdf(pdf, _Queue(), full_text=True)["status"] == "Needs Review"
+    cache_path = next((isolated_cache / "cache").glob("notice_*.json"))
+    cached = json.loads(cache_path.read_text(encoding="utf-8"))
+    cached["pattern_version"] = "outdated"
+    cache_path.write_text(json.dumps(cached), encoding="utf-8")
+    monkeypatch.setattr(text_corpus, "_corpus", text_corpus.TextCorpus(isolated_cache / "empty_corpus"))
+
+    log = _Queue()
+    assert processing_engine.process_single_pdf(pdf, log, full_text=True)["status"] == "Needs Review"
+    assert [m["data"]["filename"] for m in log if m["type"] == "review_item"] == ["notice.pdf"]
+    assert any("Could not re-harvest" in m.get("msg", "") for m in log)
+
+
+def test_failed_fast_mode_fallback_is_not_harvested_or_cached(isolated_cache, monkeypatch):
+    import roi_ocr
+    monkeypatch.setattr(roi_ocr, "_extract_regions", lambda *args: None)
+    monkeypatch.setattr(roi_ocr, "_save_stats", lambda stats: None)
+    monkeypatch.setattr(roi_ocr, "extract_text_from_pdf", lambda *args: {
+        "text": "TESSERACT NOT FOUND. Please install Tesseract-OCR and ensure it's in your system's PATH.", "ocr_used": True})
+    pdf = _bulletin(isolated_cache / "bulletin.pdf")
+
+    result = processing_engine.process_single_pdf(pdf, _Queue(), fast_mode=True)
+    assert result["status"] == "Fail"
+    assert "TESSERACT NOT FOUND" in result["models"]
+    assert not list((isolated_cache / "cache").glob("*.json"))
+    assert not text_corpus.get_text_corpus().keys()
@@ -0,0 +1,53 @@
+import pytest
+
+from search_index import SearchIndex, fts_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    with SearchIndex(tmp_path / "search.sqlite3") as index:
+        index.add_document("h1", "jam.pdf", "Paper jam in the paper feed unit of the FS-1370DN.", "/docs/jam.pdf")
+        index.add_document("h2", "toner.pdf", "Toner error C6000 on ECOSYS M2540dn.")
+        index.add_document("h3", "feed.pdf", "Feed unit replacement; paper feeder PF-740.")
+        yield index
+
+
+def _names(results):
+    return [result["filename"] for result in results]
+
+
+def test_word_phrase_and_prefix_queries(index):
+    assert _names(index.search("paper feed")) == ["feed.pdf", "jam.pdf"]  # Newest first
+    assert _names(index.search("paper feed unit", mode="phrase")) == ["jam.pdf"]
+    assert _names(index.search("feed", mode="prefix")) == ["feed.pdf", "jam.pdf"]
+    assert _names(index.search("fs-1370dn")) == ["jam.pdf"]
+    assert index.search("paper jam")[0]["path"] == "/docs/jam.pdf"
+
+
+def test_regex_filters_and_runs_alone(index):
+    assert _names(index.search("paper", regex=r"PF-\d+")) == ["feed.pdf"]
+    results = index.search(regex=r"C\d{4}")
+    assert _names(results) == ["toner.pdf"]
+    assert "[C6000]" in results[0]["snippet"]
+
+
+def test_replacing_and_removing_documents(index):
+    index.add_document("h1", "jam.pdf", "Now about staples.")
+    assert index.search("jam") == []
+    assert _names(index.search("staples")) == ["jam.pdf"]
+    index.remove_document("h1")
+    assert index.search("staples") == [] and index.document_count() == 2
+    assert index.has_document("h2") and not index.has_document("h1")
+
+
+def test_invalid_queries_raise_value_error(index):
+    with pytest.raises(ValueError):
+        index.search("")
+    with pytest.raises(ValueError):
+        index.search(regex="(")
+    with pytest.raises(ValueError):
+        fts_query("x", mode="fuzzy")
+
+
+def test_query_characters_are_quoted():
+    assert fts_query('say "hi" AND') == '"say" """hi""" "AND"'
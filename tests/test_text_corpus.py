@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import text_corpus
+from text_corpus import TextCorpus
+
+PAGES = ["First page: TASKalfa 3012i.\n", "", "Third page ü 日本語\n", "Last page."]
+TEXT = "".join(PAGES)
+PAGE_STARTS = [sum(len(page) for page in PAGES[:i]) for i in range(len(PAGES))]
+
+
+def test_append_and_read(tmp_path):
+    corpus = TextCorpus(tmp_path)
+    corpus.append("doc", TEXT, PAGE_STARTS)
+    corpus.append("flat", "No page offsets.")
+    assert corpus.read("doc") == TEXT
+    assert [corpus.read_page("doc", page) for page in range(1, 5)] == PAGES
+    assert corpus.read_page("doc", 5) is None
+    assert corpus.read_page("flat", 1) == "No page offsets."
+    assert corpus.read("missing") is None
+    assert "doc" in corpus and "missing" not in corpus
+
+
+def test_newer_copy_wins_and_another_reader_follows(tmp_path):
+    writer = TextCorpus(tmp_path)
+    reader = TextCorpus(tmp_path)
+    writer.append("doc", "old text")
+    assert reader.read("doc") == "old text"
+    writer.append("doc", "new text")
+    writer.append("other", "other text")
+    assert reader.read("doc") == "new text"
+    assert sorted(reader.keys()) == ["doc", "other"]
+    assert dict(reader.iter_texts()) == {"doc": "new text", "other": "other text"}
+    reader.close()
+
+
+def test_line_cut_short_by_a_crash_is_ignored(tmp_path):
+    corpus = TextCorpus(tmp_path)
+    corpus.append("before", "kept")
+    with open(tmp_path / text_corpus.INDEX_NAME, "ab") as f:
+        f.write(b'{"key": "half-writ')
+    corpus.append("after", "also kept")
+    fresh = TextCorpus(tmp_path)
+    assert sorted(fresh.keys()) == ["after", "before"]
+    assert fresh.read("after") == "also kept"
+
+
+def test_new_segment_past_the_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_corpus, "TEXT_CORPUS_SEGMENT_BYTES", 1)
+    corpus = TextCorpus(tmp_path)
+    corpus.append("a", "first")
+    corpus.append("b", "second")
+    assert corpus.entry("a")["segment"] != corpus.entry("b")["segment"]
+    assert (corpus.read("a"), corpus.read("b")) == ("first", "second")
+
+
+def _append_many(directory, writer):
+    corpus = TextCorpus(directory)
+    for i in range(25):
+        corpus.append(f"{writer}-{i}", f"Text {i} from writer {writer}. " * (i + 1), [0, 10])
+
+
+def test_processes_appending_at_once_do_not_overwrite_each_other(tmp_path):
+    with ProcessPoolExecutor(4) as pool:
+        list(pool.map(_append_many, [tmp_path] * 4, range(4)))
+    corpus = TextCorpus(tmp_path)
+    assert len(corpus.keys()) == 100
+    for writer in range(4):
+        for i in range(25):
+            assert corpus.read(f"{writer}-{i}") == f"Text {i} from writer {writer}. " * (i + 1)
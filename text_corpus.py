@@ -0,0 +1,254 @@
+# text_corpus.py
+# Packed store for the extracted text of every processed document.
+#
+# Re-harvests, impact previews and review windows all need the extracted text
+# again, and reading it back from one small file per document costs an open,
+# a read and a close each time - thousands of them for a corpus-wide pass.
+# Texts are instead appended to a few large segment files in TEXT_CORPUS_DIR:
+#
+#   segment-00001.dat   zlib-compressed blocks, one per page (or one per
+#                       document when its page offsets are unknown)
+#   index.jsonl         one line per stored document: its key, segment, the
+#                       (offset, length) of each block and its page offsets
+#
+# Both files are only ever appended to. A writer holds write.lock for the
+# whole append, so the workers of a job never interleave their blocks. A block
+# is written before its index line, so a reader never sees an entry whose data
+# is incomplete, and a line cut short by a crash is ignored. Storing a key again appends a new copy and
+# the newer index line wins. A segment is closed once it reaches
+# TEXT_CORPUS_SEGMENT_BYTES and the next one is started.
+#
+# Readers map the segments with mmap and decompress only the blocks asked for,
+# so a single page of a large manual is read without touching the rest. The
+# index is read once and then followed as it grows.
+
+import json
+import mmap
+import os
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import msvcrt
+except ImportError:  # Not Windows
+    msvcrt = None
+    import fcntl
+
+from config import TEXT_CORPUS_COMPRESSION, TEXT_CORPUS_DIR, TEXT_CORPUS_SEGMENT_BYTES
+
+INDEX_NAME = "index.jsonl"
+LOCK_NAME = "write.lock"
+
+
+def _segment_name(number: int) -> str:
+    return f"segment-{number:05d}.dat"
+
+
+def _page_slices(text: str, page_starts: list | None) -> list[str]:
+    """The text cut at the page offsets, one slice per page (empty pages too); the slices join back to the text."""
+    if not page_starts:
+        return [text]
+    bounds = [0]
+    for start in page_starts[1:]:
+        bounds.append(min(max(bounds[-1], start), len(text)))
+    bounds.append(len(text))
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+@contextmanager
+def _write_lock(directory: Path):
+    """Holds the corpus's write lock, waiting for writers in other processes."""
+    with open(directory / LOCK_NAME, "a+b") as f:
+        if msvcrt:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # Raises OSError after about 10 seconds
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if msvcrt:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class TextCorpus:
+    """Append-only segment files of compressed texts with an offset index (see module comment)."""
+
+    def __init__(self, directory: Path = TEXT_CORPUS_DIR):
+        self.directory = Path(directory)
+        self.index_path = self.directory / INDEX_NAME
+        self._entries = {}  # Key -> latest index entry
+        self._index_pos = 0  # Bytes of the index file already read
+        self._maps = {}  # Segment name -> (mmap, mapped size)
+
+    # --- WRITING ---
+
+    def _current_segment(self) -> str:
+        segments = sorted(self.directory.glob("segment-*.dat"))
+        if segments:
+            if segments[-1].stat().st_size < TEXT_CORPUS_SEGMENT_BYTES:
+                return segments[-1].name
+            return _segment_name(int(segments[-1].stem.split("-")[1]) + 1)
+        return _segment_name(1)
+
+    def append(self, key: str, text: str, page_starts: list | None = None):
+        """
+        Stores a document's text under a key, replacing any earlier text for it.
+
+        Args:
+            key: The document's key, e.g. the stem of its cache file.
+            text: The extracted text.
+            page_starts: Offset in the text where each page starts; each page
+                is then compressed separately and can be read on its own.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        blocks = []
+        with _write_lock(self.directory):
+            segment = self._current_segment()
+            with open(self.directory / segment, "ab") as f:
+                offset = f.tell()  # The end of the segment; nobody else appends while the lock is held
+                for page_text in _page_slices(text, page_starts):
+                    block = zlib.compress(page_text.encode("utf-8"), TEXT_CORPUS_COMPRESSION)
+                    f.write(block)
+                    blocks.append([offset, len(block)])
+                    offset += len(block)
+                f.flush()
+                os.fsync(f.fileno())
+            entry = {"key": key, "segment": segment, "blocks": blocks, "chars": len(text),
+                     "page_starts": list(page_starts) if page_starts else None, "time": time.time()}
+            line = json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n"
+            with open(self.index_path, "ab+") as f:
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line  # An earlier writer stopped mid-line
+                f.write(line)
+        self._entries[key] = entry
+
+    # --- READING ---
+
+    def refresh(self):
+        """Reads the index lines appended since the last call (by this or another process)."""
+        try:
+            size = self.index_path.stat().st_size
+        except OSError:
+            return
+        if size < self._index_pos:  # The corpus was deleted and started again
+            self._entries.clear()
+            self._index_pos = 0
+            self.close()
+        if size == self._index_pos:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_pos)
+            data = f.read(size - self._index_pos)
+        complete = data[:data.rfind(b"\n") + 1]  # A line still being written is read next time
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+                self._entries[entry["key"]] = entry
+            except (ValueError, KeyError):
+                continue  # Cut short by a crash
+        self._index_pos += len(complete)
+
+    def entry(self, key: str) -> dict | None:
+        """The index entry of a key: {"key", "segment", "blocks", "chars", "page_starts", "time"}."""
+        self.refresh()
+        return self._entries.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self.entry(key) is not None
+
+    def keys(self) -> list[str]:
+        self.refresh()
+        return list(self._entries)
+
+    def _map(self, segment: str, needed: int) -> mmap.mmap:
+        mapped = self._maps.get(segment)
+        if mapped is None or mapped[1] < needed:
+            if mapped is not None:
+                mapped[0].close()
+            with open(self.directory / segment, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            mapped = self._maps[segment] = (view, size)
+        return mapped[0]
+
+    def _read_blocks(self, entry: dict, blocks: list) -> str:
+        end = max(offset + length for offset, length in blocks)
+        view = self._map(entry["segment"], end)
+        return "".join(zlib.decompress(view[offset:offset + length]).decode("utf-8") for offset, length in blocks)
+
+    def read(self, key: str) -> str | None:
+        """A document's whole text, or None when it is not stored or cannot be read."""
+        entry = self.entry(key)
+        if entry is None:
+            return None
+        try:
+            return self._read_blocks(entry, entry["blocks"])
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"Could not read '{key}' from the text corpus: {e}")
+            return None
+
+    def read_page(self, key: str, page: int) -> str | None:
+        """One page of a document (1-based), or None. Documents stored without page offsets have one page."""
+        entry = self.entry(key)
+        if entry is None or not 1 <= page <= len(entry["blocks"]):
+            return None
+        try:
+            return self._read_blocks(entry, [entry["blocks"][page - 1]])
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"Could not read '{key}' page {page} from the text corpus: {e}")
+            return None
+
+    def iter_texts(self, keys=None):
+        """
+        Streams (key, text) pairs in storage order, which reads each segment
+        front to back. Keys that are not stored are skipped.
+        """
+        self.refresh()
+        entries = [self._entries[k] for k in (keys if keys is not None else list(self._entries)) if k in self._entries]
+        entries.sort(key=lambda entry: (entry["segment"], entry["blocks"][0][0]))
+        for entry in entries:
+            try:
+                yield entry["key"], self._read_blocks(entry, entry["blocks"])
+            except (OSError, ValueError, zlib.error) as e:
+                print(f"Could not read '{entry['key']}' from the text corpus: {e}")
+
+    def close(self):
+        for view, _ in self._maps.values():
+            view.close()
+        self._maps.clear()
+
+
+_corpus = None
+
+
+def get_text_corpus() -> TextCorpus:
+    """This process's corpus at TEXT_CORPUS_DIR (segments stay mapped between calls)."""
+    global _corpus
+    if _corpus is None:
+        _corpus = TextCorpus()
+    return _corpus
+
+
+# --- CACHED RESULTS ---
+# The processing engine keeps each cached result's extracted text here, under
+# the cache file's stem.
+
+def write_cached_text(cache_path: Path, text: str, page_starts: list | None = None):
+    get_text_corpus().append(Path(cache_path).stem, text, page_starts)
+
+
+def read_cached_text(cache_path: Path) -> str | None:
+    """The extracted text of a cached result, or None when it was not kept."""
+    return get_text_corpus().read(Path(cache_path).stem)
+
+
+def has_cached_text(cache_path: Path) -> bool:
+    return Path(cache_path).stem in get_text_corpus()
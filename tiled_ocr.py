@@ -0,0 +1,136 @@
+# tiled_ocr.py
+# Tiled OCR for oversized pages.
+#
+# Large-format service diagrams rendered at OCR resolution can reach hundreds of
+# megapixels. Pages whose OCR image would exceed OCR_TILE_MAX_PIXELS are instead
+# rendered as overlapping tiles (clip rectangles), OCR'd one after another and
+# stitched back together, so no more than one tile is held in memory at a time.
+#
+# Each tile "owns" its area up to the middle of the overlap with its neighbours.
+# A text line is kept only by the tile that owns its centre, so lines lying in an
+# overlap strip are read in full by at least one tile and reported only once.
+
+import math
+
+import fitz  # PyMuPDF
+
+from config import OCR_TILE_MAX_PIXELS, OCR_TILE_OVERLAP_PX
+from document_session import DocumentSession
+from image_preprocessing import pixmap_to_array, preprocess_page
+from ocr_backends import get_ocr_pool, select_ocr_lang
+
+# Tile images must keep page coordinates: no ink cropping or per-tile rotation.
+TILE_PREPROCESS = {"crop_to_ink": False, "deskew": False}
+MIN_BAND_HEIGHT = 8  # Shortest full-width band, in overlaps, before columns are split too
+
+
+def needs_tiling(session: DocumentSession, index: int, dpi: int) -> bool:
+    return session.ocr_pixel_count(index, dpi) > OCR_TILE_MAX_PIXELS
+
+
+def _segments(length: int, max_length: int, overlap: int) -> list[tuple[int, int]]:
+    """Splits 0..length into overlapping (start, end) segments no longer than max_length."""
+    if length <= max_length:
+        return [(0, length)]
+    count = math.ceil((length - overlap) / (max_length - overlap))
+    step = (length - overlap) / count
+    return [(round(i * step), min(length, round(i * step + step + overlap))) for i in range(count)]
+
+
+def _owned(segments: list[tuple[int, int]], i: int, overlap: int) -> tuple[float, float]:
+    """The part of segment i that no neighbour claims: up to the middle of each overlap."""
+    start, end = segments[i]
+    low = start + overlap / 2 if i > 0 else float("-inf")
+    high = end - overlap / 2 if i < len(segments) - 1 else float("inf")
+    return low, high
+
+
+def tile_grid(width: int, height: int, max_pixels: int = OCR_TILE_MAX_PIXELS,
+              overlap: int = OCR_TILE_OVERLAP_PX) -> list[dict]:
+    """
+    Plans the tiles for a width x height pixel page.
+
+    Full-width bands are preferred, because text lines then never cross a tile
+    edge sideways; columns are split only when even a short band would exceed
+    the budget.
+
+    Returns:
+        A list of {"rect": (x0, y0, x1, y1), "owned": (ox0, oy0, ox1, oy1)} in
+        page pixels, top to bottom and left to right.
+    """
+    min_band = MIN_BAND_HEIGHT * overlap
+    max_width = width if width * min_band <= max_pixels else max(2 * overlap + 1, max_pixels // min_band)
+    columns = _segments(width, max_width, overlap)
+    tile_width = max(end - start for start, end in columns)
+    rows = _segments(height, max(2 * overlap + 1, max_pixels // tile_width), overlap)
+
+    tiles = []
+    for r, (y0, y1) in enumerate(rows):
+        oy0, oy1 = _owned(rows, r, overlap)
+        for c, (x0, x1) in enumerate(columns):
+            ox0, ox1 = _owned(columns, c, overlap)
+            tiles.append({"rect": (x0, y0, x1, y1), "owned": (ox0, oy0, ox1, oy1)})
+    return tiles
+
+
+def _stitch(lines: list[tuple[str, tuple]]) -> str:
+    """Joins page-coordinate lines in reading order; lines at the same height share a row."""
+    if not lines:
+        return ""
+    lines.sort(key=lambda line: ((line[1][1] + line[1][3]) / 2, line[1][0]))
+    heights = sorted(box[3] - box[1] for _, box in lines)
+    tolerance = max(1, heights[len(heights) // 2] / 2)
+
+    rows, row, row_y = [], [], None
+    for text, box in lines:
+        y = (box[1] + box[3]) / 2
+        if row and y - row_y > tolerance:
+            rows.append(row)
+            row = []
+        if not row:
+            row_y = y
+        row.append((box[0], text))
+    rows.append(row)
+    return "\n".join("  ".join(text for _, text in sorted(r)) for r in rows)
+
+
+def ocr_page_tiled(session: DocumentSession, index: int, profile: dict, psm: int | None = None) -> str:
+    """
+    OCRs one oversized page tile by tile.
+
+    Args:
+        session: The open document.
+        index: Page index.
+        profile: An OCR profile from `ocr_backends.get_ocr_profile`.
+        psm: Page segmentation mode; the profile's when None.
+
+    Returns:
+        The stitched page text. Blank tiles are skipped.
+    """
+    dpi = profile["dpi"]
+    page_rect = session.page(index).rect
+    scale = 72 / dpi
+    width = round(page_rect.width / scale)
+    height = round(page_rect.height / scale)
+    settings = {**profile["preprocess"], **TILE_PREPROCESS}
+    psm = psm if psm is not None else profile["psm"]
+
+    lang = None
+    lines = []
+    for tile in tile_grid(width, height):
+        x0, y0, x1, y1 = tile["rect"]
+        clip = fitz.Rect(page_rect.x0 + x0 * scale, page_rect.y0 + y0 * scale,
+                         page_rect.x0 + x1 * scale, page_rect.y0 + y1 * scale)
+        image = preprocess_page(pixmap_to_array(session.render_page(index, dpi=dpi, clip=clip, gray=True)), settings)
+        if image is None:
+            continue  # Blank tile
+        if lang is None:
+            lang = select_ocr_lang(image)  # One script decision per page, from its first inked tile
+        ox0, oy0, ox1, oy1 = tile["owned"]
+        for text, (lx0, ly0, lx1, ly1) in get_ocr_pool(lang, oem=profile["oem"]).recognize_lines(image, psm=psm):
+            box = (x0 + lx0, y0 + ly0, x0 + lx1, y0 + ly1)
+            cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+            if ox0 <= cx < ox1 and oy0 <= cy < oy1:
+                lines.append((text, box))
+        del image
+    return _stitch(lines)